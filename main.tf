@@ -13,6 +13,16 @@ terraform {
   }
 }
 
+locals {
+  # Python log firehose used by the provisioners, empty for the shell loops
+  log_command = var.log_firehose ? "python3 ${path.module}/src/torture/firehose.py ${var.log_firehose_args}" : ""
+
+  # Destroy-time provisioners can only read self, so the firehose command is
+  # kept in triggers, but only when enabled: the triggers and state of the
+  # shell loop resources stay as they were
+  log_triggers = var.log_firehose ? { log_command = local.log_command } : {}
+}
+
 # Small resource - minimal data, fast to plan
 resource "null_resource" "small_resource" {
   count = var.small_resource_count
@@ -27,7 +37,7 @@ resource "null_resource" "small_resource" {
 resource "null_resource" "medium_resource" {
   count = var.medium_resource_count
 
-  triggers = {
+  triggers = merge({
     index                  = count.index
     timestamp              = timestamp()
     log_lines_per_resource = var.medium_log_lines_per_resource
@@ -43,11 +53,11 @@ resource "null_resource" "medium_resource" {
     attribute_8  = join("", [for i in range(100) : "HHHHHHHHHH_STATIC_FILLER_PREDETERMINED_VALUE_TEXT_${count.index}_${i}_"])
     attribute_9  = join("", [for i in range(100) : "IIIIIIIIII_CONSTANT_PATTERN_FIXED_RESOURCE_PADDING_${count.index}_${i}_"])
     attribute_10 = join("", [for i in range(100) : "JJJJJJJJJJ_LITERAL_CONTENT_HARDCODED_DATA_SEGMENT_${count.index}_${i}_"])
-  }
+  }, local.log_triggers)
 
   provisioner "local-exec" {
     when    = create
-    command = <<-EOT
+    command = var.log_firehose ? "${local.log_command} --resource ${count.index} --lines ${var.medium_log_lines_per_resource}" : <<-EOT
       echo "==== Starting provisioning for resource ${count.index} ===="
       for i in $(seq 1 ${var.medium_log_lines_per_resource}); do
         echo "[Resource ${count.index}] Log line $i: Processing operation $(date +%s%N) with detailed information about the current state and configuration changes being applied to the infrastructure"
@@ -59,7 +69,7 @@ resource "null_resource" "medium_resource" {
 
   provisioner "local-exec" {
     when    = destroy
-    command = <<-EOT
+    command = lookup(self.triggers, "log_command", "") != "" ? "${lookup(self.triggers, "log_command", "")} --phase destroy --resource ${self.triggers.index} --lines ${self.triggers.log_lines_per_resource}" : <<-EOT
       echo "==== Starting destruction for resource ${self.triggers.index} ===="
       for i in $(seq 1 ${self.triggers.log_lines_per_resource}); do
         echo "[Resource ${self.triggers.index}] Destroy log line $i: Removing resource $(date +%s%N) and cleaning up all associated configurations and state"
@@ -74,7 +84,7 @@ resource "null_resource" "medium_resource" {
 resource "null_resource" "heavy_resource" {
   count = var.heavy_resource_count
 
-  triggers = {
+  triggers = merge({
     index                  = count.index
     timestamp              = timestamp()
     log_lines_per_resource = var.heavy_log_lines_per_resource
@@ -143,11 +153,11 @@ resource "null_resource" "heavy_resource" {
       for i in range(200) :
       "${md5("final-${i}")}_${sha256("${count.index}-${i}")}_${base64encode("end-${i}")}_"
     ])
-  }
+  }, local.log_triggers)
 
   provisioner "local-exec" {
     when    = create
-    command = <<-EOT
+    command = var.log_firehose ? "${local.log_command} --resource ${count.index} --lines ${var.heavy_log_lines_per_resource}" : <<-EOT
       echo "==== Starting provisioning for resource ${count.index} ===="
       for i in $(seq 1 ${var.heavy_log_lines_per_resource}); do
         echo "[Resource ${count.index}] Log line $i: Processing operation $(date +%s%N) with detailed information about the current state and configuration changes being applied to the infrastructure"
@@ -159,7 +169,7 @@ resource "null_resource" "heavy_resource" {
 
   provisioner "local-exec" {
     when    = destroy
-    command = <<-EOT
+    command = lookup(self.triggers, "log_command", "") != "" ? "${lookup(self.triggers, "log_command", "")} --phase destroy --resource ${self.triggers.index} --lines ${self.triggers.log_lines_per_resource}" : <<-EOT
       echo "==== Starting destruction for resource ${self.triggers.index} ===="
       for i in $(seq 1 ${self.triggers.log_lines_per_resource}); do
         echo "[Resource ${self.triggers.index}] Destroy log line $i: Removing resource $(date +%s%N) and cleaning up all associated configurations and state"
@@ -0,0 +1,282 @@
+import itertools
+import json
+import math
+import re
+import shutil
+import statistics
+from pathlib import Path
+
+import click
+
+from src.torture import pipeline
+
+# Variables of variables.tf that a benchmark grid may sweep
+GRID_VARIABLES = [
+    "small_resource_count",
+    "medium_resource_count",
+    "heavy_resource_count",
+    "medium_log_lines_per_resource",
+    "heavy_log_lines_per_resource",
+    "local_files_count",
+]
+
+RESOURCE_VARIABLES = [
+    "small_resource_count",
+    "medium_resource_count",
+    "heavy_resource_count",
+]
+
+# Defaults of variables.tf, used to count resources neither the var file nor
+# the point sets
+DEFAULTS = {
+    "small_resource_count": 1000,
+    "medium_resource_count": 1000,
+    "heavy_resource_count": 1000,
+}
+
+PHASE_METRICS = [
+    "wall_seconds",
+    "user_seconds",
+    "sys_seconds",
+    "max_rss_bytes",
+    "peak_tree_rss_bytes",
+]
+
+# Power-law exponent above which plan time is reported as superlinear
+SUPERLINEAR_EXPONENT = 1.1
+
+# Marginal cost per resource, relative to the first segment, that marks the knee
+KNEE_FACTOR = 1.5
+
+
+def parse_grid(specs):
+    """
+    Parse NAME=V1,V2,... grid options
+
+    Returns:
+        Dict of variable name to list of integer values
+    """
+    grid = {}
+    for spec in specs:
+        name, sep, values = spec.partition("=")
+        if not sep or name not in GRID_VARIABLES:
+            raise ValueError(
+                f"Invalid grid '{spec}', expected NAME=V1,V2 with NAME one of "
+                f"{', '.join(GRID_VARIABLES)}"
+            )
+        try:
+            grid[name] = [int(v) for v in values.split(",") if v]
+        except ValueError:
+            raise ValueError(f"Invalid grid '{spec}', values must be integers")
+    return grid
+
+
+def grid_points(grid):
+    """Cartesian product of the grid as a list of variable dicts"""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+
+
+def percentile(values, q):
+    """Percentile with linear interpolation between closest ranks"""
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+    pos = (len(ordered) - 1) * q / 100
+    low = math.floor(pos)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
+
+
+def summarize(values):
+    return {
+        "median": statistics.median(values),
+        "p95": percentile(values, 95),
+        "min": min(values),
+        "max": max(values),
+    }
+
+
+def summarize_runs(runs):
+    """Median and p95 of every phase metric and artifact size over repeated runs"""
+    summary = {"phases": {}, "artifacts": {}}
+    for phase in runs[0]["phases"]:
+        name = phase["name"]
+        summary["phases"][name] = {
+            metric: summarize(
+                [p[metric] for run in runs for p in run["phases"] if p["name"] == name]
+            )
+            for metric in PHASE_METRICS
+        }
+    for artifact in runs[0]["artifacts"]:
+        summary["artifacts"][artifact] = summarize(
+            [run["artifacts"].get(artifact, 0) for run in runs]
+        )
+    return summary
+
+
+ASSIGNMENT_RE = re.compile(r"^\s*(\w+)\s*=\s*(.*?)\s*(?:#.*|//.*)?$", re.MULTILINE)
+
+
+def var_file_counts(var_file):
+    """
+    Resource counts set by a tfvars or .tfvars.json file
+
+    Only literal integers are understood, a resource count set to anything
+    else is rejected since the resources of the points could not be counted.
+
+    Returns:
+        Dict of the RESOURCE_VARIABLES the file sets to their value
+    """
+    if var_file is None:
+        return {}
+    text = Path(var_file).read_text()
+    if str(var_file).endswith(".json"):
+        values = json.loads(text)
+    else:
+        values = dict(ASSIGNMENT_RE.findall(text))
+    counts = {}
+    for name in RESOURCE_VARIABLES:
+        if name not in values:
+            continue
+        try:
+            counts[name] = int(values[name])
+        except (TypeError, ValueError):
+            raise ValueError(
+                f"{var_file}: {name} must be a literal integer to count resources"
+            )
+    return counts
+
+
+def resource_count(variables, base=None):
+    """Resources of a point, counts it does not set come from base or DEFAULTS"""
+    base = {**DEFAULTS, **(base or {})}
+    return sum(variables.get(name, base[name]) for name in RESOURCE_VARIABLES)
+
+
+def linear_fit(xs, ys):
+    """Least squares fit y = a + b*x, returns (a, b, r2)"""
+    n = len(xs)
+    mean_x = sum(xs) / n
+    mean_y = sum(ys) / n
+    sxx = sum((x - mean_x) ** 2 for x in xs)
+    if sxx == 0:
+        return mean_y, 0.0, 0.0
+    b = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / sxx
+    a = mean_y - b * mean_x
+    ss_tot = sum((y - mean_y) ** 2 for y in ys)
+    ss_res = sum((y - a - b * x) ** 2 for x, y in zip(xs, ys))
+    return a, b, 1 - ss_res / ss_tot if ss_tot else 1.0
+
+
+def fit_scaling(points, phase="plan", metric="wall_seconds"):
+    """
+    Fit phase time against the number of resources
+
+    Fits a linear model and a power law y = c * x^k (linear in log-log space).
+    An exponent k above SUPERLINEAR_EXPONENT means the phase scales worse than
+    linearly. The knee is the first resource count where the marginal cost per
+    resource exceeds KNEE_FACTOR times the cost of the first segment.
+    """
+    by_count = {}
+    for point in points:
+        x = point.get("resources", resource_count(point["variables"]))
+        y = point["summary"]["phases"].get(phase, {}).get(metric, {}).get("median")
+        if y is not None:
+            by_count.setdefault(x, []).append(y)
+    series = sorted((x, statistics.median(ys)) for x, ys in by_count.items())
+    if len(series) < 2:
+        return None
+
+    xs = [x for x, _ in series]
+    ys = [y for _, y in series]
+    a, b, r2 = linear_fit(xs, ys)
+    fit = {
+        "phase": phase,
+        "metric": metric,
+        "series": [{"resources": x, "median": y} for x, y in series],
+        "linear": {"intercept": a, "slope": b, "r2": r2},
+        "power": None,
+        "scaling": "linear",
+        "knee_resources": None,
+    }
+
+    positive = [(x, y) for x, y in series if x > 0 and y > 0]
+    if len(positive) >= 2:
+        log_a, k, log_r2 = linear_fit(
+            [math.log(x) for x, _ in positive], [math.log(y) for _, y in positive]
+        )
+        fit["power"] = {"coefficient": math.exp(log_a), "exponent": k, "r2": log_r2}
+        if k > SUPERLINEAR_EXPONENT:
+            fit["scaling"] = "superlinear"
+
+    slopes = [
+        ((y2 - y1) / (x2 - x1), x2)
+        for (x1, y1), (x2, y2) in itertools.pairwise(series)
+        if x2 > x1
+    ]
+    if slopes and slopes[0][0] > 0:
+        for slope, x in slopes[1:]:
+            if slope > slopes[0][0] * KNEE_FACTOR:
+                fit["knee_resources"] = x
+                break
+    return fit
+
+
+def run_sweep(grid, repeat, workdir, var_file=None, keep_artifacts=False):
+    """
+    Run the plan pipeline for every grid point
+
+    tofu init runs once up front and is not part of the measured points.
+
+    Args:
+        grid: Dict of variable name to values
+        repeat: Runs per point
+        workdir: Directory for run artifacts
+        var_file: Optional tfvars file passed to every plan, its resource
+            counts are used for the variables the grid does not sweep
+        keep_artifacts: Keep the artifacts of every run instead of only the last
+
+    Returns:
+        List of points with their variables, resource count, raw runs and
+        summary
+    """
+    base = var_file_counts(var_file)
+    workdir = Path(workdir)
+    workdir.mkdir(parents=True, exist_ok=True)
+    if pipeline.run_init()["returncode"] != 0:
+        raise RuntimeError("tofu init failed")
+
+    points = []
+    for index, variables in enumerate(grid_points(grid)):
+        label = " ".join(f"{k}={v}" for k, v in variables.items()) or "defaults"
+        runs = []
+        for attempt in range(repeat):
+            click.echo(f"[{index + 1}] {label} (run {attempt + 1}/{repeat})")
+            run_dir = workdir / f"point-{index:03d}"
+            if keep_artifacts:
+                run_dir = run_dir / f"run-{attempt + 1}"
+            if run_dir.exists():
+                shutil.rmtree(run_dir)
+            run_dir.mkdir(parents=True)
+
+            # The analyzer would throttle the show pipe, so sweeps time tofu alone
+            phases, artifacts = pipeline.run_plan(
+                run_dir, var_file, variables, init=False, analyze=False
+            )
+            failed = [p["name"] for p in phases if p["returncode"] != 0]
+            if failed:
+                raise RuntimeError(f"{', '.join(failed)} failed for {label}")
+            for phase in phases:
+                phase.pop("samples", None)
+            runs.append({"phases": phases, "artifacts": artifacts})
+
+        points.append(
+            {
+                "variables": variables,
+                "resources": resource_count(variables, base),
+                "runs": runs,
+                "summary": summarize_runs(runs),
+            }
+        )
+    return points
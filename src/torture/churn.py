@@ -0,0 +1,266 @@
+import hashlib
+import json
+import os
+import random
+import shutil
+import time
+from pathlib import Path, PurePosixPath
+
+from src.torture import history, manifest, modulegen, modulespec
+
+VERSIONS_DIR = modulegen.MODULES_DIR / ".versions"
+
+STATE_FILE = "churn.json"
+
+# Templates whose block names all derive from one parameter, so added copies
+# do not declare a resource or variable twice. main is left out: its
+# resources are always resource_{i} and it repeats required_providers.
+ADDABLE = {"small_file": "index"}
+
+
+def version_name(version):
+    return f"v{version:04d}"
+
+
+def options_key(module_spec, scale, seed, fractions):
+    """Identity of a version series, versions are only reused when it matches"""
+    blob = json.dumps(
+        {
+            "generator_version": manifest.GENERATOR_VERSION,
+            "spec": module_spec,
+            "scale": scale,
+            "seed": seed,
+            "fractions": fractions,
+            "addable": ADDABLE,
+        },
+        sort_keys=True,
+    ).encode()
+    return hashlib.sha256(blob).hexdigest()
+
+
+def added_task(task, version, n):
+    """Copy of a template task under a new path with unique names"""
+    name = f"churn_{version:04d}_{n:03d}"
+    path = PurePosixPath(task["path"]).parent / f"{name}.tf"
+    params = dict(task["params"], **{ADDABLE[task["template"]]: name})
+    return {
+        "path": path.as_posix(),
+        "template": task["template"],
+        "params": params,
+        "trailer": "",
+    }
+
+
+def describe(directory: Path, path):
+    filepath = directory / path
+    return {
+        "path": path,
+        "size": filepath.stat().st_size,
+        "sha256": manifest.file_sha256(filepath),
+    }
+
+
+def link_version(previous: Path, current: Path, paths):
+    """Create a version directory hardlinking the files of the previous one"""
+    for path in paths:
+        (current / path).parent.mkdir(parents=True, exist_ok=True)
+        os.link(previous / path, current / path)
+
+
+def load_state(directory: Path, key):
+    """Load the state of an existing series, None when it was built differently"""
+    try:
+        state = json.loads((directory / STATE_FILE).read_text())
+    except FileNotFoundError:
+        return None
+    if state.get("key") != key or not state["versions"]:
+        return None
+    # The file list describes the last version, which has to be there to link from
+    if not (directory / version_name(state["versions"][-1]["version"])).is_dir():
+        return None
+    return state
+
+
+def plan_version(version, tasks, files, added, fractions, rng):
+    """
+    Pick the changes of a version
+
+    Returns:
+        Tuple of tasks to write, paths to edit and paths to remove
+    """
+    templates = sorted(p for p, t in tasks.items() if "template" in t)
+    payloads = sorted(p for p, t in tasks.items() if "payload" in t)
+
+    edited = rng.sample(
+        templates, history.churn_count(fractions["tf_churn"], len(templates), rng)
+    )
+    edited += rng.sample(
+        payloads, history.churn_count(fractions["bin_churn"], len(payloads), rng)
+    )
+    removable = sorted(set(added) - set(edited))
+    removed = rng.sample(
+        removable,
+        min(
+            len(removable),
+            history.churn_count(fractions["remove"], len(templates), rng),
+        ),
+    )
+
+    sources = [tasks[p] for p in templates if tasks[p]["template"] in ADDABLE]
+    new = {}
+    for n in range(history.churn_count(fractions["add"], len(templates), rng)):
+        if sources:
+            task = added_task(rng.choice(sources), version, n)
+        else:
+            task = {
+                "path": f"churn_{version:04d}_{n:03d}.tf",
+                "template": "small_file",
+                "params": {"index": f"churn_{version:04d}_{n:03d}"},
+                "trailer": "",
+            }
+        if task["path"] not in files:
+            new[task["path"]] = task
+    return new, edited, removed
+
+
+def generate_versions(
+    module_spec,
+    output=VERSIONS_DIR,
+    versions=10,
+    tf_churn=0.05,
+    add=0.01,
+    remove=0.01,
+    bin_churn=0.01,
+    seed=0,
+    scale=1.0,
+    force=False,
+):
+    """
+    Evolve a module through a series of configuration versions
+
+    Version 1 is the whole module. Every following version rewrites a
+    tf_churn fraction of the template files and a bin_churn fraction of the
+    payload files with the seed of the version, adds an add fraction of new
+    .tf files copied from the module's small_file templates (or new
+    small_file files for modules without any) under unique names, and removes a remove fraction of the files added before
+    (fractions of the template file count). Original files are never removed,
+    so every version stays a valid configuration.
+
+    Each version is a directory output/MODULE/vNNNN hardlinking the unchanged
+    files of the previous one, so only changed files are written, and comes
+    with a vNNNN.json diff manifest listing added, modified and removed files
+    with sizes and hashes. A series built with the same options is extended
+    instead of rebuilt.
+
+    Args:
+        module_spec: Module spec, see modulespec
+        output: Directory of the version series
+        versions: Number of versions including the initial one
+        tf_churn: Fraction of template files rewritten per version
+        add: Fraction of template files added per version
+        remove: Fraction of template files removed per version
+        bin_churn: Fraction of payload files rewritten per version
+        seed: Base seed
+        scale: Factor applied to file counts, resource counts and payload sizes
+        force: Rebuild the series from scratch
+
+    Returns:
+        Dict with the series directory and one summary per version
+    """
+    fractions = {
+        "tf_churn": tf_churn,
+        "add": add,
+        "remove": remove,
+        "bin_churn": bin_churn,
+    }
+    key = options_key(module_spec, scale, seed, fractions)
+    directory = Path(output) / module_spec["name"]
+    tasks = {t["path"]: t for t in modulespec.expand_spec(module_spec, scale)}
+
+    state = None if force else load_state(directory, key)
+    if state is None:
+        if directory.exists():
+            shutil.rmtree(directory)
+        directory.mkdir(parents=True)
+        state = {"key": key, "files": {}, "added": {}, "versions": []}
+    else:
+        # Keep the versions up to the last complete one, drop anything after it
+        last = state["versions"][-1]["version"]
+        for entry in directory.iterdir():
+            if (
+                entry.name.startswith("v")
+                and entry.name[1:5].isdigit()
+                and int(entry.name[1:5]) > last
+            ):
+                if entry.is_dir():
+                    shutil.rmtree(entry)
+                else:
+                    entry.unlink()
+        tasks.update(state["added"])
+    files = state["files"]
+    reused = len(state["versions"])
+
+    for version in range(reused + 1, versions + 1):
+        start = time.monotonic()
+        current = directory / version_name(version)
+        rng = random.Random(
+            modulegen.derive_seed(seed, module_spec["name"], "churn", version)
+        )
+        if version == 1:
+            new, edited, removed = dict(tasks), [], []
+            current.mkdir()
+        else:
+            new, edited, removed = plan_version(
+                version, tasks, files, state["added"], fractions, rng
+            )
+            kept = sorted(set(files) - set(edited) - set(removed))
+            link_version(directory / version_name(version - 1), current, kept)
+
+        for path in removed:
+            del files[path]
+            del tasks[path]
+            del state["added"][path]
+        old_sizes = {path: files[path]["size"] for path in edited}
+        for path, task in new.items():
+            tasks[path] = task
+            if version > 1:
+                state["added"][path] = task
+        for path in [*new, *edited]:
+            filepath = current / path
+            filepath.parent.mkdir(parents=True, exist_ok=True)
+            history.render_version(tasks[path], filepath, seed, version)
+            files[path] = describe(current, path)
+
+        diff = {
+            "version": version,
+            "parent": version - 1 if version > 1 else None,
+            "added": [files[path] for path in sorted(new)],
+            "modified": [
+                {**files[path], "previous_size": old_sizes[path]}
+                for path in sorted(edited)
+            ],
+            "removed": sorted(removed),
+        }
+        summary = {
+            "version": version,
+            "files": len(files),
+            "bytes": sum(f["size"] for f in files.values()),
+            "added": len(new),
+            "modified": len(edited),
+            "removed": len(removed),
+            "delta_bytes": sum(f["size"] for f in diff["added"] + diff["modified"]),
+            "seconds": round(time.monotonic() - start, 3),
+        }
+        (directory / f"{version_name(version)}.json").write_text(
+            json.dumps({**summary, **diff}, indent=2) + "\n"
+        )
+        state["versions"].append(summary)
+        # Saved after every version, so an interrupted run resumes from here
+        (directory / STATE_FILE).write_text(json.dumps(state) + "\n")
+
+    return {
+        "module": module_spec["name"],
+        "directory": directory.as_posix(),
+        "reused": reused,
+        "versions": state["versions"][:versions],
+    }
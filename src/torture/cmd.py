@@ -1,11 +1,39 @@
 #!/usr/bin/env python3
+import asyncio
+import json
 import shutil
-import subprocess
+import ssl
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
 from pathlib import Path
 
 import click
 
-from src.torture import git, modulegen
+from src.torture import (
+    bench,
+    churn,
+    firehose,
+    git,
+    graphgen,
+    history,
+    initbench,
+    logsink,
+    logstream,
+    manifest,
+    metrics,
+    modulegen,
+    modulespec,
+    packbench,
+    payload,
+    pipeline,
+    planstream,
+    providers,
+    registry,
+    statebackend,
+    syntaxbench,
+    synthetic,
+)
 
 ARTIFACTS = Path("artifacts")
 
@@ -16,57 +44,1818 @@ def cli():
 
 
 @cli.command()
-def plan() -> None:
+@click.option(
+    "--gzip",
+    "gzip_level",
+    type=click.IntRange(1, 9),
+    help="Write plan.json.gz at this compression level instead of plan.json.",
+)
+@click.option(
+    "--no-analyze",
+    is_flag=True,
+    help="Do not analyze the plan JSON while it is written.",
+)
+@click.option(
+    "--ship-logs",
+    metavar="URL",
+    help="Stream the plan output to tcp://host:port or http://host:port/path.",
+)
+def plan(gzip_level: int | None, no_analyze: bool, ship_logs: str | None) -> None:
     """Run local plan."""
     if ARTIFACTS.exists():
         shutil.rmtree(ARTIFACTS)
     ARTIFACTS.mkdir()
 
     var_file = Path("torture.plan.tfvars")
-    subprocess.run(["tofu", "init"])
-    subprocess.run(
-        [
-            "sh",
-            "-c",
-            f"tofu plan -out artifacts/plan.bin -var-file={var_file.as_posix()} > artifacts/plan.log",
-        ]
+    try:
+        phases, artifacts = pipeline.run_plan(
+            ARTIFACTS,
+            var_file,
+            analyze=not no_analyze,
+            compress=gzip_level,
+            ship_logs=ship_logs,
+        )
+    except (ValueError, OSError) as e:
+        raise click.ClickException(str(e))
+    metrics.write_metrics(ARTIFACTS / "metrics.json", phases, artifacts)
+
+    report_path = ARTIFACTS / "plan-report.json"
+    if report_path.exists():
+        echo_plan_report(json.loads(report_path.read_text()))
+        click.echo()
+
+    click.echo(f"Generated artifacts for {var_file.as_posix()}:")
+    for name, size in artifacts.items():
+        click.echo(f"{manifest.format_size(size):>8}  {name}")
+    click.echo()
+    echo_phases(phases)
+    echo_pipes(phases)
+
+
+def run_apply_command(destroy, ship_logs):
+    """Run apply or destroy into the artifacts directory and report its phases"""
+    ARTIFACTS.mkdir(exist_ok=True)
+    var_file = Path("torture.plan.tfvars")
+    try:
+        phases = pipeline.run_apply(
+            ARTIFACTS, var_file, destroy=destroy, ship_logs=ship_logs
+        )
+    except (ValueError, OSError) as e:
+        raise click.ClickException(str(e))
+    name = phases[-1]["name"]
+    metrics.write_metrics(
+        ARTIFACTS / f"{name}-metrics.json",
+        phases,
+        {f"{name}.log": (ARTIFACTS / f"{name}.log").stat().st_size},
+    )
+    echo_phases(phases)
+    echo_pipes(phases)
+    if phases[-1]["returncode"] != 0:
+        raise click.ClickException(f"tofu {name} failed, see {ARTIFACTS / name}.log")
+
+
+@cli.command()
+@click.option(
+    "--ship-logs",
+    metavar="URL",
+    help="Stream the apply output to tcp://host:port or http://host:port/path.",
+)
+def apply(ship_logs: str | None) -> None:
+    """Run local apply, logging to artifacts/apply.log."""
+    run_apply_command(False, ship_logs)
+
+
+@cli.command()
+@click.option(
+    "--ship-logs",
+    metavar="URL",
+    help="Stream the destroy output to tcp://host:port or http://host:port/path.",
+)
+def destroy(ship_logs: str | None) -> None:
+    """Run local destroy, logging to artifacts/destroy.log."""
+    run_apply_command(True, ship_logs)
+
+
+def echo_pipes(phases):
+    """Print the throughput, sink times and errors of phases read from a pipe"""
+    for phase in phases:
+        pipe = phase.get("pipe")
+        if not pipe:
+            continue
+        sinks = ", ".join(f"{k} {v:.2f}s" for k, v in pipe["sink_seconds"].items())
+        click.echo(
+            f"\n{phase['name']} pipe: {manifest.format_size(pipe['bytes'])} in "
+            f"{pipe['seconds']:.2f}s ({pipe['mb_per_second']:.1f} MB/s, "
+            f"{pipe['reads']} reads), {sinks}"
+        )
+        for sink, error in pipe["errors"].items():
+            click.echo(f"❌ {sink}: {error}")
+
+
+def echo_phases(phases):
+    """Print a table of phase metrics"""
+    click.echo(
+        f"{'phase':<8} {'rc':>4} {'wall s':>9} {'user s':>9} {'sys s':>9} "
+        f"{'max rss':>9} {'tree rss':>9}"
+    )
+    for phase in phases:
+        click.echo(
+            f"{phase['name']:<8} {phase['returncode']:>4} "
+            f"{phase['wall_seconds']:>9.2f} {phase['user_seconds']:>9.2f} "
+            f"{phase['sys_seconds']:>9.2f} "
+            f"{manifest.format_size(phase['max_rss_bytes']):>9} "
+            f"{manifest.format_size(phase['peak_tree_rss_bytes']):>9}"
+        )
+
+
+@cli.command("analyze-plan")
+@click.argument(
+    "path",
+    default=ARTIFACTS / "plan.json",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+)
+@click.option(
+    "--top",
+    default=20,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of largest attributes to show.",
+)
+@click.option(
+    "--json",
+    "json_out",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Also write the full report as JSON to this file.",
+)
+def analyze_plan(path: Path, top: int, json_out: Path | None) -> None:
+    """Stream a plan JSON file (optionally .gz) and report what makes it large."""
+    try:
+        report = planstream.analyze_file(path, top=top)
+    except ValueError as e:
+        raise click.ClickException(f"{path}: {e}")
+    if json_out is not None:
+        json_out.write_text(json.dumps(report, indent=2) + "\n")
+    echo_plan_report(report)
+
+
+def echo_plan_report(report):
+    """Print the summary of a planstream report"""
+    size = manifest.format_size
+    click.echo(f"Plan JSON: {size(report['bytes'])}\n")
+
+    click.echo(f"{'section':<24} {'bytes':>9} {'share':>7}")
+    for name, section_bytes in report["sections"].items():
+        share = section_bytes / report["bytes"] * 100 if report["bytes"] else 0
+        click.echo(f"{name:<24} {size(section_bytes):>9} {share:>6.1f}%")
+
+    sections = planstream.RESOURCE_SECTIONS
+    header = " ".join(f"{s:>16}" for s in sections)
+    click.echo(f"\n{'address':<48} {'count':>7} {header}")
+    rows = sorted(
+        report["addresses"].items(),
+        key=lambda kv: -sum(s["bytes"] for s in kv[1].values()),
+    )
+    for address, stats in rows:
+        count = max(s["count"] for s in stats.values())
+        cells = " ".join(
+            f"{size(stats.get(s, {}).get('bytes', 0)):>16}" for s in sections
+        )
+        click.echo(f"{address:<48} {count:>7} {cells}")
+
+    click.echo(f"\n{'type':<32} {'changes':>8} {'bytes':>9}")
+    for rtype, stats in report["types"].items():
+        changes = stats.get("resource_changes")
+        if changes is None:
+            continue
+        click.echo(f"{rtype:<32} {changes['count']:>8} {size(changes['bytes']):>9}")
+
+    if report["change_size_histogram"]:
+        click.echo("\nresource_changes entry size:")
+        peak = max(b["count"] for b in report["change_size_histogram"])
+        for bucket in report["change_size_histogram"]:
+            bar = "#" * max(1, round(bucket["count"] / peak * 40))
+            click.echo(
+                f"  <= {size(bucket['max_bytes']):>6} {bucket['count']:>8} {bar}"
+            )
+
+    if report["largest_attributes"]:
+        click.echo("\nLargest attributes:")
+        for attr in report["largest_attributes"]:
+            click.echo(
+                f"{size(attr['bytes']):>9}  {attr['address']} {attr['attribute']} "
+                f"({attr['section']})"
+            )
+
+
+@cli.command("analyze-log")
+@click.argument(
+    "path",
+    default=ARTIFACTS / "plan.log",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+)
+@click.option(
+    "--follow",
+    "-f",
+    is_flag=True,
+    help="Keep reading while the log grows, until Ctrl-C or --idle-timeout.",
+)
+@click.option(
+    "--idle-timeout",
+    type=click.FloatRange(min=0),
+    help="Stop following after this many seconds without new lines.",
+)
+@click.option(
+    "--interval",
+    default=1.0,
+    show_default=True,
+    type=click.FloatRange(min=0, min_open=True),
+    help="Seconds per timeline bucket.",
+)
+@click.option(
+    "--top",
+    default=10,
+    show_default=True,
+    type=click.IntRange(min=0),
+    help="Number of longest resource spans to show.",
+)
+@click.option(
+    "--json",
+    "json_out",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Also write the full report as JSON to this file.",
+)
+def analyze_log(
+    path: Path,
+    follow: bool,
+    idle_timeout: float | None,
+    interval: float,
+    top: int,
+    json_out: Path | None,
+) -> None:
+    """Measure provisioner log throughput, resource spans and consumer lag."""
+
+    def progress(analyzer):
+        lag = logstream.histogram_percentile(analyzer.lag, 95)
+        click.echo(
+            f"{analyzer.log_lines} log lines, {manifest.format_size(analyzer.bytes)}, "
+            f"lag p95 <= {lag / 1000 if lag else 0:.0f}ms"
+        )
+
+    report = logstream.analyze_file(
+        path, interval, follow, idle_timeout, progress if follow else None
+    )
+    if json_out is not None:
+        json_out.write_text(json.dumps(report, indent=2) + "\n")
+
+    size = manifest.format_size
+    click.echo(
+        f"{report['lines']} lines ({size(report['bytes'])}), "
+        f"{report['log_lines']} log lines over {report['duration_seconds']:.1f}s"
     )
-    subprocess.run(
-        ["sh", "-c", "tofu show -json artifacts/plan.bin > artifacts/plan.json"]
+    if not report["log_lines"]:
+        return
+    if report["lines_per_second"] is not None:
+        click.echo(
+            f"Rate: {report['lines_per_second']:.0f} lines/s average, "
+            f"{report['peak_lines_per_second']:.0f} lines/s peak"
+        )
+    lag = report["lag_us"]
+    click.echo(
+        f"Lag (consumed - produced): p50 <= {lag['p50'] / 1000:.0f}ms, "
+        f"p95 <= {lag['p95'] / 1000:.0f}ms, max <= {lag['max'] / 1000:.0f}ms"
     )
 
-    click.echo(f"\nGenerated artifacts for {var_file.as_posix()}:")
-    subprocess.run(["sh", "-c", 'ls -alh artifacts | grep "plan."'])
+    # Merge timeline buckets so the table stays readable
+    timeline = report["timeline"]
+    step = max(1, -(-len(timeline) // 40))
+    peak = max(p["lines_per_second"] for p in timeline)
+    click.echo(f"\n{'t':>8} {'lines/s':>9} {'bytes/s':>9}")
+    for i in range(0, len(timeline), step):
+        group = timeline[i : i + step]
+        seconds = sum(p["seconds"] for p in group)
+        lines = sum(p["lines_per_second"] * p["seconds"] for p in group) / seconds
+        rate = sum(p["bytes_per_second"] * p["seconds"] for p in group) / seconds
+        bar = "#" * round(lines / peak * 40) if peak else ""
+        click.echo(f"{group[0]['t']:>7.1f}s {lines:>9.0f} {size(rate):>9} {bar}")
+
+    spans = [
+        (key, span)
+        for key, span in report["resources"].items()
+        if span.get("seconds") is not None
+    ]
+    spans.sort(key=lambda kv: -kv[1]["seconds"])
+    if top and spans:
+        click.echo(f"\n{'resource':<48} {'start':>8} {'span':>8} {'lines':>7} done")
+        for key, span in spans[:top]:
+            click.echo(
+                f"{key:<48} {span['start']:>7.1f}s {span['seconds']:>7.1f}s "
+                f"{span['lines']:>7} {'✓' if span['completed'] else '-'}"
+            )
+
+
+@cli.command("serve-logs")
+@click.option("--host", default="127.0.0.1", show_default=True)
+@click.option("--port", default=9880, show_default=True, type=click.IntRange(0, 65535))
+@click.option(
+    "--rate",
+    metavar="SIZE",
+    help="Ingest limit per second over all connections, e.g. 512K or 2M.",
+)
+@click.option(
+    "--latency",
+    default=0.0,
+    show_default=True,
+    type=click.FloatRange(min=0),
+    help="Seconds of processing delay per chunk.",
+)
+@click.option(
+    "--queue",
+    "queue_size",
+    default=logsink.QUEUE_SIZE,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Chunks buffered per connection before pushing back or dropping.",
+)
+@click.option("--drop", is_flag=True, help="Drop chunks when the queue is full.")
+@click.option(
+    "--stall",
+    default=logsink.STALL_THRESHOLD,
+    show_default=True,
+    type=click.FloatRange(min=0, min_open=True),
+    help="Seconds without progress reported as a stall.",
+)
+@click.option(
+    "--events",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Write chunk arrivals, drops and stalls as JSON lines to this file.",
+)
+@click.option(
+    "--json",
+    "json_out",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Write the summary as JSON to this file on exit.",
+)
+def serve_logs(
+    host: str,
+    port: int,
+    rate: str | None,
+    latency: float,
+    queue_size: int,
+    drop: bool,
+    stall: float,
+    events: Path | None,
+    json_out: Path | None,
+) -> None:
+    """Run a local log collector stand-in over raw TCP or chunked HTTP."""
+    try:
+        rate_bytes = manifest.parse_size(rate) if rate else None
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--rate")
+
+    with open(events, "w") if events is not None else nullcontext() as events_file:
+        server = logsink.IngestServer(
+            rate_bytes, latency, queue_size, drop, stall, events=events_file
+        )
+        click.echo(f"Accepting logs on tcp://{host}:{port} and http://{host}:{port}/")
+        try:
+            asyncio.run(server.serve(host, port))
+        except KeyboardInterrupt:
+            pass
+
+    summary = server.summary()
+    if json_out is not None:
+        json_out.write_text(json.dumps(summary, indent=2) + "\n")
+    size = manifest.format_size
+    click.echo(
+        f"\n{'conn':>4} {'proto':<5} {'seconds':>8} {'received':>9} {'dropped':>9} "
+        f"{'queue':>6} {'stalls':>6} {'lag p95':>9}"
+    )
+    for conn in summary["connections"]:
+        lag = conn["lag_us_p95"]
+        click.echo(
+            f"{conn['id']:>4} {conn['protocol'] or '-':<5} {conn['seconds']:>8.1f} "
+            f"{size(conn['received_bytes']):>9} {size(conn['dropped_bytes']):>9} "
+            f"{conn['max_queue_depth']:>6} {len(conn['stalls']):>6} "
+            f"{f'{lag / 1000:.0f}ms' if lag else '-':>9}"
+        )
+
+
+@cli.command(
+    "firehose",
+    context_settings={"ignore_unknown_options": True, "help_option_names": []},
+)
+@click.argument("args", nargs=-1, type=click.UNPROCESSED)
+def firehose_cmd(args: tuple[str, ...]) -> None:
+    """Emit provisioner log lines at a controlled rate (see firehose --help)."""
+    firehose.main(list(args))
+
+
+@cli.command("bench")
+@click.option(
+    "--grid",
+    "grid_specs",
+    multiple=True,
+    metavar="NAME=V1,V2",
+    help=f"Values to sweep for a variable, one of: {', '.join(bench.GRID_VARIABLES)}.",
+)
+@click.option(
+    "--repeat",
+    default=3,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Runs per grid point.",
+)
+@click.option(
+    "--var-file",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="tfvars file passed to every plan.",
+)
+@click.option(
+    "--keep-artifacts",
+    is_flag=True,
+    help="Keep the artifacts of every run instead of only the last one per point.",
+)
+def bench_cmd(
+    grid_specs: tuple[str, ...],
+    repeat: int,
+    var_file: Path | None,
+    keep_artifacts: bool,
+) -> None:
+    """Sweep plan over a grid of variables and summarize phase metrics."""
+    try:
+        grid = bench.parse_grid(grid_specs)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--grid")
+
+    workdir = ARTIFACTS / "bench"
+    try:
+        points = bench.run_sweep(grid, repeat, workdir, var_file, keep_artifacts)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--var-file")
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+
+    fits = [
+        fit
+        for phase in ["plan", "show"]
+        if (fit := bench.fit_scaling(points, phase)) is not None
+    ]
+    (workdir / "bench.json").write_text(
+        json.dumps(
+            {"grid": grid, "repeat": repeat, "points": points, "fits": fits}, indent=2
+        )
+        + "\n"
+    )
+
+    click.echo()
+    click.echo(
+        f"{'point':<6} {'phase':<6} {'wall med':>9} {'wall p95':>9} {'cpu med':>9} "
+        f"{'rss med':>9} {'rss p95':>9}"
+    )
+    for index, point in enumerate(points):
+        for name, stats in point["summary"]["phases"].items():
+            cpu = stats["user_seconds"]["median"] + stats["sys_seconds"]["median"]
+            click.echo(
+                f"{index + 1:<6} {name:<6} {stats['wall_seconds']['median']:>9.2f} "
+                f"{stats['wall_seconds']['p95']:>9.2f} {cpu:>9.2f} "
+                f"{manifest.format_size(stats['max_rss_bytes']['median']):>9} "
+                f"{manifest.format_size(stats['max_rss_bytes']['p95']):>9}"
+            )
+        sizes = ", ".join(
+            f"{name} {manifest.format_size(stats['median'])}"
+            for name, stats in point["summary"]["artifacts"].items()
+        )
+        click.echo(f"{'':<6} {sizes}")
+
+    for fit in fits:
+        click.echo(f"\n{fit['phase']} wall time vs resources: {fit['scaling']}")
+        click.echo(
+            f"  linear: {fit['linear']['slope'] * 1000:.3f}s per 1000 resources "
+            f"(r2 {fit['linear']['r2']:.3f})"
+        )
+        if fit["power"]:
+            click.echo(
+                f"  power law: exponent {fit['power']['exponent']:.2f} "
+                f"(r2 {fit['power']['r2']:.3f})"
+            )
+        if fit["knee_resources"] is not None:
+            click.echo(f"  knee at ~{fit['knee_resources']} resources")
+    click.echo(f"\nResults written to {workdir / 'bench.json'}")
+
+
+@cli.command("bench-init")
+@click.option(
+    "--config",
+    default=".",
+    show_default=True,
+    type=click.Path(exists=True, file_okay=False, path_type=Path),
+    help="Root configuration to initialize.",
+)
+@click.option(
+    "--scenario",
+    "scenarios",
+    multiple=True,
+    type=click.Choice(list(initbench.SCENARIOS)),
+    help="Scenario to run, repeatable. Defaults to all.",
+)
+@click.option(
+    "--repeat",
+    default=3,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Runs per scenario.",
+)
+@click.option(
+    "--cli-config",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="CLI configuration passed as TF_CLI_CONFIG_FILE, e.g. from gen-providers.",
+)
+@click.option(
+    "--workdir",
+    default=ARTIFACTS / "bench-init",
+    show_default=True,
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory for work dirs and init logs, replaced if it exists.",
+)
+@click.option(
+    "--json",
+    "json_out",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Write all runs and summaries as JSON to this file.",
+)
+def bench_init(
+    config: Path,
+    scenarios: tuple[str, ...],
+    repeat: int,
+    cli_config: Path | None,
+    workdir: Path,
+    json_out: Path | None,
+) -> None:
+    """Time tofu init with cold and warm plugin and module caches."""
+    try:
+        results = initbench.run_bench(config, workdir, scenarios, repeat, cli_config)
+    except (RuntimeError, OSError) as e:
+        raise click.ClickException(str(e))
+    if json_out is not None:
+        json_out.write_text(json.dumps(results, indent=2) + "\n")
+
+    size = manifest.format_size
+    click.echo(
+        f"\n{'scenario':<14} {'init p50':>9} {'init p95':>9} {'total p50':>9} "
+        f"{'files':>7} {'created':>9} {'written':>9} {'seeded':>9}"
+    )
+    for name, result in results.items():
+        s = result["summary"]
+        click.echo(
+            f"{name:<14} {s['init_seconds']['median']:>8.2f}s "
+            f"{s['init_seconds']['p95']:>8.2f}s {s['total_seconds']['median']:>8.2f}s "
+            f"{s['files_created']['median']:>7.0f} "
+            f"{size(s['bytes_created']['median']):>9} "
+            f"{size(s['write_bytes']['median']):>9} "
+            f"{size(s['seed_bytes']['median']):>9}"
+        )
+
+
+@cli.command("bench-pack")
+@click.argument(
+    "paths",
+    nargs=-1,
+    type=click.Path(exists=True, file_okay=False, path_type=Path),
+)
+@click.option(
+    "--gz-level",
+    "gz_levels",
+    multiple=True,
+    default=(1, 6, 9),
+    show_default=True,
+    type=click.IntRange(1, 9),
+    help="gzip level, repeatable.",
+)
+@click.option(
+    "--xz-level",
+    "xz_levels",
+    multiple=True,
+    default=(0, 6),
+    show_default=True,
+    type=click.IntRange(0, 9),
+    help="xz preset, repeatable.",
+)
+@click.option(
+    "--threads",
+    type=click.IntRange(min=1),
+    help="Compression threads. Defaults to the number of CPUs.",
+)
+@click.option(
+    "--block-size",
+    help="Input bytes per compressed block, e.g. 4M. Defaults to 1M for gz, 8M for xz.",
+)
+@click.option(
+    "--repeat",
+    default=1,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Runs per file class and level.",
+)
+@click.option(
+    "--output",
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Keep the archives in this directory instead of discarding them.",
+)
+@click.option(
+    "--json",
+    "json_out",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Write all runs and summaries as JSON to this file.",
+)
+def bench_pack(
+    paths: tuple[Path, ...],
+    gz_levels: tuple[int, ...],
+    xz_levels: tuple[int, ...],
+    threads: int | None,
+    block_size: str | None,
+    repeat: int,
+    output: Path | None,
+    json_out: Path | None,
+) -> None:
+    """Time tar.gz and tar.xz packing of module trees per file class and level."""
+    try:
+        block_bytes = manifest.parse_size(block_size) if block_size else None
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--block-size")
+    if block_bytes is not None and block_bytes < 1:
+        raise click.BadParameter("must be positive", param_hint="--block-size")
+    paths = paths or (modulegen.MODULES_DIR,)
+    try:
+        results = packbench.run_bench(
+            paths, gz_levels, xz_levels, threads, repeat, block_bytes, output
+        )
+    except OSError as e:
+        raise click.ClickException(str(e))
+    if not results:
+        raise click.ClickException(f"No files found in {', '.join(map(str, paths))}")
+    if json_out is not None:
+        json_out.write_text(json.dumps(results, indent=2) + "\n")
+
+    size = manifest.format_size
+    click.echo(
+        f"{'class':<7} {'files':>6} {'format':>7} {'input':>8} {'output':>8} "
+        f"{'ratio':>7} {'MB/s':>8} {'seconds':>8} {'peak rss':>9} {'py heap':>9}"
+    )
+    for r in results:
+        s = r["summary"]
+        rss = s.get("peak_rss_bytes")
+        click.echo(
+            f"{r['class']:<7} {r['files']:>6} {r['format'] + '-' + str(r['level']):>7} "
+            f"{size(r['input_bytes']):>8} {size(r['output_bytes']):>8} "
+            f"{r['ratio']:>7.2f} {s['mb_per_second']['median']:>8.1f} "
+            f"{s['seconds']['median']:>8.2f} "
+            f"{size(rss['median']) if rss else '-':>9} "
+            f"{size(s['python_peak_bytes']['median']):>9}"
+        )
+    click.echo(f"\n{results[0]['threads']} compression thread(s)")
+
+
+@cli.command("bench-syntax")
+@click.option(
+    "--spec",
+    "spec_files",
+    multiple=True,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="JSON module spec file. Defaults to the built-in modules.",
+)
+@click.option(
+    "--module",
+    "module_names",
+    multiple=True,
+    help="Only benchmark modules with this name.",
+)
+@click.option(
+    "--command",
+    "commands",
+    multiple=True,
+    type=click.Choice(list(syntaxbench.COMMANDS)),
+    help="tofu command to time, repeatable. Defaults to all.",
+)
+@click.option(
+    "--repeat",
+    default=3,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Runs per module, command and syntax.",
+)
+@click.option("--seed", default=0, show_default=True, type=int)
+@click.option(
+    "--scale",
+    default=1.0,
+    show_default=True,
+    type=click.FloatRange(min=0, min_open=True),
+    help="Factor applied to file counts, resource counts and payload sizes.",
+)
+@click.option(
+    "--cli-config",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="CLI configuration passed as TF_CLI_CONFIG_FILE.",
+)
+@click.option(
+    "--workdir",
+    default=ARTIFACTS / "bench-syntax",
+    show_default=True,
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory for both variants and the logs, replaced if it exists.",
+)
+@click.option(
+    "--json",
+    "json_out",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Write all runs and summaries as JSON to this file.",
+)
+def bench_syntax(
+    spec_files: tuple[Path, ...],
+    module_names: tuple[str, ...],
+    commands: tuple[str, ...],
+    repeat: int,
+    seed: int,
+    scale: float,
+    cli_config: Path | None,
+    workdir: Path,
+    json_out: Path | None,
+) -> None:
+    """Time tofu validate and plan on HCL and .tf.json variants of modules."""
+    try:
+        if spec_files:
+            specs = [s for path in spec_files for s in modulespec.load_specs(path)]
+        else:
+            specs = modulespec.builtin_specs()
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    if module_names:
+        specs = [s for s in specs if s["name"] in module_names]
+
+    try:
+        results = syntaxbench.run_bench(
+            specs, workdir, commands, repeat, seed, scale, cli_config
+        )
+    except (RuntimeError, OSError) as e:
+        raise click.ClickException(str(e))
+    if json_out is not None:
+        json_out.write_text(json.dumps(results, indent=2) + "\n")
+
+    size = manifest.format_size
+    click.echo(
+        f"\n{'module':<32} {'command':<9} {'hcl':>8} {'json':>8} {'hcl p50':>8} "
+        f"{'json p50':>8} {'json/hcl':>8} {'hcl rss':>8} {'json rss':>8}"
+    )
+    for name, result in results.items():
+        for command, variants in result["commands"].items():
+            hcl_s = variants["hcl"]["summary"]
+            json_s = variants["json"]["summary"]
+            hcl_wall = hcl_s["wall_seconds"]["median"]
+            json_wall = json_s["wall_seconds"]["median"]
+            click.echo(
+                f"{name:<32} {command:<9} {size(result['bytes']['hcl']):>8} "
+                f"{size(result['bytes']['json']):>8} {hcl_wall:>7.2f}s "
+                f"{json_wall:>7.2f}s {json_wall / hcl_wall if hcl_wall else 0:>8.2f} "
+                f"{size(hcl_s['max_rss_bytes']['median']):>8} "
+                f"{size(json_s['max_rss_bytes']['median']):>8}"
+            )
+
+
+def report_build_stats(stats):
+    """Print the seconds per build phase, traced memory and profiles of modules"""
+    phases = modulegen.BUILD_PHASES
+    traced = any("peak" in s for s in stats)
+    click.echo(
+        f"\n{'module':<40} {'wall':>7} "
+        + " ".join(f"{p:>8}" for p in phases)
+        + (f" {'peak':>8}" if traced else "")
+    )
+    for s in stats:
+        row = " ".join(f"{s['phases'][p]:>8.2f}" for p in phases)
+        peak = f" {manifest.format_size(s['peak']):>8}" if "peak" in s else ""
+        click.echo(f"{s['module']:<40} {s['seconds']:>7.2f} {row}{peak}")
+    for s in stats:
+        if s.get("retained"):
+            click.echo(
+                f"\nAllocations of {s['module']} still alive after a file was "
+                "built, largest per site (not the allocations at the peak):"
+            )
+            for site in s["retained"]:
+                click.echo(
+                    f"  {manifest.format_size(site['size']):>8} "
+                    f"{site['count']:>7} {site['site']}"
+                )
+    profiles = [s["profile"] for s in stats if s.get("profile")]
+    if profiles:
+        click.echo(f"\nProfiles written to {profiles[0].parent.as_posix()}:")
+        for path in profiles:
+            click.echo(f"  {path.name} ({path.with_suffix('.txt').name})")
 
 
 @cli.command()
-def gen_modules() -> None:
+@click.option(
+    "--jobs",
+    "-j",
+    default=1,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of worker processes used to render and compress module files.",
+)
+@click.option(
+    "--seed",
+    default=0,
+    show_default=True,
+    type=int,
+    help="Base RNG seed. Each file task derives its own seed from it.",
+)
+@click.option(
+    "--force",
+    is_flag=True,
+    help="Remove existing modules and rebuild them from scratch.",
+)
+@click.option(
+    "--spec",
+    "spec_files",
+    multiple=True,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="JSON module spec file. Defaults to the built-in modules.",
+)
+@click.option(
+    "--module",
+    "module_names",
+    multiple=True,
+    help="Only generate modules with this name.",
+)
+@click.option(
+    "--scale",
+    default=1.0,
+    show_default=True,
+    type=click.FloatRange(min=0, min_open=True),
+    help="Factor applied to file counts, resource counts and payload sizes.",
+)
+@click.option(
+    "--publish-target",
+    default="github",
+    show_default=True,
+    metavar="github|URL|DIR",
+    help="Push to GitHub, or to bare repositories under a file:// URL or directory.",
+)
+@click.option(
+    "--publish-jobs",
+    default=git.PUBLISH_JOBS,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Modules pushed concurrently.",
+)
+@click.option(
+    "--retries",
+    default=git.RETRIES,
+    show_default=True,
+    type=click.IntRange(min=0),
+    help="Push attempts after a failed one.",
+)
+@click.option(
+    "--remove-modules",
+    is_flag=True,
+    help="Remove module directories and their manifests after they were published.",
+)
+@click.option(
+    "--syntax",
+    default="hcl",
+    show_default=True,
+    type=click.Choice(modulegen.SYNTAXES),
+    help="Write templates as native HCL or as .tf.json files with the same values.",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Profile the built files of every module with cProfile.",
+)
+@click.option(
+    "--profile-dir",
+    default=ARTIFACTS / "profile",
+    show_default=True,
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory for the <module>.prof pstats files and their text reports.",
+)
+@click.option(
+    "--trace-memory",
+    is_flag=True,
+    help="Trace peak memory and retained allocation sites of every module with tracemalloc.",
+)
+def gen_modules(
+    jobs: int,
+    seed: int,
+    force: bool,
+    spec_files: tuple[Path, ...],
+    module_names: tuple[str, ...],
+    scale: float,
+    publish_target: str,
+    publish_jobs: int,
+    retries: int,
+    remove_modules: bool,
+    syntax: str,
+    profile: bool,
+    profile_dir: Path,
+    trace_memory: bool,
+) -> None:
     """Generate module templates."""
+    try:
+        if spec_files:
+            specs = [s for path in spec_files for s in modulespec.load_specs(path)]
+        else:
+            specs = modulespec.builtin_specs()
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    if module_names:
+        specs = [s for s in specs if s["name"] in module_names]
 
-    if modulegen.MODULES_DIR.exists():
-        for m in modulegen.MODULES_DIR.glob("module-*"):
-            click.echo(f"Removing existing module: {m}")
-            shutil.rmtree(m)
-            click.echo("Done")
+    module_dirs = [modulegen.MODULES_DIR / s["name"] for s in specs]
+    if force:
+        for m in module_dirs:
+            if m.exists():
+                click.echo(f"Removing existing module: {m}")
+                manifest.remove_module(m)
+                click.echo("Done")
 
     modulegen.MODULES_DIR.mkdir(parents=True, exist_ok=True)
+    click.echo(f"Using seed {seed} with {jobs} job(s)")
     click.echo()
 
+    if not profile:
+        profile_dir = None
+
     # Create all modules
-    modulegen.create_module_01_huge_single_file()
-    modulegen.create_module_02_multiple_large_files()
-    modulegen.create_module_03_many_tiny_files()
-    modulegen.create_module_04_medium_complexity()
-    modulegen.create_module_05_deep_nested()
-    modulegen.create_module_06_data_heavy()
-    modulegen.create_module_07_variable_explosion()
-    modulegen.create_module_08_mixed_sizes()
-    modulegen.create_module_09_submodules()
-    modulegen.create_module_10_extreme()
-
-    for m in modulegen.MODULES_DIR.glob("module-*"):
-        click.echo("Commiting module to own repository")
-        git.push_module_to_github(m)
+    if jobs == 1:
+        stats = [
+            modulegen.build_module(
+                module_spec,
+                seed=seed,
+                force=force,
+                scale=scale,
+                syntax=syntax,
+                profile_dir=profile_dir,
+                trace_memory=trace_memory,
+            )
+            for module_spec in specs
+        ]
+    else:
+        # Module builds only schedule file tasks and wait for them, so they
+        # run in threads while the CPU-bound rendering and compression goes
+        # to the process pool.
+        with (
+            ProcessPoolExecutor(max_workers=jobs) as pool,
+            ThreadPoolExecutor(max_workers=max(len(specs), 1)) as modules,
+        ):
+            futures = [
+                modules.submit(
+                    modulegen.build_module,
+                    module_spec,
+                    pool,
+                    seed,
+                    force,
+                    scale,
+                    syntax,
+                    profile_dir=profile_dir,
+                    trace_memory=trace_memory,
+                )
+                for module_spec in specs
+            ]
+            stats = [future.result() for future in futures]
+    if profile_dir is not None:
+        shutil.rmtree(profile_dir / ".tasks", ignore_errors=True)
+    report_build_stats(stats)
+
+    click.echo(f"\nPublishing {len(module_dirs)} module(s) to {publish_target}")
+    results = git.publish_modules(
+        module_dirs, publish_target, publish_jobs, retries, remove_modules
+    )
+
+    click.echo(f"\n{'module':<40} {'seconds':>8} {'bytes':>8} {'tries':>5}")
+    for r in results:
+        click.echo(
+            f"{r['module']:<40} {r['seconds']:>8.2f} "
+            f"{manifest.format_size(r['bytes']):>8} {r['attempts']:>5} "
+            f"{'✓' if r['ok'] else '❌'}"
+        )
+    failed = [r["module"] for r in results if not r["ok"]]
+    if failed:
+        raise click.ClickException(f"Failed to publish: {', '.join(failed)}")
+
+
+@cli.command("gen-history")
+@click.option(
+    "--spec",
+    "spec_files",
+    multiple=True,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="JSON module spec file. Defaults to the built-in modules.",
+)
+@click.option(
+    "--module",
+    "module_names",
+    multiple=True,
+    help="Only generate histories of modules with this name.",
+)
+@click.option(
+    "--output",
+    default=history.HISTORY_DIR,
+    show_default=True,
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory of the bare repositories.",
+)
+@click.option("--commits", default=1000, show_default=True, type=click.IntRange(min=1))
+@click.option(
+    "--tf-churn",
+    default=0.05,
+    show_default=True,
+    type=click.FloatRange(0, 1),
+    help="Fraction of .tf files rewritten per commit (at least one).",
+)
+@click.option(
+    "--bin-churn",
+    default=0.01,
+    show_default=True,
+    type=click.FloatRange(0, 1),
+    help="Fraction of payload files regenerated per commit.",
+)
+@click.option(
+    "--tag-every",
+    default=50,
+    show_default=True,
+    type=click.IntRange(min=0),
+    help="Commits between annotated tags, 0 for no tags.",
+)
+@click.option("--branches", default=0, show_default=True, type=click.IntRange(min=0))
+@click.option("--seed", default=0, show_default=True, type=int)
+@click.option(
+    "--scale",
+    default=1.0,
+    show_default=True,
+    type=click.FloatRange(min=0, min_open=True),
+    help="Factor applied to file counts, resource counts and payload sizes.",
+)
+@click.option("--repack", is_flag=True, help="Repack the repositories after import.")
+@click.option(
+    "--clone-bench",
+    is_flag=True,
+    help="Time full and shallow clones of every generated repository.",
+)
+def gen_history(
+    spec_files: tuple[Path, ...],
+    module_names: tuple[str, ...],
+    output: Path,
+    commits: int,
+    tf_churn: float,
+    bin_churn: float,
+    tag_every: int,
+    branches: int,
+    seed: int,
+    scale: float,
+    repack: bool,
+    clone_bench: bool,
+) -> None:
+    """Generate module repositories with deep histories via git fast-import."""
+    try:
+        if spec_files:
+            specs = [s for path in spec_files for s in modulespec.load_specs(path)]
+        else:
+            specs = modulespec.builtin_specs()
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    if module_names:
+        specs = [s for s in specs if s["name"] in module_names]
+
+    size = manifest.format_size
+    click.echo(f"{'module':<32} {'commits':>7} {'tags':>5} {'seconds':>8} {'pack':>8}")
+    for module_spec in specs:
+        try:
+            result = history.generate_history(
+                module_spec,
+                output,
+                commits,
+                tf_churn,
+                bin_churn,
+                tag_every,
+                branches,
+                seed,
+                scale,
+                repack,
+            )
+        except (RuntimeError, OSError) as e:
+            raise click.ClickException(f"{module_spec['name']}: {e}")
+        click.echo(
+            f"{result['module']:<32} {result['commits']:>7} {result['tags']:>5} "
+            f"{result['import_seconds']:>8.2f} {size(result['pack_bytes']):>8}"
+        )
+        if clone_bench:
+            clones = history.clone_bench(Path(result["repository"]))
+            click.echo(
+                "  "
+                + ", ".join(
+                    f"{c['mode']} clone {c['seconds']:.2f}s {size(c['bytes'])}"
+                    for c in clones
+                )
+            )
+    click.echo(f"\nRepositories written to {output}")
+
+
+@cli.command("gen-versions")
+@click.option(
+    "--spec",
+    "spec_files",
+    multiple=True,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="JSON module spec file. Defaults to the built-in modules.",
+)
+@click.option(
+    "--module",
+    "module_names",
+    multiple=True,
+    help="Only generate versions of modules with this name.",
+)
+@click.option(
+    "--output",
+    default=churn.VERSIONS_DIR,
+    show_default=True,
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory of the version series.",
+)
+@click.option(
+    "--versions",
+    default=10,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of versions including the initial one.",
+)
+@click.option(
+    "--tf-churn",
+    default=0.05,
+    show_default=True,
+    type=click.FloatRange(0, 1),
+    help="Fraction of .tf files rewritten per version.",
+)
+@click.option(
+    "--add",
+    default=0.01,
+    show_default=True,
+    type=click.FloatRange(min=0),
+    help="New .tf files per version, as a fraction of the .tf files.",
+)
+@click.option(
+    "--remove",
+    default=0.01,
+    show_default=True,
+    type=click.FloatRange(min=0),
+    help="Added .tf files removed per version, as a fraction of the .tf files.",
+)
+@click.option(
+    "--bin-churn",
+    default=0.01,
+    show_default=True,
+    type=click.FloatRange(0, 1),
+    help="Fraction of payload files rewritten per version.",
+)
+@click.option("--seed", default=0, show_default=True, type=int)
+@click.option(
+    "--scale",
+    default=1.0,
+    show_default=True,
+    type=click.FloatRange(min=0, min_open=True),
+    help="Factor applied to file counts, resource counts and payload sizes.",
+)
+@click.option("--force", is_flag=True, help="Rebuild existing version series.")
+@click.option(
+    "--json",
+    "json_out",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Write the version summaries as JSON to this file.",
+)
+def gen_versions(
+    spec_files: tuple[Path, ...],
+    module_names: tuple[str, ...],
+    output: Path,
+    versions: int,
+    tf_churn: float,
+    add: float,
+    remove: float,
+    bin_churn: float,
+    seed: int,
+    scale: float,
+    force: bool,
+    json_out: Path | None,
+) -> None:
+    """Evolve modules through configuration versions with diff manifests."""
+    try:
+        if spec_files:
+            specs = [s for path in spec_files for s in modulespec.load_specs(path)]
+        else:
+            specs = modulespec.builtin_specs()
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    if module_names:
+        specs = [s for s in specs if s["name"] in module_names]
+
+    size = manifest.format_size
+    results = []
+    for module_spec in specs:
+        try:
+            result = churn.generate_versions(
+                module_spec,
+                output,
+                versions,
+                tf_churn,
+                add,
+                remove,
+                bin_churn,
+                seed,
+                scale,
+                force,
+            )
+        except OSError as e:
+            raise click.ClickException(f"{module_spec['name']}: {e}")
+        results.append(result)
+        click.echo(
+            f"\n{result['module']} ({result['reused']} version(s) reused)\n"
+            f"{'version':>7} {'files':>7} {'size':>8} {'added':>6} {'changed':>7} "
+            f"{'removed':>7} {'delta':>8} {'seconds':>8}"
+        )
+        for v in result["versions"]:
+            click.echo(
+                f"{v['version']:>7} {v['files']:>7} {size(v['bytes']):>8} "
+                f"{v['added']:>6} {v['modified']:>7} {v['removed']:>7} "
+                f"{size(v['delta_bytes']):>8} {v['seconds']:>8.2f}"
+            )
+    if json_out is not None:
+        json_out.write_text(json.dumps(results, indent=2) + "\n")
+    click.echo(f"\nVersions written to {output}")
+
+
+@cli.command("gen-graph")
+@click.option(
+    "--shape",
+    default="random",
+    show_default=True,
+    type=click.Choice(graphgen.SHAPES),
+    help="Dependency graph topology.",
+)
+@click.option(
+    "--nodes",
+    "node_counts",
+    multiple=True,
+    default=(1000,),
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of resources, repeatable to generate a series of sizes.",
+)
+@click.option(
+    "--density",
+    default=0.01,
+    show_default=True,
+    type=click.FloatRange(0, 1),
+    help="Probability of every backward edge of a random DAG.",
+)
+@click.option(
+    "--width",
+    default=4,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Parallel nodes between the joins of a diamond chain.",
+)
+@click.option(
+    "--modules",
+    default=0,
+    show_default=True,
+    type=click.IntRange(min=0),
+    help="Child modules to split the nodes into, 0 for a flat root module.",
+)
+@click.option(
+    "--refs",
+    default="mixed",
+    show_default=True,
+    type=click.Choice(graphgen.REFS),
+    help="How edges are expressed.",
+)
+@click.option("--seed", default=0, show_default=True, type=int)
+@click.option(
+    "--output",
+    default=modulegen.MODULES_DIR,
+    show_default=True,
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Parent directory of the graph-SHAPE-NODES configurations.",
+)
+@click.option(
+    "--json",
+    "json_out",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Write the graph summaries as JSON to this file.",
+)
+def gen_graph(
+    shape: str,
+    node_counts: tuple[int, ...],
+    density: float,
+    width: int,
+    modules: int,
+    refs: str,
+    seed: int,
+    output: Path,
+    json_out: Path | None,
+) -> None:
+    """Generate configurations whose resources form dependency graph shapes."""
+    size = manifest.format_size
+    results = []
+    click.echo(
+        f"{'directory':<40} {'nodes':>7} {'edges':>8} {'depends':>8} {'cross':>7} "
+        f"{'depth':>6} {'max in':>7} {'max out':>7} {'size':>8}"
+    )
+    for nodes in node_counts:
+        directory = output / f"graph-{shape}-{nodes}"
+        result = graphgen.generate_graph(
+            directory, shape, nodes, density, width, modules, refs, seed
+        )
+        results.append(result)
+        click.echo(
+            f"{result['directory']:<40} {result['nodes']:>7} {result['edges']:>8} "
+            f"{result['depends_on']:>8} {result['cross_module_edges']:>7} "
+            f"{result['longest_path']:>6} {result['max_in_degree']:>7} "
+            f"{result['max_out_degree']:>7} {size(result['bytes']):>8}"
+        )
+    if json_out is not None:
+        json_out.write_text(json.dumps(results, indent=2) + "\n")
+
+
+@cli.command("gen-state")
+@click.option("--small", default=1000, show_default=True, type=click.IntRange(min=0))
+@click.option("--medium", default=1000, show_default=True, type=click.IntRange(min=0))
+@click.option("--heavy", default=1000, show_default=True, type=click.IntRange(min=0))
+@click.option(
+    "--state",
+    "state_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Write a terraform.tfstate v4 file here.",
+)
+@click.option(
+    "--plan",
+    "plan_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Write a show -json plan document here.",
+)
+@click.option(
+    "--replace",
+    is_flag=True,
+    help="Plan replacements with a prior state instead of creations.",
+)
+@click.option(
+    "--gzip",
+    "gzip_level",
+    type=click.IntRange(1, 9),
+    help="Gzip the documents at this level.",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    default=1,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of worker processes encoding resources.",
+)
+@click.option(
+    "--exact",
+    is_flag=True,
+    help="Compute the heavy triggers of every index instead of reusing a pool.",
+)
+@click.option(
+    "--timestamp",
+    default=synthetic.TIMESTAMP,
+    show_default=True,
+    help="Value of timestamp() in the triggers.",
+)
+def gen_state(
+    small: int,
+    medium: int,
+    heavy: int,
+    state_path: Path | None,
+    plan_path: Path | None,
+    replace: bool,
+    gzip_level: int | None,
+    jobs: int,
+    exact: bool,
+    timestamp: str,
+) -> None:
+    """Write synthetic state and plan JSON for main.tf without running tofu."""
+    if state_path is None and plan_path is None:
+        suffix = ".gz" if gzip_level else ""
+        state_path = ARTIFACTS / f"terraform.tfstate{suffix}"
+        plan_path = ARTIFACTS / f"plan.json{suffix}"
+    counts = {
+        "small_resource": small,
+        "medium_resource": medium,
+        "heavy_resource": heavy,
+    }
+    try:
+        options = synthetic.build_options(timestamp, replace=replace, exact=exact)
+        synthetic.Triggers(timestamp)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--timestamp")
+
+    pool = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+    results = []
+    try:
+        if state_path is not None:
+            state_path.parent.mkdir(parents=True, exist_ok=True)
+            results.append(
+                synthetic.write_state(state_path, counts, options, pool, gzip_level)
+            )
+        if plan_path is not None:
+            plan_path.parent.mkdir(parents=True, exist_ok=True)
+            results.append(
+                synthetic.write_plan(plan_path, counts, options, pool, gzip_level)
+            )
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    size = manifest.format_size
+    for r in results:
+        click.echo(
+            f"✓ {r['path']}: {r['resources']} resources, {size(r['bytes'])} in "
+            f"{r['seconds']:.1f}s ({r['bytes'] / max(r['seconds'], 1e-9) / 1e6:.0f} MB/s)"
+        )
+
+
+@cli.command("gen-providers")
+@click.option(
+    "--output",
+    default=providers.PROVIDERS_DIR,
+    show_default=True,
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory of the mirror, config and CLI config, replaced if it exists.",
+)
+@click.option(
+    "--count",
+    default=50,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of fake providers.",
+)
+@click.option(
+    "--size",
+    default="10M",
+    show_default=True,
+    metavar="SIZE",
+    help="Binary size of every provider package, e.g. 100M.",
+)
+@click.option(
+    "--versions",
+    default=1,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Releases per provider.",
+)
+@click.option(
+    "--platform",
+    "platforms",
+    multiple=True,
+    metavar="OS_ARCH",
+    help="Package target, repeatable. Defaults to the current platform.",
+)
+@click.option(
+    "--source",
+    type=click.Choice(payload.SOURCES),
+    default="random",
+    show_default=True,
+    help="Binary contents, incompressible or zeros.",
+)
+@click.option(
+    "--compression-level",
+    default=6,
+    show_default=True,
+    type=click.IntRange(0, 9),
+    help="Deflate level of the zip packages.",
+)
+@click.option("--seed", default=0, show_default=True, type=int)
+@click.option(
+    "--jobs",
+    "-j",
+    default=1,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of worker processes building packages.",
+)
+def gen_providers(
+    output: Path,
+    count: int,
+    size: str,
+    versions: int,
+    platforms: tuple[str, ...],
+    source: str,
+    compression_level: int,
+    seed: int,
+    jobs: int,
+) -> None:
+    """Generate a local provider mirror with fake provider packages."""
+    try:
+        size_bytes = manifest.parse_size(size)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--size")
+
+    pool = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+    try:
+        result = providers.generate_mirror(
+            output,
+            count,
+            size_bytes,
+            versions,
+            platforms,
+            source,
+            compression_level,
+            seed,
+            pool,
+        )
+    except OSError as e:
+        raise click.ClickException(str(e))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    fmt = manifest.format_size
+    click.echo(
+        f"✓ {result['packages']} package(s) of {result['providers']} provider(s) for "
+        f"{', '.join(result['platforms'])}: {fmt(result['package_bytes'])} packed, "
+        f"{fmt(result['binary_bytes'])} unpacked in {result['seconds']:.1f}s"
+    )
+    click.echo(f"Mirror:     {result['mirror']}")
+    click.echo(f"Config:     {result['config']}")
+    click.echo(f"CLI config: {result['cli_config']} (use with TF_CLI_CONFIG_FILE)")
+
+
+@cli.command("serve-modules")
+@click.option("--host", default="127.0.0.1", show_default=True)
+@click.option("--port", default=9890, show_default=True, type=click.IntRange(0, 65535))
+@click.option(
+    "--source",
+    type=click.Choice(registry.SOURCES),
+    default="archive",
+    show_default=True,
+    help="What registry downloads point at: tar.gz archive, git over HTTP or git::file://.",
+)
+@click.option(
+    "--rate",
+    metavar="SIZE",
+    help="Bandwidth per second over all responses, e.g. 10M.",
+)
+@click.option(
+    "--latency",
+    default=0.0,
+    show_default=True,
+    type=click.FloatRange(min=0),
+    help="Seconds of delay before every response.",
+)
+@click.option(
+    "--cache",
+    default=registry.CACHE_DIR,
+    show_default=True,
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory of the served archives and bare repositories.",
+)
+@click.option(
+    "--history",
+    "history_dir",
+    default=history.HISTORY_DIR,
+    show_default=True,
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory of gen-history repositories served in place of the module trees.",
+)
+@click.option(
+    "--write-config",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Write a many-modules style main.tf using the local sources to this file.",
+)
+@click.option(
+    "--config-source",
+    type=click.Choice(["registry", *registry.SOURCES]),
+    default="registry",
+    show_default=True,
+    help="Source addresses used by --write-config.",
+)
+@click.option(
+    "--tls-cert",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="Serve HTTPS with this certificate, needed by registry sources.",
+)
+@click.option("--tls-key", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option(
+    "--log",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Write every request with its timings as JSON lines to this file.",
+)
+@click.option(
+    "--json",
+    "json_out",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Write the summary as JSON to this file on exit.",
+)
+def serve_modules(
+    host: str,
+    port: int,
+    source: str,
+    rate: str | None,
+    latency: float,
+    cache: Path,
+    history_dir: Path,
+    write_config: Path | None,
+    config_source: str,
+    tls_cert: Path | None,
+    tls_key: Path | None,
+    log: Path | None,
+    json_out: Path | None,
+) -> None:
+    """Serve the generated modules through a local registry and git server."""
+    try:
+        rate_bytes = manifest.parse_size(rate) if rate else None
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--rate")
+    context = None
+    if tls_cert is not None:
+        context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        context.load_cert_chain(tls_cert, tls_key)
+
+    try:
+        modules = registry.prepare_modules(cache_dir=cache, history_dir=history_dir)
+    except (RuntimeError, OSError) as e:
+        raise click.ClickException(str(e))
+    if not modules:
+        raise click.ClickException(
+            f"No modules in {modulegen.MODULES_DIR}, run gen-modules first"
+        )
+
+    base_url = f"{'https' if context else 'http'}://{host}:{port}"
+    size = manifest.format_size
+    click.echo(f"{'module':<32} {'archive':>9} {'versions':>8}  source")
+    for name, module in modules.items():
+        click.echo(
+            f"{name:<32} {size(module['archive_bytes']):>9} "
+            f"{len(module['versions']):>8}  "
+            f"{registry.module_source(base_url, name, module, source)}"
+        )
+    if write_config is not None:
+        registry.write_config(write_config, base_url, modules, config_source)
+        click.echo(f"✓ Configuration written to {write_config}")
+
+    with open(log, "w") if log is not None else nullcontext() as log_file:
+        server = registry.ModuleServer(
+            modules, cache / "git", source, rate_bytes, latency, log=log_file
+        )
+        click.echo(f"\nServing modules on {base_url}/")
+        try:
+            asyncio.run(server.serve(host, port, ssl=context))
+        except KeyboardInterrupt:
+            pass
+
+    summary = server.summary()
+    if json_out is not None:
+        json_out.write_text(json.dumps(summary, indent=2) + "\n")
+    click.echo(
+        f"\n{'kind':<10} {'requests':>8} {'errors':>6} {'bytes':>9} "
+        f"{'p50':>8} {'p95':>8} {'ttfb p50':>8}"
+    )
+    for kind, stats in summary["kinds"].items():
+        click.echo(
+            f"{kind:<10} {stats['requests']:>8} {stats['errors']:>6} "
+            f"{size(stats['bytes']):>9} {stats['seconds']['median']:>7.3f}s "
+            f"{stats['seconds']['p95']:>7.3f}s {stats['ttfb']['median']:>7.3f}s"
+        )
+
+
+@cli.command("serve-state")
+@click.option("--host", default="127.0.0.1", show_default=True)
+@click.option("--port", default=9900, show_default=True, type=click.IntRange(0, 65535))
+@click.option(
+    "--storage",
+    type=click.Choice(["memory", "disk"]),
+    default="memory",
+    show_default=True,
+)
+@click.option(
+    "--dir",
+    "state_dir",
+    default=statebackend.STATE_DIR,
+    show_default=True,
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory of the disk storage.",
+)
+@click.option("--fsync", is_flag=True, help="Fsync every state write to disk.")
+@click.option(
+    "--gzip",
+    "gzip_level",
+    type=click.IntRange(1, 9),
+    help="Gzip responses at this level for clients accepting it.",
+)
+@click.option(
+    "--rate",
+    metavar="SIZE",
+    help="Bandwidth per second over all responses, e.g. 10M.",
+)
+@click.option(
+    "--latency",
+    default=0.0,
+    show_default=True,
+    type=click.FloatRange(min=0),
+    help="Seconds of delay before every response.",
+)
+@click.option(
+    "--log",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Write every request with its latency, sizes and lock wait as JSON lines.",
+)
+@click.option(
+    "--json",
+    "json_out",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Write the summary as JSON to this file on exit.",
+)
+def serve_state(
+    host: str,
+    port: int,
+    storage: str,
+    state_dir: Path,
+    fsync: bool,
+    gzip_level: int | None,
+    rate: str | None,
+    latency: float,
+    log: Path | None,
+    json_out: Path | None,
+) -> None:
+    """Run a local http state backend with locking and request timings."""
+    try:
+        rate_bytes = manifest.parse_size(rate) if rate else None
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--rate")
+    if storage == "disk":
+        backend = statebackend.DiskStorage(state_dir, fsync)
+    else:
+        backend = statebackend.MemoryStorage()
+
+    address = f"http://{host}:{port}/torture"
+    click.echo(f"Serving http state backend on http://{host}:{port}/<name>\n")
+    click.echo('terraform {\n  backend "http" {')
+    for key in ("address", "lock_address", "unlock_address"):
+        click.echo(f'    {key:<14} = "{address}"')
+    click.echo("  }\n}")
+    with open(log, "w") if log is not None else nullcontext() as log_file:
+        server = statebackend.StateServer(
+            backend, gzip_level, rate_bytes, latency, log=log_file
+        )
+        try:
+            asyncio.run(server.serve(host, port))
+        except KeyboardInterrupt:
+            pass
+
+    summary = server.summary()
+    if json_out is not None:
+        json_out.write_text(json.dumps(summary, indent=2) + "\n")
+    size = manifest.format_size
+    click.echo(
+        f"\n{'method':<7} {'requests':>8} {'errors':>6} {'in':>8} {'out':>8} "
+        f"{'p50':>8} {'p95':>8} {'lock wait p95':>13}"
+    )
+    for method, stats in summary["methods"].items():
+        waits = f"{stats['lock_waits']['p95']:.3f}s" if stats["lock_waits"] else "-"
+        click.echo(
+            f"{method:<7} {stats['requests']:>8} {stats['errors']:>6} "
+            f"{size(stats['request_bytes']):>8} {size(stats['response_bytes']):>8} "
+            f"{stats['seconds']['median']:>7.3f}s {stats['seconds']['p95']:>7.3f}s "
+            f"{waits:>13}"
+        )
+    for name, state_size in summary["states"].items():
+        click.echo(f"State {name}: {size(state_size)}")
+
+
+@cli.command()
+@click.option(
+    "--resources",
+    default=5000,
+    show_default=True,
+    type=click.IntRange(min=0),
+    help="Number of resources in the benchmark file.",
+)
+@click.option("--seed", default=0, show_default=True, type=int)
+def bench_hcl(resources: int, seed: int) -> None:
+    """Benchmark the streaming HCL emitter against the Jinja templates."""
+    with tempfile.TemporaryDirectory() as tmp:
+        results = modulegen.benchmark_emitter(
+            Path(tmp) / "main.tf", resource_count=resources, seed=seed
+        )
+
+    click.echo(f"{'engine':<10} {'seconds':>10} {'MB/s':>10} {'peak MB':>10}")
+    for name in ["jinja", "emitter"]:
+        r = results[name]
+        mb = r["bytes"] / 1024 / 1024
+        click.echo(
+            f"{name:<10} {r['seconds']:>10.3f} {mb / r['seconds']:>10.1f} "
+            f"{r['peak_bytes'] / 1024 / 1024:>10.1f}"
+        )
+    click.echo(f"\nOutput size: {results['emitter']['bytes'] / 1024 / 1024:.1f}MB")
+    click.echo(f"Identical output: {results['identical']}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# Standalone and stdlib only, so the local-exec provisioners in main.tf can run
+# it with `python3 path/to/firehose.py` without installing the package.
+import argparse
+import random
+import sys
+import time
+
+FILLER = (
+    "with detailed information about the current state and configuration changes "
+    "being applied to the infrastructure "
+)
+
+# Seconds between rate checks and flushes when the output is rate limited
+TICK = 0.01
+
+# Lines written per batch when the output is not rate limited
+BATCH_LINES = 4096
+
+BUFFER_SIZE = 1024 * 1024
+
+
+def parse_size(text):
+    """Parse a byte count with an optional K, M or G suffix, e.g. 512K"""
+    value = text.strip().upper().removesuffix("B")
+    factor = 1
+    if value and value[-1] in "KMG":
+        factor = 1024 ** ("KMG".index(value[-1]) + 1)
+        value = value[:-1]
+    try:
+        return int(float(value) * factor)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size '{text}'")
+
+
+def parse_distribution(text):
+    """
+    Parse a line size distribution
+
+    N is a fixed size, MIN:MAX uniform and MIN:MAX:MODE triangular, which
+    gives the long tail of real logs with a small mode and a large maximum.
+    """
+    try:
+        values = [int(v) for v in text.split(":")]
+    except ValueError:
+        values = []
+    if len(values) == 1:
+        return lambda rng: values[0]
+    if len(values) == 2 and values[0] <= values[1]:
+        return lambda rng: rng.randint(values[0], values[1])
+    if len(values) == 3 and values[0] <= values[2] <= values[1]:
+        return lambda rng: round(rng.triangular(values[0], values[1], values[2]))
+    raise argparse.ArgumentTypeError(
+        f"invalid size distribution '{text}', expected N, MIN:MAX or MIN:MAX:MODE"
+    )
+
+
+def parse_burst(text):
+    """Parse ON:OFF[:FACTOR] seconds of output at FACTOR times the rate and silence"""
+    try:
+        values = [float(v) for v in text.split(":")]
+    except ValueError:
+        values = []
+    if len(values) not in (2, 3) or values[0] <= 0 or values[1] < 0:
+        raise argparse.ArgumentTypeError(
+            f"invalid burst '{text}', expected ON:OFF or ON:OFF:FACTOR seconds"
+        )
+    return values[0], values[1], values[2] if len(values) == 3 else 1.0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="firehose",
+        description="Emit provisioner log lines at a controlled rate and volume.",
+    )
+    parser.add_argument("--resource", default="0", help="Resource label of the lines")
+    parser.add_argument(
+        "--phase",
+        choices=["create", "destroy"],
+        default="create",
+        help="Provisioning or destruction wording",
+    )
+    parser.add_argument("--lines", type=int, help="Number of lines to write")
+    parser.add_argument("--bytes", type=parse_size, help="Volume to write, e.g. 1G")
+    parser.add_argument(
+        "--rate", type=float, default=0, help="Lines per second, 0 for unlimited"
+    )
+    parser.add_argument(
+        "--byte-rate", type=parse_size, default=0, help="Bytes per second, e.g. 2M"
+    )
+    parser.add_argument(
+        "--size",
+        type=parse_distribution,
+        default=parse_distribution("180"),
+        help="Line size in bytes: N, MIN:MAX or MIN:MAX:MODE (default 180)",
+    )
+    parser.add_argument(
+        "--burst",
+        type=parse_burst,
+        help="ON:OFF[:FACTOR] seconds, rate multiplied by FACTOR while on",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the line sizes")
+    parser.add_argument(
+        "--no-markers",
+        action="store_true",
+        help="Do not print the starting and completed marker lines",
+    )
+    return parser
+
+
+class Firehose:
+    """
+    Rate-controlled writer of provisioner log lines
+
+    Every line carries the wall clock in nanoseconds at the position of
+    `date +%s%N` in the shell provisioners, so `torture analyze-log` measures
+    lag the same way, plus a monotonic timestamp that is immune to clock steps.
+    """
+
+    def __init__(self, out, args):
+        self.out = out
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.lines = 0
+        self.bytes = 0
+        word = "Log line" if args.phase == "create" else "Destroy log line"
+        self.prefix = f"[Resource {args.resource}] {word} "
+        self.filler = FILLER * 64
+
+    def done(self):
+        args = self.args
+        return (args.lines is not None and self.lines >= args.lines) or (
+            args.bytes is not None and self.bytes >= args.bytes
+        )
+
+    def batch(self, count):
+        """Write up to count lines, returns the number of bytes written"""
+        args = self.args
+        size_of = args.size
+        rng = self.rng
+        lines = []
+        written = 0
+        for _ in range(count):
+            if self.done():
+                break
+            self.lines += 1
+            head = (
+                f"{self.prefix}{self.lines}: Processing operation {time.time_ns()} "
+                f"mono={time.monotonic_ns()} "
+            )
+            pad = size_of(rng) - len(head) - 1
+            if pad > len(self.filler):
+                self.filler = FILLER * (pad // len(FILLER) + 1)
+            line = f"{head}{self.filler[: max(pad, 0)]}".rstrip().encode() + b"\n"
+            lines.append(line)
+            self.bytes += len(line)
+            written += len(line)
+        self.out.writelines(lines)
+        return written
+
+    def run(self):
+        args = self.args
+        burst_on, burst_off, factor = args.burst or (None, 0, 1.0)
+        limited = args.rate > 0 or args.byte_rate > 0
+        average = sum(args.size(random.Random(i)) for i in range(64)) / 64
+
+        start = time.monotonic()
+        allowance_lines = allowance_bytes = 0.0
+        last = start
+        while not self.done():
+            now = time.monotonic()
+            elapsed = now - last
+            last = now
+            on = True
+            if burst_on is not None:
+                on = (now - start) % (burst_on + burst_off) < burst_on
+            if not on:
+                self.out.flush()
+                time.sleep(TICK)
+                continue
+            if not limited:
+                self.batch(BATCH_LINES)
+                continue
+
+            count = BATCH_LINES
+            if args.rate > 0:
+                allowance_lines += elapsed * args.rate * factor
+                count = min(count, int(allowance_lines))
+            if args.byte_rate > 0:
+                allowance_bytes += elapsed * args.byte_rate * factor
+                count = min(count, int(allowance_bytes / average))
+            if count > 0:
+                written = self.batch(count)
+                allowance_lines -= count
+                allowance_bytes -= written
+            self.out.flush()
+            time.sleep(TICK)
+        self.out.flush()
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.lines is None and args.bytes is None:
+        args.lines = 10
+
+    noun = "provisioning" if args.phase == "create" else "destruction"
+    try:
+        with open(
+            sys.stdout.fileno(), "wb", buffering=BUFFER_SIZE, closefd=False
+        ) as out:
+            if not args.no_markers:
+                out.write(
+                    f"==== Starting {noun} for resource {args.resource} ====\n".encode()
+                )
+            Firehose(out, args).run()
+            if not args.no_markers:
+                out.write(
+                    f"==== Completed {noun} for resource {args.resource} ====\n".encode()
+                )
+    except BrokenPipeError:
+        pass
+
+
+if __name__ == "__main__":
+    main()
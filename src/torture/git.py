@@ -1,74 +1,187 @@
-import shutil
+import re
 import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from urllib.parse import urlsplit
 
 import click
 
+from src.torture import manifest
 
-def push_module_to_github(module: Path):
-    repo_name = f"mermoldy/terraform-torture-{module.name}"
+GITHUB_OWNER = "mermoldy"
 
-    subprocess.run(["git", "init"], cwd=module.as_posix(), check=True)
-    subprocess.run(["git", "add", "."], cwd=module.as_posix(), check=True)
-    subprocess.run(
-        ["git", "commit", "-m", "Update module"],
+# Push attempts after the first one, with exponential backoff
+RETRIES = 2
+RETRY_DELAY = 1.0
+
+PUBLISH_JOBS = 4
+
+WRITING_RE = re.compile(r"Writing objects: 100% .*?, ([\d.]+) (bytes|KiB|MiB|GiB)")
+UNITS = {"bytes": 1, "KiB": 1024, "MiB": 1024**2, "GiB": 1024**3}
+
+
+def repo_name(module: Path):
+    return f"terraform-torture-{module.name}"
+
+
+def local_target(target):
+    """Directory of a file:// URL or local path target, None for GitHub"""
+    if target == "github":
+        return None
+    if target.startswith("file://"):
+        return Path(urlsplit(target).path)
+    return Path(target)
+
+
+def git(args, module, check=True):
+    result = subprocess.run(
+        ["git", *args],
         cwd=module.as_posix(),
         capture_output=True,
+        text=True,
+        check=False,
     )
+    if check and result.returncode != 0:
+        raise RuntimeError(f"git {' '.join(args)} failed: {result.stderr.strip()}")
+    return result
 
-    try:
-        check_repo = subprocess.run(
-            ["gh", "repo", "view", repo_name], capture_output=True, text=True
+
+def objects_size(module: Path):
+    """Bytes of the git objects of a module repository"""
+    objects = module / ".git" / "objects"
+    return sum(p.stat().st_size for p in objects.rglob("*") if p.is_file())
+
+
+def pushed_bytes(stderr, module: Path):
+    """Pack size from git push --progress output, or the object store size"""
+    if "Everything up-to-date" in stderr:
+        return 0
+    match = WRITING_RE.search(stderr)
+    if match:
+        return int(float(match[1]) * UNITS[match[2]])
+    return objects_size(module)
+
+
+def commit_module(module: Path):
+    """Commit the module tree to its own repository on the main branch"""
+    git(["init"], module)
+    git(["add", "."], module)
+    result = git(["commit", "-m", "Update module"], module, check=False)
+    if result.returncode != 0 and "nothing to commit" not in result.stdout:
+        raise RuntimeError(f"git commit failed: {result.stderr.strip()}")
+    git(["branch", "-M", "main"], module)
+
+
+def push_local(module: Path, directory: Path):
+    """Force-push a module to a bare repository in a local directory"""
+    bare = directory / f"{repo_name(module)}.git"
+    if not bare.exists():
+        bare.parent.mkdir(parents=True, exist_ok=True)
+        git(["init", "--bare", bare.resolve().as_posix()], module)
+        git(
+            [
+                "--git-dir",
+                bare.resolve().as_posix(),
+                "symbolic-ref",
+                "HEAD",
+                "refs/heads/main",
+            ],
+            module,
         )
-        if check_repo.returncode == 0:
-            click.echo(f"♻️  Updating existing repository: {repo_name}")
-            subprocess.run(
-                [
-                    "git",
-                    "remote",
-                    "add",
-                    "origin",
-                    f"git@github.com:{repo_name}.git",
-                ],
-                cwd=module.as_posix(),
-                capture_output=True,
-            )
-            subprocess.run(
-                ["git", "branch", "-M", "main"], cwd=module.as_posix(), check=True
-            )
-            push_result = subprocess.run(
-                ["git", "push", "-f", "origin", "main"],
-                cwd=module.as_posix(),
-                capture_output=True,
-                text=True,
-            )
-            if push_result.returncode != 0:
-                click.echo(f"❌ Failed to push: {push_result.stderr}")
-                return
-            click.echo(f"✓ Updated repository: {repo_name}")
-            shutil.rmtree(module)
-            return
-        else:
-            click.echo(f"📦 Creating new repository: {repo_name}")
-            create_result = subprocess.run(
-                [
-                    "gh",
-                    "repo",
-                    "create",
-                    repo_name,
-                    "--public",
-                    "--source=.",
-                    "--push",
-                ],
-                cwd=module.as_posix(),
-                capture_output=True,
-                text=True,
-            )
-
-            if create_result.returncode != 0:
-                click.echo(f"❌ Failed to create repository: {create_result.stderr}")
-                return
-            click.echo(f"✓ Created and pushed repository: {repo_name}")
-            shutil.rmtree(module)
-    except Exception as e:
-        click.echo(f"❌ Error processing {module.name}: {str(e)}")
+    result = git(
+        ["push", "--progress", "-f", bare.resolve().as_posix(), "main"], module
+    )
+    return pushed_bytes(result.stderr, module)
+
+
+def push_github(module: Path):
+    """Force-push a module to its GitHub repository, creating it when missing"""
+    name = f"{GITHUB_OWNER}/{repo_name(module)}"
+    check_repo = subprocess.run(
+        ["gh", "repo", "view", name], capture_output=True, text=True, check=False
+    )
+    if check_repo.returncode == 0:
+        click.echo(f"♻️  Updating existing repository: {name}")
+        url = f"git@github.com:{name}.git"
+        if git(["remote", "add", "origin", url], module, check=False).returncode:
+            git(["remote", "set-url", "origin", url], module)
+        result = git(["push", "--progress", "-f", "origin", "main"], module)
+        return pushed_bytes(result.stderr, module)
+
+    click.echo(f"📦 Creating new repository: {name}")
+    create_result = subprocess.run(
+        ["gh", "repo", "create", name, "--public", "--source=.", "--push"],
+        cwd=module.as_posix(),
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if create_result.returncode != 0:
+        raise RuntimeError(f"Failed to create repository: {create_result.stderr}")
+    return pushed_bytes(create_result.stderr, module)
+
+
+def publish_module(module: Path, target="github", retries=RETRIES, remove=False):
+    """
+    Commit a module to its own repository and push it
+
+    Args:
+        module: Module directory
+        target: "github", or a file:// URL or directory for local bare repositories
+        retries: Push attempts after the first one
+        remove: Remove the module directory and its manifest after a
+            successful push, so the next build starts from scratch
+
+    Returns:
+        Dict with module, ok, seconds, bytes, attempts and error
+    """
+    result = {
+        "module": module.name,
+        "ok": False,
+        "seconds": 0.0,
+        "bytes": 0,
+        "attempts": 0,
+        "error": None,
+    }
+    start = time.monotonic()
+    directory = local_target(target)
+    try:
+        commit_module(module)
+        for attempt in range(retries + 1):
+            result["attempts"] = attempt + 1
+            try:
+                if directory is None:
+                    result["bytes"] = push_github(module)
+                else:
+                    result["bytes"] = push_local(module, directory)
+                result["ok"] = True
+                result["error"] = None
+                break
+            except (RuntimeError, OSError) as e:
+                result["error"] = str(e)
+                if attempt < retries:
+                    time.sleep(RETRY_DELAY * 2**attempt)
+    except (RuntimeError, OSError) as e:
+        result["error"] = str(e)
+    result["seconds"] = round(time.monotonic() - start, 3)
+
+    if result["ok"]:
+        click.echo(f"✓ Published {module.name} to {target}")
+        if remove:
+            manifest.remove_module(module)
+    else:
+        click.echo(f"❌ Failed to publish {module.name}: {result['error']}")
+    return result
+
+
+def publish_modules(
+    modules, target="github", jobs=PUBLISH_JOBS, retries=RETRIES, remove=False
+):
+    """Publish modules concurrently with at most jobs pushes in flight"""
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as pool:
+        futures = [
+            pool.submit(publish_module, module, target, retries, remove)
+            for module in modules
+        ]
+        return [future.result() for future in futures]
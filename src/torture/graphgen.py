@@ -0,0 +1,239 @@
+import random
+import shutil
+from itertools import chain
+from pathlib import Path
+
+from src.torture import hcl, history, modulegen
+
+SHAPES = ("chain", "fan-out", "fan-in", "diamond", "random")
+
+REFS = ("attribute", "depends_on", "mixed")
+
+
+def build_parents(shape, nodes, density=0.01, width=4, rng=None):
+    """
+    Parents of every node of a DAG shape
+
+    Parents always have a lower index than their child, so node order is a
+    topological order.
+
+    Args:
+        shape: One of SHAPES
+        nodes: Number of nodes
+        density: Probability of every backward edge of a random DAG
+        width: Parallel nodes between the joins of a diamond chain
+        rng: random.Random for random DAGs
+
+    Returns:
+        List of parent index lists, one per node
+    """
+    if shape == "chain":
+        return [[i - 1] if i else [] for i in range(nodes)]
+    if shape == "fan-out":
+        return [[0] if i else [] for i in range(nodes)]
+    if shape == "fan-in":
+        return [[] for _ in range(nodes - 1)] + [list(range(nodes - 1))]
+    if shape == "diamond":
+        # join, width nodes depending on it, the next join depending on them, ...
+        parents = []
+        join = None
+        for i in range(nodes):
+            offset = (i - 1) % (width + 1) if i else width
+            if offset == width:
+                parents.append(list(range(join + 1, i)) if join is not None else [])
+                join = i
+            else:
+                parents.append([join])
+        return parents
+    if shape == "random":
+        rng = rng or random.Random(0)
+        return [
+            sorted(rng.sample(range(i), history.churn_count(density, i, rng)))
+            for i in range(nodes)
+        ]
+    raise ValueError(f"Unknown graph shape: {shape}")
+
+
+def edge_kinds(parents, refs, rng):
+    """Reference kind of every edge, attribute or depends_on"""
+    if refs != "mixed":
+        return [[refs] * len(p) for p in parents]
+    return [
+        ["attribute" if rng.random() < 0.5 else "depends_on" for _ in p]
+        for p in parents
+    ]
+
+
+def longest_path(parents):
+    """Number of nodes on the longest dependency chain"""
+    depth = []
+    for p in parents:
+        depth.append(1 + max((depth[j] for j in p), default=0))
+    return max(depth, default=0)
+
+
+def iter_nodes(indices, parents, kinds, owner, module=None):
+    """
+    Emit the null_resource of every node
+
+    References to nodes of another module go through a variable named like
+    the node; depends_on edges to other modules are left to the module block.
+    """
+    for i in indices:
+        yield f'\nresource "null_resource" "node_{i}" {{\n  triggers = {{\n'
+        yield f'    index = "{i}"\n'
+        depends = []
+        for j, kind in zip(parents[i], kinds[i]):
+            local = owner(j) == module
+            if kind == "attribute":
+                ref = f"null_resource.node_{j}.id" if local else f"var.node_{j}"
+                yield f"    node_{j} = {ref}\n"
+            elif local:
+                depends.append(f"    null_resource.node_{j},\n")
+        yield "  }\n"
+        if depends:
+            yield "  depends_on = [\n"
+            yield from depends
+            yield "  ]\n"
+        yield "}\n"
+
+
+def iter_module_call(module, inputs, depends_on, owner):
+    yield f'\nmodule "part_{module:03d}" {{\n  source = "./modules/part_{module:03d}"\n'
+    for j in inputs:
+        yield f"  node_{j} = module.part_{owner(j):03d}.node_{j}\n"
+    if depends_on:
+        yield "  depends_on = [\n"
+        for m in depends_on:
+            yield f"    module.part_{m:03d},\n"
+        yield "  ]\n"
+    yield "}\n"
+
+
+def iter_part(indices, parents, kinds, owner, module, inputs, outputs):
+    for j in inputs:
+        yield f'\nvariable "node_{j}" {{\n  type = string\n}}\n'
+    yield from iter_nodes(indices, parents, kinds, owner, module)
+    for i in outputs:
+        yield f'\noutput "node_{i}" {{\n  value = null_resource.node_{i}.id\n}}\n'
+
+
+def write_tf(path: Path, fragments):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", buffering=hcl.BUFFER_SIZE) as f:
+        hcl.write_fragments(f, fragments)
+    return path.stat().st_size
+
+
+def generate_graph(
+    output,
+    shape,
+    nodes,
+    density=0.01,
+    width=4,
+    modules=0,
+    refs="mixed",
+    seed=0,
+):
+    """
+    Write a root configuration whose resources form a dependency graph
+
+    Every node is a null_resource whose triggers hold attribute references
+    to its parents' ids or that lists them in depends_on. With modules, the
+    nodes are split into that many child modules of consecutive nodes:
+    attribute references to other modules go through module outputs and
+    variables, depends_on edges to other modules become depends_on of the
+    module block.
+
+    Args:
+        output: Configuration directory, replaced if it exists
+        shape: One of SHAPES
+        nodes: Number of nodes
+        density: Probability of every backward edge of a random DAG
+        width: Parallel nodes between the joins of a diamond chain
+        modules: Number of child modules, 0 to keep all nodes in the root
+        refs: Edge kind, one of REFS
+        seed: Base seed of random DAGs and mixed edge kinds
+
+    Returns:
+        Dict with node, edge, depth and degree counts, files and bytes
+    """
+    output = Path(output)
+    rng = random.Random(modulegen.derive_seed(seed, "graph", shape, nodes, density))
+    parents = build_parents(shape, nodes, density, width, rng)
+    kinds = edge_kinds(parents, refs, rng)
+    modules = min(modules, nodes)
+    if output.exists():
+        shutil.rmtree(output)
+    output.mkdir(parents=True)
+
+    def owner(i):
+        return i * modules // nodes if modules else None
+
+    header = f"\n# Dependency graph: {shape}, {nodes} nodes\n\n{hcl.TERRAFORM_BLOCK}"
+    files = 1
+    cross = 0
+    if not modules:
+        size = write_tf(
+            output / "main.tf",
+            chain([header], iter_nodes(range(nodes), parents, kinds, owner)),
+        )
+    else:
+        ranges = [[] for _ in range(modules)]
+        for i in range(nodes):
+            ranges[owner(i)].append(i)
+        inputs = [set() for _ in range(modules)]
+        outputs = [set() for _ in range(modules)]
+        depends_on = [set() for _ in range(modules)]
+        for i in range(nodes):
+            for j, kind in zip(parents[i], kinds[i]):
+                if owner(j) == owner(i):
+                    continue
+                cross += 1
+                if kind == "attribute":
+                    inputs[owner(i)].add(j)
+                    outputs[owner(j)].add(j)
+                else:
+                    depends_on[owner(i)].add(owner(j))
+
+        size = 0
+        for m in range(modules):
+            size += write_tf(
+                output / "modules" / f"part_{m:03d}" / "main.tf",
+                iter_part(
+                    ranges[m],
+                    parents,
+                    kinds,
+                    owner,
+                    m,
+                    sorted(inputs[m]),
+                    sorted(outputs[m]),
+                ),
+            )
+        files += modules
+        calls = (
+            iter_module_call(m, sorted(inputs[m]), sorted(depends_on[m]), owner)
+            for m in range(modules)
+        )
+        size += write_tf(output / "main.tf", chain([header], *calls))
+
+    edges = [kind for k in kinds for kind in k]
+    children = [0] * nodes
+    for p in parents:
+        for j in p:
+            children[j] += 1
+    return {
+        "directory": output.as_posix(),
+        "shape": shape,
+        "nodes": nodes,
+        "edges": len(edges),
+        "attribute_refs": edges.count("attribute"),
+        "depends_on": edges.count("depends_on"),
+        "cross_module_edges": cross,
+        "modules": modules,
+        "longest_path": longest_path(parents),
+        "max_in_degree": max((len(p) for p in parents), default=0),
+        "max_out_degree": max(children, default=0),
+        "files": files,
+        "bytes": size,
+    }
@@ -0,0 +1,196 @@
+from itertools import islice
+from pathlib import Path
+
+# Number of fragments handed to a single writelines() call
+BATCH_SIZE = 4096
+
+# Write buffer size of the output file
+BUFFER_SIZE = 1024 * 1024
+
+TERRAFORM_BLOCK = """terraform {
+  required_version = ">= 1.0"
+  required_providers {
+    null = {
+      source  = "hashicorp/null"
+      version = "~> 3.2"
+    }
+  }
+}
+"""
+
+
+def iter_main(
+    module_name,
+    description,
+    resource_count,
+    prefix,
+    include_data,
+    random_data,
+    **_,
+):
+    """Emit MAIN_TF_TEMPLATE"""
+    yield f"\n# {module_name}\n# {description}\n\n{TERRAFORM_BLOCK}\n"
+
+    head = '\nresource "null_resource" "resource_'
+    mid = f'" {{\n  triggers = {{\n    id        = "{prefix}-'
+    if include_data:
+        tail = '"\n    timestamp = timestamp()\n    \n    data      = "'
+        for i in range(resource_count):
+            yield f'{head}{i}{mid}{i}{tail}{random_data()}"\n    \n  }}\n}}\n'
+    else:
+        tail = '"\n    timestamp = timestamp()\n    \n  }\n}\n'
+        for i in range(resource_count):
+            yield f"{head}{i}{mid}{i}{tail}"
+
+    yield f'\n\noutput "{prefix}_output" {{\n  value = {{\n    \n'
+    for i in range(resource_count):
+        yield f"    resource_{i} = null_resource.resource_{i}.id\n    \n"
+    yield "  }\n}"
+
+
+def iter_variable(var_count, module_name, **_):
+    """Emit VARIABLE_TF_TEMPLATE"""
+    yield "\n"
+    for i in range(var_count):
+        yield (
+            f'\nvariable "var_{i}" {{\n'
+            f'  description = "Variable {i} for {module_name}"\n'
+            f"  type        = string\n"
+            f'  default     = "default_value_{i}"\n\n'
+            f"  validation {{\n"
+            f"    condition     = length(var.var_{i}) > 0\n"
+            f'    error_message = "Variable var_{i} must not be empty."\n'
+            f"  }}\n}}\n\n"
+        )
+
+
+def iter_output(var_count, module_name, **_):
+    """Emit OUTPUT_TF_TEMPLATE"""
+    yield (
+        f'\noutput "all_variables" {{\n'
+        f'  description = "All variables from {module_name}"\n'
+        f"  value = {{\n    \n"
+    )
+    for i in range(var_count):
+        yield f"    var_{i} = var.var_{i}\n    \n"
+    yield "  }\n}"
+
+
+def iter_locals(
+    local_count,
+    random_string,
+    random_data,
+    include_large_data=False,
+    map_size=0,
+    json_items=0,
+    **_,
+):
+    """Emit LOCALS_TF_TEMPLATE"""
+    yield "\nlocals {\n  "
+    for i in range(local_count):
+        yield f'\n  local_{i} = "local_value_{i}_{random_string()}"\n  '
+    yield "\n\n  "
+
+    if include_large_data:
+        yield "\n  large_data_map = {\n    "
+        for i in range(map_size):
+            yield f'\n    "key_{i}" = "{random_data()}"\n    '
+        yield "\n  }\n\n  large_json_structure = jsonencode({\n    "
+        for i in range(json_items):
+            yield (
+                f"\n    item_{i} = {{\n"
+                f"      id          = {i}\n"
+                f'      name        = "Item {i}"\n'
+                f'      description = "{random_data()}"\n'
+                f"      metadata = {{\n        "
+            )
+            for j in range(5):
+                yield f'\n        meta_key_{j} = "{random_string()}"\n        '
+            yield "\n      }\n    }\n    "
+        yield "\n  })\n  "
+    yield "\n}"
+
+
+def iter_small_file(index, random_string, **_):
+    """Emit SMALL_FILE_TEMPLATE"""
+    yield (
+        f"\n# Small file {index}\n"
+        f'variable "small_var_{index}" {{\n'
+        f'  default = "value_{index}"\n'
+        f"}}\n\n"
+        f"locals {{\n"
+        f'  small_local_{index} = "local_{index}_{random_string()}"\n'
+        f"}}\n\n"
+        f'resource "null_resource" "small_{index}" {{\n'
+        f"  triggers = {{\n"
+        f"    value = var.small_var_{index}\n"
+        f"  }}\n}}"
+    )
+
+
+def iter_submodule(name, resource_count, **_):
+    """Emit SUBMODULE_TEMPLATE"""
+    yield (
+        f"\n# Submodule {name}\n"
+        f'variable "submodule_input" {{\n'
+        f"  type    = string\n"
+        f'  default = "submodule_{name}"\n'
+        f"}}\n\n"
+    )
+    head = f'\nresource "null_resource" "sub_{name}_'
+    tail = '" {\n  triggers = {\n    input = var.submodule_input\n    index = '
+    for i in range(resource_count):
+        yield f"{head}{i}{tail}{i}\n  }}\n}}\n"
+
+    yield f'\n\noutput "submodule_{name}_output" {{\n  value = {{\n    \n'
+    for i in range(resource_count):
+        yield f"    resource_{i} = null_resource.sub_{name}_{i}.id\n    \n"
+    yield "  }\n}"
+
+
+def iter_aggregator(module_name, var_count, **_):
+    """Emit the aggregator resource over small_var_1..small_var_N"""
+    yield f'\n# {module_name} - Aggregator\nresource "null_resource" "aggregator" {{\n'
+    yield "  triggers = {\n"
+    for i in range(1, var_count + 1):
+        yield f"    var_{i} = var.small_var_{i}\n"
+    yield "  }\n}\n"
+
+
+# Streaming equivalents of the Jinja templates in modulegen. Every emitter
+# yields the same bytes as its template and makes the same random_data() and
+# random_string() calls in the same order, so seeded output is unchanged.
+# The aggregator has no Jinja counterpart; it replaces the inline main.tf of
+# module 03 so its size follows the number of small files.
+EMITTERS = {
+    "main": iter_main,
+    "variable": iter_variable,
+    "output": iter_output,
+    "locals": iter_locals,
+    "small_file": iter_small_file,
+    "submodule": iter_submodule,
+    "aggregator": iter_aggregator,
+}
+
+
+def write_fragments(f, fragments, batch_size=BATCH_SIZE):
+    """Write fragments to an open file in batches"""
+    fragments = iter(fragments)
+    while batch := list(islice(fragments, batch_size)):
+        f.writelines(batch)
+
+
+def write_file(filepath, template, trailer="", **params):
+    """
+    Stream a template into a file
+
+    Args:
+        filepath: Path to create file
+        template: Key in EMITTERS
+        trailer: Extra text appended after the template
+        params: Template parameters, including the random_data and
+            random_string callables
+    """
+    with open(Path(filepath), "w", buffering=BUFFER_SIZE) as f:
+        write_fragments(f, EMITTERS[template](**params))
+        f.write(trailer)
@@ -0,0 +1,269 @@
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from src.torture import git, modulegen, modulespec, payload
+
+HISTORY_DIR = modulegen.MODULES_DIR / ".history"
+
+AUTHOR = "torture <torture@example.com>"
+
+# Commit dates start here and advance by COMMIT_INTERVAL seconds per commit,
+# so the same options always produce the same object ids
+EPOCH = 1700000000
+COMMIT_INTERVAL = 3600
+
+COPY_SIZE = payload.MB
+
+
+class FastImport:
+    """
+    Writer of a git fast-import stream into a bare repository
+
+    Blobs, commits, tags and refs are numbered with marks, so commits only
+    reference the blobs that changed and nothing runs `git add` or `git commit`.
+    """
+
+    def __init__(self, repo: Path):
+        self.proc = subprocess.Popen(
+            ["git", "--git-dir", repo.as_posix(), "fast-import", "--quiet", "--done"],
+            stdin=subprocess.PIPE,
+        )
+        self.out = self.proc.stdin
+        self.marks = 0
+        self.bytes = 0
+
+    def next_mark(self):
+        self.marks += 1
+        return self.marks
+
+    def data(self, content: bytes):
+        self.out.write(b"data %d\n" % len(content))
+        self.out.write(content)
+        self.out.write(b"\n")
+
+    def blob_from_file(self, path: Path):
+        """Stream a file as a blob, returns its mark"""
+        mark = self.next_mark()
+        size = path.stat().st_size
+        self.out.write(b"blob\nmark :%d\ndata %d\n" % (mark, size))
+        with open(path, "rb") as f:
+            shutil.copyfileobj(f, self.out, COPY_SIZE)
+        self.out.write(b"\n")
+        self.bytes += size
+        return mark
+
+    def commit(self, ref, message, when, changes):
+        """
+        Commit blob marks on top of the current tip of ref
+
+        Args:
+            changes: List of (path, blob mark) tuples
+
+        Returns:
+            Mark of the commit
+        """
+        mark = self.next_mark()
+        self.out.write(
+            f"commit {ref}\nmark :{mark}\n"
+            f"author {AUTHOR} {when} +0000\ncommitter {AUTHOR} {when} +0000\n".encode()
+        )
+        self.data(message.encode())
+        self.out.write(
+            "".join(f"M 100644 :{blob} {path}\n" for path, blob in changes).encode()
+        )
+        self.out.write(b"\n")
+        return mark
+
+    def tag(self, name, commit, when, message):
+        self.out.write(
+            f"tag {name}\nfrom :{commit}\ntagger {AUTHOR} {when} +0000\n".encode()
+        )
+        self.data(message.encode())
+
+    def reset(self, ref, commit):
+        self.out.write(f"reset {ref}\nfrom :{commit}\n\n".encode())
+
+    def close(self):
+        self.out.write(b"done\n")
+        self.out.close()
+        if self.proc.wait() != 0:
+            raise RuntimeError(
+                f"git fast-import failed with code {self.proc.returncode}"
+            )
+
+
+def render_version(task, filepath: Path, seed, version):
+    """Write one version of a file task, every version gets its own seed"""
+    task_seed = modulegen.derive_seed(seed, task["path"], version)
+    if "template" in task:
+        modulegen.render_file(
+            filepath,
+            task["template"],
+            task_seed,
+            trailer=task["trailer"],
+            **task["params"],
+        )
+    elif "text" in task:
+        filepath.write_text(task["text"] + task["trailer"])
+    else:
+        spec = task["payload"]
+        payload.write_payload(
+            filepath,
+            spec["size"],
+            spec["source"],
+            compression_level=spec["compression_level"],
+            seed=task_seed,
+        )
+
+
+def churn_count(fraction, total, rng):
+    """Number of files to change, rounding fractions stochastically"""
+    expected = fraction * total
+    count = int(expected) + (rng.random() < expected - int(expected))
+    return min(count, total)
+
+
+def pack_size(repo: Path):
+    return sum(p.stat().st_size for p in (repo / "objects").rglob("*") if p.is_file())
+
+
+def generate_history(
+    module_spec,
+    output=HISTORY_DIR,
+    commits=1000,
+    tf_churn=0.05,
+    bin_churn=0.01,
+    tag_every=50,
+    branches=0,
+    seed=0,
+    scale=1.0,
+    repack=False,
+):
+    """
+    Build a bare repository with a deep history of a module
+
+    The first commit holds the whole module. Every following commit rewrites
+    a tf_churn fraction of the template files (at least one) and a bin_churn
+    fraction of the payload files with the seed of a new version. Annotated
+    tags are created every tag_every commits and branches point at random
+    commits of the history.
+
+    Args:
+        module_spec: Module spec, see modulespec
+        output: Directory of the bare repositories
+        commits: Number of commits on main
+        tf_churn: Fraction of template files changed per commit
+        bin_churn: Fraction of payload files changed per commit
+        tag_every: Commits between tags, 0 for no tags
+        branches: Number of extra branches
+        seed: Base seed
+        scale: Factor applied to file counts, resource counts and payload sizes
+        repack: Run git repack -adf after the import, as a server would
+
+    Returns:
+        Dict with repository path, counts, streamed bytes, seconds and pack size
+    """
+    tasks = modulespec.expand_spec(module_spec, scale)
+    templates = [t for t in tasks if "template" in t]
+    payloads = [t for t in tasks if "payload" in t]
+    rng = random.Random(modulegen.derive_seed(seed, module_spec["name"], "history"))
+
+    repo = Path(output) / f"{git.repo_name(Path(module_spec['name']))}.git"
+    if repo.exists():
+        shutil.rmtree(repo)
+    repo.parent.mkdir(parents=True, exist_ok=True)
+    subprocess.run(
+        ["git", "init", "--bare", "--quiet", "--initial-branch=main", repo.as_posix()],
+        check=True,
+    )
+
+    start = time.monotonic()
+    stream = FastImport(repo)
+    commit_marks = []
+    tags = 0
+    changed_files = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        scratch = Path(tmp) / "file"
+        try:
+            for i in range(commits):
+                if i == 0:
+                    changed = tasks
+                else:
+                    tf_count = max(1, churn_count(tf_churn, len(templates), rng))
+                    changed = rng.sample(templates, min(tf_count, len(templates)))
+                    changed += rng.sample(
+                        payloads, churn_count(bin_churn, len(payloads), rng)
+                    )
+                changes = []
+                for task in changed:
+                    render_version(task, scratch, seed, i)
+                    changes.append((task["path"], stream.blob_from_file(scratch)))
+                changed_files += len(changes)
+
+                when = EPOCH + i * COMMIT_INTERVAL
+                message = (
+                    "Initial module" if i == 0 else f"Update {len(changes)} file(s)"
+                )
+                commit_marks.append(
+                    stream.commit("refs/heads/main", message, when, changes)
+                )
+                if tag_every and (i + 1) % tag_every == 0:
+                    tags += 1
+                    stream.tag(
+                        f"v1.{tags}.0", commit_marks[-1], when, f"Release {tags}"
+                    )
+
+            for b in range(branches):
+                stream.reset(f"refs/heads/branch-{b:04d}", rng.choice(commit_marks))
+        finally:
+            stream.close()
+    seconds = time.monotonic() - start
+
+    result = {
+        "module": module_spec["name"],
+        "repository": repo.as_posix(),
+        "commits": commits,
+        "tags": tags,
+        "branches": branches,
+        "changed_files": changed_files,
+        "streamed_bytes": stream.bytes,
+        "import_seconds": round(seconds, 3),
+        "pack_bytes": pack_size(repo),
+        "repack_seconds": None,
+    }
+    if repack:
+        start = time.monotonic()
+        subprocess.run(
+            ["git", "--git-dir", repo.as_posix(), "repack", "-adfq"], check=True
+        )
+        result["repack_seconds"] = round(time.monotonic() - start, 3)
+        result["pack_bytes"] = pack_size(repo)
+    return result
+
+
+def clone_bench(repo: Path):
+    """
+    Time a full and a shallow clone of a repository over file://
+
+    Returns:
+        List of dicts with mode, seconds and bytes of the clone
+    """
+    url = f"file://{Path(repo).resolve().as_posix()}"
+    results = []
+    for mode, args in [("full", []), ("shallow", ["--depth", "1"])]:
+        with tempfile.TemporaryDirectory() as tmp:
+            dest = Path(tmp) / "clone.git"
+            start = time.monotonic()
+            subprocess.run(
+                ["git", "clone", "--bare", "--quiet", *args, url, dest.as_posix()],
+                check=True,
+            )
+            seconds = time.monotonic() - start
+            results.append(
+                {"mode": mode, "seconds": round(seconds, 3), "bytes": pack_size(dest)}
+            )
+    return results
@@ -0,0 +1,75 @@
+from http import HTTPStatus
+from urllib.parse import unquote, urlsplit
+
+CHUNK_SIZE = 64 * 1024
+
+
+class Request:
+    """Parsed HTTP/1.1 request line and headers"""
+
+    def __init__(self, method, target, version, headers):
+        self.method = method
+        self.target = target
+        self.version = version
+        self.headers = headers
+        parts = urlsplit(target)
+        self.path = unquote(parts.path)
+        self.query = parts.query
+
+    @property
+    def keep_alive(self):
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+
+async def read_request(reader):
+    """Read a request line and headers, None when the client closed"""
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    try:
+        method, target, version = line.decode("latin-1").split()
+    except ValueError:
+        raise ValueError(f"Invalid request line {line[:80]!r}")
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+        name, sep, value = line.decode("latin-1").partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return Request(method, target, version, headers)
+
+
+async def iter_body(reader, headers, chunk_size=CHUNK_SIZE):
+    """Yield the request body, chunked or with a Content-Length"""
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            if size == 0:
+                while await reader.readuntil(b"\r\n") != b"\r\n":
+                    pass  # trailers
+                return
+            while size:
+                data = await reader.readexactly(min(size, chunk_size))
+                size -= len(data)
+                yield data
+            await reader.readexactly(2)
+    else:
+        remaining = int(headers.get("content-length", 0))
+        while remaining:
+            data = await reader.readexactly(min(remaining, chunk_size))
+            remaining -= len(data)
+            yield data
+
+
+async def read_body(reader, headers):
+    return b"".join([chunk async for chunk in iter_body(reader, headers)])
+
+
+def response_head(status, headers=()):
+    """Status line and headers of a response"""
+    status = HTTPStatus(status)
+    lines = [f"HTTP/1.1 {status.value} {status.phrase}"]
+    lines += [f"{name}: {value}" for name, value in headers]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
@@ -0,0 +1,229 @@
+import os
+import shutil
+import time
+from pathlib import Path
+
+import click
+
+from src.torture import bench, metrics
+
+# Entries of the configuration directory that are not linked into work dirs
+EXCLUDED = {".terraform", ".terraform.lock.hcl", ".git", "artifacts"}
+
+SCENARIOS = {
+    "cold": "No plugin cache and an empty .terraform",
+    "warm-plugins": "TF_PLUGIN_CACHE_DIR filled by an earlier init",
+    "warm-modules": ".terraform/modules copied from an earlier init",
+    "copy": ".terraform and the lock file copied from an earlier init",
+    "hardlink": ".terraform and the lock file hardlinked from an earlier init",
+}
+
+INIT_ARGS = ["tofu", "init", "-input=false", "-no-color"]
+
+
+def link_config(config: Path, workdir: Path):
+    """Create a work dir with symlinks to the top-level entries of a configuration"""
+    workdir.mkdir(parents=True)
+    for entry in sorted(config.iterdir()):
+        if entry.name in EXCLUDED or workdir.resolve().is_relative_to(entry.resolve()):
+            continue
+        (workdir / entry.name).symlink_to(entry.resolve())
+
+
+def seed_tree(source: Path, dest: Path, hardlink=False):
+    """
+    Copy or hardlink a tree, keeping symlinks
+
+    Returns:
+        Tuple of files created and bytes written
+    """
+    files = written = 0
+    if source.is_file():
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        if hardlink:
+            os.link(source, dest)
+        else:
+            shutil.copy2(source, dest)
+            written += source.stat().st_size
+        return 1, written
+    for root, dirs, names in os.walk(source):
+        rel = Path(root).relative_to(source)
+        (dest / rel).mkdir(parents=True, exist_ok=True)
+        for name in names + [d for d in dirs if (Path(root) / d).is_symlink()]:
+            src = Path(root) / name
+            dst = dest / rel / name
+            files += 1
+            if src.is_symlink():
+                dst.symlink_to(os.readlink(src))
+            elif hardlink:
+                os.link(src, dst)
+            else:
+                shutil.copy2(src, dst)
+                written += src.stat().st_size
+    return files, written
+
+
+def tree_snapshot(path: Path):
+    """Files and symlinks of a tree, without following symlinks, and their inodes"""
+    files = 0
+    inodes = {}
+    for root, dirs, names in os.walk(path):
+        for name in names + [d for d in dirs if (Path(root) / d).is_symlink()]:
+            st = os.lstat(Path(root) / name)
+            files += 1
+            inodes[(st.st_dev, st.st_ino)] = st.st_size if name not in dirs else 0
+    return files, inodes
+
+
+def init_env(plugin_cache=None, cli_config=None):
+    env = dict(os.environ, TF_IN_AUTOMATION="1")
+    env.pop("TF_PLUGIN_CACHE_DIR", None)
+    env.pop("TF_DATA_DIR", None)
+    if plugin_cache is not None:
+        env["TF_PLUGIN_CACHE_DIR"] = plugin_cache.resolve().as_posix()
+    if cli_config is not None:
+        env["TF_CLI_CONFIG_FILE"] = Path(cli_config).resolve().as_posix()
+    return env
+
+
+def run_init(workdir: Path, env):
+    """Run tofu init in a work dir as a measured phase, logged next to it"""
+    log_path = workdir.parent / f"{workdir.name}.log"
+    with open(log_path, "wb") as log:
+        phase = metrics.run_phase(
+            "init", INIT_ARGS, stdout=log, stderr=log, cwd=workdir, env=env
+        )
+    phase.pop("samples", None)
+    if phase["returncode"] != 0:
+        raise RuntimeError(f"tofu init failed in {workdir}, see {log_path}")
+    return phase
+
+
+def prepare(config: Path, workdir: Path, cli_config=None):
+    """
+    Run the unmeasured inits the warm scenarios start from
+
+    One init fills a plugin cache, the other one leaves a self-contained
+    .terraform directory with real provider files to copy or hardlink.
+
+    Returns:
+        Tuple of the plugin cache and the primed work dir
+    """
+    plugin_cache = workdir / "plugin-cache"
+    plugin_cache.mkdir(parents=True)
+    click.echo("Priming the plugin cache")
+    cached = workdir / "prime-cache"
+    link_config(config, cached)
+    run_init(cached, init_env(plugin_cache, cli_config))
+
+    click.echo("Priming a .terraform directory")
+    primed = workdir / "prime-local"
+    link_config(config, primed)
+    run_init(primed, init_env(None, cli_config))
+    return plugin_cache, primed
+
+
+def run_scenario(scenario, config, run_dir, plugin_cache, primed, cli_config=None):
+    """
+    Seed a fresh work dir for a scenario and time tofu init in it
+
+    Returns:
+        Dict with seed and init timings, files and bytes created by init
+    """
+    link_config(config, run_dir)
+    start = time.monotonic()
+    seed_files = seed_bytes = 0
+    if scenario == "warm-modules":
+        modules = primed / ".terraform" / "modules"
+        if modules.exists():
+            seed_files, seed_bytes = seed_tree(
+                modules, run_dir / ".terraform" / "modules"
+            )
+    elif scenario in ("copy", "hardlink"):
+        for name in (".terraform", ".terraform.lock.hcl"):
+            if (primed / name).exists():
+                files, written = seed_tree(
+                    primed / name, run_dir / name, scenario == "hardlink"
+                )
+                seed_files += files
+                seed_bytes += written
+    seed_seconds = time.monotonic() - start
+
+    files_before, inodes_before = tree_snapshot(run_dir)
+    env = init_env(plugin_cache if scenario == "warm-plugins" else None, cli_config)
+    phase = run_init(run_dir, env)
+    files_after, inodes_after = tree_snapshot(run_dir)
+
+    return {
+        "scenario": scenario,
+        "seed_seconds": round(seed_seconds, 3),
+        "seed_files": seed_files,
+        "seed_bytes": seed_bytes,
+        "init_seconds": phase["wall_seconds"],
+        "total_seconds": round(seed_seconds + phase["wall_seconds"], 3),
+        "files_created": files_after - files_before,
+        "bytes_created": sum(
+            size for inode, size in inodes_after.items() if inode not in inodes_before
+        ),
+        "write_bytes": phase["tree_write_bytes"],
+        "phase": phase,
+    }
+
+
+def run_bench(
+    config=".",
+    workdir="artifacts/bench-init",
+    scenarios=None,
+    repeat=3,
+    cli_config=None,
+):
+    """
+    Time tofu init of a configuration under cold and warm cache scenarios
+
+    Every run starts from a fresh work dir linking to the configuration, so
+    .terraform and the lock file are created from scratch or from the seeded
+    copies. Runs of the scenarios are interleaved to spread out drift.
+
+    Args:
+        config: Root configuration directory
+        workdir: Directory for the work dirs, replaced if it exists
+        scenarios: Scenario names, defaults to all of SCENARIOS
+        repeat: Runs per scenario
+        cli_config: Optional CLI configuration file, e.g. from gen-providers
+
+    Returns:
+        Dict of scenario name to runs and summary
+    """
+    config = Path(config)
+    workdir = Path(workdir)
+    scenarios = list(scenarios or SCENARIOS)
+    if workdir.exists():
+        shutil.rmtree(workdir)
+    plugin_cache, primed = prepare(config, workdir, cli_config)
+
+    results = {name: {"runs": []} for name in scenarios}
+    for attempt in range(repeat):
+        for scenario in scenarios:
+            click.echo(f"{scenario} (run {attempt + 1}/{repeat})")
+            run_dir = workdir / scenario / f"run-{attempt + 1}"
+            results[scenario]["runs"].append(
+                run_scenario(
+                    scenario, config, run_dir, plugin_cache, primed, cli_config
+                )
+            )
+            shutil.rmtree(run_dir)
+
+    for result in results.values():
+        runs = result["runs"]
+        result["summary"] = {
+            key: bench.summarize([r[key] for r in runs])
+            for key in (
+                "init_seconds",
+                "total_seconds",
+                "files_created",
+                "bytes_created",
+                "write_bytes",
+                "seed_bytes",
+            )
+        }
+    return results
@@ -0,0 +1,334 @@
+import asyncio
+import itertools
+import json
+import socket
+import time
+from urllib.parse import urlsplit
+
+from src.torture import logstream
+
+CHUNK_SIZE = 64 * 1024
+
+# Chunks buffered between a connection and its consumer
+QUEUE_SIZE = 64
+
+# Seconds without data, or blocked on a full queue, reported as a stall
+STALL_THRESHOLD = 1.0
+
+HTTP_METHODS = (b"POST ", b"PUT /")
+
+
+class RateLimiter:
+    """
+    Token bucket limiting bytes per second
+
+    Args:
+        rate: Bytes per second, None for unlimited
+        burst: Bucket size in bytes, defaults to one second of rate
+    """
+
+    def __init__(self, rate=None, burst=None):
+        self.rate = rate
+        self.burst = burst or rate
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def delay(self, size):
+        """Take size bytes from the bucket, returns the seconds to wait for them"""
+        if not self.rate:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= size
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    async def consume(self, size):
+        wait = self.delay(size)
+        if wait:
+            await asyncio.sleep(wait)
+
+
+class Connection:
+    """Ingest statistics of one client connection"""
+
+    def __init__(self, conn_id, peer, started):
+        self.id = conn_id
+        self.peer = peer
+        self.protocol = None
+        self.started = started
+        self.finished = None
+        self.chunks = 0
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.max_queue = 0
+        self.stalls = []
+        self.analyzer = logstream.LogAnalyzer()
+
+    def summary(self):
+        lag = self.analyzer.lag
+        return {
+            "id": self.id,
+            "peer": self.peer,
+            "protocol": self.protocol,
+            "seconds": round((self.finished or time.monotonic()) - self.started, 3),
+            "chunks": self.chunks,
+            "received_bytes": self.received,
+            "processed_bytes": self.processed,
+            "dropped_bytes": self.dropped,
+            "max_queue_depth": self.max_queue,
+            "stalls": self.stalls,
+            "log_lines": self.analyzer.log_lines,
+            "lag_us_p50": logstream.histogram_percentile(lag, 50),
+            "lag_us_p95": logstream.histogram_percentile(lag, 95),
+        }
+
+
+class IngestServer:
+    """
+    Local stand-in for a log collector
+
+    Accepts log streams as raw TCP or as HTTP POST/PUT bodies (chunked or with
+    a Content-Length). Every connection has a bounded queue between the
+    socket and a consumer that applies the ingest rate limit and per-chunk
+    latency, so a slow collector pushes back on the sender through TCP. With
+    drop=True a full queue drops chunks instead. Chunk arrivals, drops and
+    stalls are appended to an optional JSON lines events file.
+
+    Args:
+        rate: Ingest limit in bytes per second, shared by all connections
+        latency: Seconds of processing delay per chunk
+        queue_size: Chunks buffered per connection
+        drop: Drop chunks when the queue is full instead of blocking
+        stall: Seconds without progress reported as a stall
+        chunk_size: Socket read size
+        events: Optional text file object for JSON lines events
+    """
+
+    def __init__(
+        self,
+        rate=None,
+        latency=0.0,
+        queue_size=QUEUE_SIZE,
+        drop=False,
+        stall=STALL_THRESHOLD,
+        chunk_size=CHUNK_SIZE,
+        events=None,
+    ):
+        self.limiter = RateLimiter(rate)
+        self.latency = latency
+        self.queue_size = queue_size
+        self.drop = drop
+        self.stall = stall
+        self.chunk_size = chunk_size
+        self.events = events
+        self.started = time.monotonic()
+        self.connections = []
+        self._ids = itertools.count(1)
+
+    def event(self, conn, kind, **fields):
+        if self.events is not None:
+            record = {"t": round(time.monotonic() - self.started, 6), "conn": conn.id}
+            record.update(event=kind, **fields)
+            self.events.write(json.dumps(record) + "\n")
+
+    def add_stall(self, conn, kind, started, seconds):
+        stall = {
+            "kind": kind,
+            "t": round(started - self.started, 3),
+            "seconds": round(seconds, 3),
+        }
+        conn.stalls.append(stall)
+        self.event(conn, "stall", kind=kind, seconds=stall["seconds"])
+
+    async def handle(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        conn = Connection(next(self._ids), f"{peer[0]}:{peer[1]}", time.monotonic())
+        self.connections.append(conn)
+        queue = asyncio.Queue(self.queue_size)
+        consumer = asyncio.create_task(self.consume(conn, queue))
+        try:
+            try:
+                head = await reader.readexactly(len(HTTP_METHODS[0]))
+            except asyncio.IncompleteReadError as e:
+                head = e.partial
+            if head in HTTP_METHODS:
+                conn.protocol = "http"
+                status = await self.read_http(conn, reader, queue)
+            else:
+                conn.protocol = "tcp"
+                if head:
+                    await self.arrive(conn, queue, head)
+                await self.read_stream(conn, reader, queue)
+                status = None
+            await queue.put(None)
+            await consumer
+            if status is not None:
+                body = json.dumps(conn.summary()).encode()
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+                    + body
+                )
+                await writer.drain()
+        except (
+            ConnectionError,
+            asyncio.IncompleteReadError,
+            asyncio.LimitOverrunError,
+            ValueError,
+        ) as e:
+            self.event(conn, "error", error=str(e))
+            consumer.cancel()
+        finally:
+            conn.finished = time.monotonic()
+            writer.close()
+
+    async def read_stream(self, conn, reader, queue, remaining=None):
+        """Read raw data until EOF or until remaining bytes were read"""
+        while remaining is None or remaining > 0:
+            size = (
+                self.chunk_size
+                if remaining is None
+                else min(remaining, self.chunk_size)
+            )
+            waited = time.monotonic()
+            data = await reader.read(size)
+            idle = time.monotonic() - waited
+            if idle > self.stall:
+                self.add_stall(conn, "idle", waited, idle)
+            if not data:
+                if remaining is not None:
+                    raise ValueError("Connection closed before the end of the body")
+                return
+            if remaining is not None:
+                remaining -= len(data)
+            await self.arrive(conn, queue, data)
+
+    async def read_http(self, conn, reader, queue):
+        """Read one HTTP request body, returns the response status line"""
+        header = await reader.readuntil(b"\r\n\r\n")
+        headers = {}
+        for line in header.decode("latin-1").split("\r\n")[1:]:
+            name, sep, value = line.partition(":")
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size_line = await reader.readuntil(b"\r\n")
+                size = int(size_line.split(b";")[0], 16)
+                if size == 0:
+                    while await reader.readuntil(b"\r\n") != b"\r\n":
+                        pass  # trailers
+                    break
+                await self.read_stream(conn, reader, queue, size)
+                await reader.readexactly(2)
+        elif "content-length" in headers:
+            await self.read_stream(conn, reader, queue, int(headers["content-length"]))
+        else:
+            return "411 Length Required"
+        return "200 OK"
+
+    async def arrive(self, conn, queue, data):
+        conn.chunks += 1
+        conn.received += len(data)
+        if self.drop:
+            try:
+                queue.put_nowait(data)
+            except asyncio.QueueFull:
+                conn.dropped += len(data)
+                self.event(conn, "drop", bytes=len(data), queue=queue.qsize())
+                return
+        else:
+            blocked = time.monotonic()
+            await queue.put(data)
+            waited = time.monotonic() - blocked
+            if waited > self.stall:
+                self.add_stall(conn, "blocked", blocked, waited)
+        # Depth once the chunk is queued, never above the queue size
+        depth = queue.qsize()
+        conn.max_queue = max(conn.max_queue, depth)
+        self.event(conn, "chunk", bytes=len(data), queue=depth)
+
+    async def consume(self, conn, queue):
+        while (data := await queue.get()) is not None:
+            await self.limiter.consume(len(data))
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            conn.analyzer.feed(data)
+            conn.processed += len(data)
+
+    def summary(self):
+        connections = [c.summary() for c in self.connections]
+        return {
+            "seconds": round(time.monotonic() - self.started, 3),
+            "connections": connections,
+            "received_bytes": sum(c["received_bytes"] for c in connections),
+            "processed_bytes": sum(c["processed_bytes"] for c in connections),
+            "dropped_bytes": sum(c["dropped_bytes"] for c in connections),
+            "stalls": sum(len(c["stalls"]) for c in connections),
+        }
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+class LogShipper:
+    """
+    Blocking sender of a log stream to tcp://host:port or http://host:port/path
+
+    Used as a Tee sink, so a slow receiver slows down the command producing
+    the logs. HTTP streams are sent as one chunked POST request. Socket
+    errors are raised as ValueError, so the Tee drops the shipper and keeps
+    writing the log file.
+    """
+
+    def __init__(self, url, timeout=30.0):
+        parts = urlsplit(url)
+        if parts.scheme not in ("tcp", "http") or not parts.hostname or not parts.port:
+            raise ValueError(
+                f"Invalid log URL '{url}', expected tcp://host:port or http://host:port/path"
+            )
+        self.url = url
+        self.http = parts.scheme == "http"
+        self.sock = socket.create_connection((parts.hostname, parts.port), timeout)
+        self.sent = 0
+        if self.http:
+            self.sock.sendall(
+                f"POST {parts.path or '/'} HTTP/1.1\r\nHost: {parts.netloc}\r\n"
+                "Content-Type: text/plain\r\nTransfer-Encoding: chunked\r\n"
+                "Connection: close\r\n\r\n".encode()
+            )
+
+    def __call__(self, data):
+        try:
+            if self.http:
+                self.sock.sendall(b"%x\r\n" % len(data))
+                self.sock.sendall(data)
+                self.sock.sendall(b"\r\n")
+            else:
+                self.sock.sendall(data)
+        except OSError as e:
+            raise ValueError(f"Shipping logs to {self.url} failed: {e}")
+        self.sent += len(data)
+
+    def close(self):
+        """Finish the stream, returns the HTTP status line or None"""
+        status = None
+        try:
+            if self.http:
+                self.sock.sendall(b"0\r\n\r\n")
+                response = b""
+                while chunk := self.sock.recv(CHUNK_SIZE):
+                    response += chunk
+                status = response.split(b"\r\n", 1)[0].decode("latin-1")
+            else:
+                self.sock.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+        finally:
+            self.sock.close()
+        return status
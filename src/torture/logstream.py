@@ -0,0 +1,271 @@
+import os
+import re
+import time
+from pathlib import Path
+
+READ_SIZE = 1024 * 1024
+
+# Seconds between polls of a followed file that stopped growing
+POLL_INTERVAL = 0.1
+
+# Seconds between progress callbacks while analyzing
+PROGRESS_INTERVAL = 5.0
+
+# `null_resource.medium_resource[3] (local-exec): [Resource 3] Log line 7: ... 1700000000123456789 ...`
+LINE_RE = re.compile(
+    rb"(?:(?P<address>[^\s:]+) \([\w-]+\): )?"
+    rb"\[Resource (?P<resource>\d+)\] (?:Destroy log|Log) line (?P<line>\d+):"
+    rb"\D*(?P<ts>\d{18,20})"
+)
+MARKER_RE = re.compile(
+    rb"(?:(?P<address>[^\s:]+) \([\w-]+\): )?"
+    rb"==== (?P<event>Starting|Completed) (?:provisioning|destruction) "
+    rb"for resource (?P<resource>\d+) ===="
+)
+ANSI_RE = re.compile(rb"\x1b\[[0-9;]*m")
+
+
+def lag_bucket(lag_ns):
+    """Power of two upper bound of a lag in microseconds"""
+    return 1 << max(lag_ns // 1000, 0).bit_length()
+
+
+def histogram_percentile(histogram, q):
+    """Percentile of a {upper bound: count} histogram, as the bucket bound"""
+    total = sum(histogram.values())
+    if not total:
+        return None
+    rank = total * q / 100
+    seen = 0
+    for bound, count in sorted(histogram.items()):
+        seen += count
+        if seen >= rank:
+            return bound
+    return bound
+
+
+class LogAnalyzer:
+    """
+    Streaming throughput analysis of provisioner log output
+
+    Lines are fed in chunks of any size. Log lines carrying a nanosecond
+    timestamp are counted into a timeline of lines and bytes per interval of
+    producer time, per-resource spans and a histogram of the lag between the
+    embedded timestamp and the moment the line was consumed. Memory grows with
+    the number of resources and timeline intervals, not with the log size.
+
+    Args:
+        interval: Seconds per timeline bucket
+        clock: Function returning the consumer time in nanoseconds
+    """
+
+    def __init__(self, interval=1.0, clock=time.time_ns):
+        self.interval_ns = int(interval * 1e9)
+        self.clock = clock
+        self.lines = 0
+        self.bytes = 0
+        self.log_lines = 0
+        self.timeline = {}
+        self.resources = {}
+        self.lag = {}
+        self.first_ts = None
+        self.last_ts = None
+        self.origin_ts = None
+        self._tail = b""
+
+    def feed(self, data):
+        """Analyze the complete lines of a chunk, keeping a partial last line"""
+        data = self._tail + bytes(data) if self._tail else bytes(data)
+        lines = data.split(b"\n")
+        self._tail = lines.pop()
+        now = self.clock()
+        for line in lines:
+            self.line(line, now)
+
+    def close(self):
+        if self._tail:
+            self.line(self._tail, self.clock())
+            self._tail = b""
+        return self.report()
+
+    def line(self, line, now):
+        size = len(line) + 1
+        self.lines += 1
+        self.bytes += size
+        if b"\x1b" in line:
+            line = ANSI_RE.sub(b"", line)
+
+        m = LINE_RE.search(line)
+        if m is None:
+            m = MARKER_RE.search(line)
+            if m is not None:
+                span = self._span(m)
+                span["started" if m["event"] == b"Starting" else "completed"] = True
+            return
+
+        ts = int(m["ts"])
+        self.log_lines += 1
+        if self.first_ts is None or ts < self.first_ts:
+            self.first_ts = ts
+        if self.last_ts is None or ts > self.last_ts:
+            self.last_ts = ts
+
+        # Buckets start at the first line, not at multiples of the interval
+        # since the epoch, so a short run is not split across two of them
+        if self.origin_ts is None:
+            self.origin_ts = ts
+        bucket = (ts - self.origin_ts) // self.interval_ns
+        stats = self.timeline.get(bucket)
+        if stats is None:
+            stats = self.timeline[bucket] = [0, 0]
+        stats[0] += 1
+        stats[1] += size
+
+        span = self._span(m)
+        if span["first_ts"] is None or ts < span["first_ts"]:
+            span["first_ts"] = ts
+        if span["last_ts"] is None or ts > span["last_ts"]:
+            span["last_ts"] = ts
+        span["lines"] += 1
+        span["bytes"] += size
+
+        lag = lag_bucket(now - ts)
+        self.lag[lag] = self.lag.get(lag, 0) + 1
+
+    def _span(self, m):
+        key = (m["address"] or b"").decode() or f"[Resource {int(m['resource'])}]"
+        span = self.resources.get(key)
+        if span is None:
+            span = self.resources[key] = {
+                "first_ts": None,
+                "last_ts": None,
+                "lines": 0,
+                "bytes": 0,
+                "started": False,
+                "completed": False,
+            }
+        return span
+
+    def report(self):
+        """Summary of the analyzed log as a JSON-serializable dict"""
+        interval = self.interval_ns / 1e9
+        first_bucket = min(self.timeline, default=0)
+        last_bucket = max(self.timeline, default=0)
+        timeline = []
+        for bucket, (lines, size) in sorted(self.timeline.items()):
+            seconds = interval
+            if bucket == last_bucket:
+                # The last bucket ends at the last line, rates are per second
+                # of it as for the average
+                end = self.last_ts - self.origin_ts - bucket * self.interval_ns
+                seconds = min(interval, end / 1e9) or interval
+            timeline.append(
+                {
+                    "t": round((bucket - first_bucket) * interval, 3),
+                    "seconds": round(seconds, 6),
+                    "lines_per_second": lines / seconds,
+                    "bytes_per_second": size / seconds,
+                }
+            )
+        # A partial last bucket only counts for the peak when it is the only one
+        full = [p for p in timeline if p["seconds"] >= interval] or timeline
+        duration = (
+            (self.last_ts - self.first_ts) / 1e9 if self.first_ts is not None else 0
+        )
+        spans = {}
+        for key, span in sorted(self.resources.items()):
+            span = dict(span)
+            if span["first_ts"] is not None:
+                span["start"] = round((span["first_ts"] - self.first_ts) / 1e9, 3)
+                span["seconds"] = round((span["last_ts"] - span["first_ts"]) / 1e9, 3)
+            spans[key] = span
+
+        return {
+            "lines": self.lines,
+            "bytes": self.bytes,
+            "log_lines": self.log_lines,
+            "duration_seconds": round(duration, 3),
+            "lines_per_second": self.log_lines / duration if duration else None,
+            "peak_lines_per_second": max(
+                (p["lines_per_second"] for p in full), default=None
+            ),
+            "timeline": timeline,
+            "resources": spans,
+            "lag_us": {
+                "p50": histogram_percentile(self.lag, 50),
+                "p95": histogram_percentile(self.lag, 95),
+                "p99": histogram_percentile(self.lag, 99),
+                "max": max(self.lag, default=None),
+                "histogram": [
+                    {"max_us": bound, "count": count}
+                    for bound, count in sorted(self.lag.items())
+                ],
+            },
+        }
+
+
+def follow_chunks(path, follow=False, idle_timeout=None, read_size=READ_SIZE):
+    """
+    Yield chunks of a file, optionally waiting for it to grow like tail -F
+
+    When following, a truncated or replaced file is read again from the
+    start. Following stops after idle_timeout seconds without new data.
+    """
+    path = Path(path)
+    idle_since = time.monotonic()
+    reopen = True
+    while reopen:
+        reopen = False
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(read_size)
+                if chunk:
+                    idle_since = time.monotonic()
+                    yield chunk
+                    continue
+                if not follow:
+                    return
+                if (
+                    idle_timeout is not None
+                    and time.monotonic() - idle_since > idle_timeout
+                ):
+                    return
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    stat = None
+                if stat is not None and (
+                    stat.st_ino != os.fstat(f.fileno()).st_ino
+                    or stat.st_size < f.tell()
+                ):
+                    reopen = True
+                    break
+                time.sleep(POLL_INTERVAL)
+
+
+def analyze_file(path, interval=1.0, follow=False, idle_timeout=None, progress=None):
+    """
+    Stream a log file through LogAnalyzer
+
+    Args:
+        path: Log file
+        interval: Seconds per timeline bucket
+        follow: Keep reading while the file grows, until idle_timeout or Ctrl-C
+        idle_timeout: Seconds without new data after which following stops
+        progress: Optional callable given the analyzer every PROGRESS_INTERVAL
+    """
+    analyzer = LogAnalyzer(interval)
+    last_progress = time.monotonic()
+    try:
+        for chunk in follow_chunks(path, follow, idle_timeout):
+            analyzer.feed(chunk)
+            if (
+                progress is not None
+                and time.monotonic() - last_progress > PROGRESS_INTERVAL
+            ):
+                progress(analyzer)
+                last_progress = time.monotonic()
+    except KeyboardInterrupt:
+        if not follow:
+            raise
+    return analyzer.close()
@@ -0,0 +1,327 @@
+import hashlib
+import json
+import shutil
+import time
+from concurrent.futures import Future
+from pathlib import Path
+
+from src.torture import profiling
+
+# Bump whenever the generators produce different output for the same spec,
+# so existing manifests no longer match and modules are rebuilt.
+GENERATOR_VERSION = 2
+
+MANIFEST_DIR_NAME = ".manifests"
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(filepath):
+    """Hash a file in chunks"""
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def format_size(size):
+    """Format byte count in the same style as du -h"""
+    for unit in ["B", "K", "M", "G"]:
+        if size < 1024 or unit == "G":
+            break
+        size /= 1024
+    if unit == "B":
+        return f"{int(size)}{unit}"
+    return f"{size:.1f}{unit}" if size < 10 else f"{size:.0f}{unit}"
+
+
+def parse_size(text):
+    """Parse a byte count with an optional K, M or G suffix, e.g. 512K"""
+    value = str(text).strip().upper().removesuffix("B")
+    factor = 1
+    if value and value[-1] in "KMG":
+        factor = 1024 ** ("KMG".index(value[-1]) + 1)
+        value = value[:-1]
+    try:
+        return int(float(value) * factor)
+    except ValueError:
+        raise ValueError(f"Invalid size '{text}', expected e.g. 512K or 2M")
+
+
+def task_key(fn, relpath, args, kwargs):
+    """Content address of a file task: generator version, function and arguments"""
+    spec = {
+        "version": GENERATOR_VERSION,
+        "fn": fn.__name__,
+        "path": relpath,
+        "args": args,
+        "kwargs": kwargs,
+    }
+    blob = json.dumps(spec, sort_keys=True, default=str).encode()
+    return hashlib.sha256(blob).hexdigest()
+
+
+def build_file(fn, filepath, args, kwargs):
+    """
+    Run a file task and describe its output
+
+    Task functions may return the uncompressed payload size, which is used to
+    record the compression ratio of the file.
+
+    Returns:
+        Tuple of the manifest entry and the seconds spent writing and hashing
+    """
+    start = time.perf_counter()
+    raw_size = fn(filepath, *args, **kwargs)
+    written = time.perf_counter()
+    stat = filepath.stat()
+    size = stat.st_size
+    entry = {
+        "sha256": file_sha256(filepath),
+        "size": size,
+        "mtime_ns": stat.st_mtime_ns,
+        "raw_size": raw_size,
+        "ratio": round(raw_size / size, 3) if raw_size and size else None,
+    }
+    return entry, {"write": written - start, "hash": time.perf_counter() - written}
+
+
+def run_task(fn, filepath, args, kwargs, profile_path=None, trace_memory=False):
+    """
+    Run a file task, optionally profiled or with traced allocations
+
+    Runs in the worker that builds the file, so profiles and traces cover the
+    task wherever it runs.
+
+    Returns:
+        Tuple of the manifest entry and the task stats: function name, write
+        and hash seconds and, when traced, peak bytes and retained allocation
+        sites
+    """
+    (entry, timings), stats = profiling.run_instrumented(
+        build_file,
+        fn,
+        filepath,
+        args,
+        kwargs,
+        profile_path=profile_path,
+        trace_memory=trace_memory,
+    )
+    stats.pop("seconds")
+    return entry, {"fn": fn.__name__, **timings, **stats}
+
+
+class ModuleBuild:
+    """
+    Incremental build of one module directory
+
+    File tasks are registered with add() and keyed by their arguments. run()
+    compares the keys against the module manifest, regenerates only the files
+    whose key changed or whose output is missing, removes files dropped from
+    the spec and writes the new manifest.
+
+    Args:
+        module_dir: Module directory inside the modules root
+        pool: Executor for file tasks, or None to run serially
+        seed: Base seed of the generation run
+        force: Rebuild every file regardless of the manifest
+        scale: Scale factor the module spec was expanded with
+        profile_dir: If set, profile every built file and write the merged
+            profile of the module to profile_dir/<module>.prof
+        trace_memory: Trace allocations of every built file with tracemalloc
+    """
+
+    def __init__(
+        self,
+        module_dir,
+        pool=None,
+        seed=0,
+        force=False,
+        scale=1.0,
+        profile_dir=None,
+        trace_memory=False,
+    ):
+        self.module_dir = Path(module_dir)
+        self.pool = pool
+        self.seed = seed
+        self.force = force
+        self.scale = scale
+        self.profile_dir = Path(profile_dir) if profile_dir else None
+        self.trace_memory = trace_memory
+        self.tasks = {}
+        self.stats = {}
+
+    def add(self, fn, filepath, *args, **kwargs):
+        """
+        Register a task that writes filepath
+
+        Args:
+            fn: Module-level (picklable) function called as fn(filepath, *args, **kwargs)
+            filepath: Output path inside the module directory
+        """
+        relpath = Path(filepath).relative_to(self.module_dir).as_posix()
+        self.tasks[relpath] = {
+            "fn": fn,
+            "filepath": Path(filepath),
+            "args": args,
+            "kwargs": kwargs,
+            "key": task_key(fn, relpath, args, kwargs),
+        }
+
+    def task_profile(self, index):
+        if self.profile_dir is None:
+            return None
+        return self.profile_dir / ".tasks" / f"{self.module_dir.name}-{index}.prof"
+
+    def submit(self, task, profile_path=None):
+        args = (task["fn"], task["filepath"], task["args"], task["kwargs"])
+        kwargs = {"profile_path": profile_path, "trace_memory": self.trace_memory}
+        if self.pool is None:
+            future = Future()
+            future.set_result(run_task(*args, **kwargs))
+            return future
+        return self.pool.submit(run_task, *args, **kwargs)
+
+    def run(self):
+        """
+        Build outdated files and write the manifest
+
+        Stats are left in self.stats: wall seconds of planning, building and
+        writing the manifest, seconds of every task function and of hashing
+        summed over the files (so above the build wall time with a pool), and
+        the traced memory.
+
+        Returns:
+            The new manifest
+        """
+        start = time.perf_counter()
+        old = {} if self.force else load_manifest(self.module_dir)
+        old_files = old.get("files", {})
+
+        outdated = []
+        files = {}
+        for relpath, task in self.tasks.items():
+            entry = old_files.get(relpath)
+            if (
+                entry
+                and entry["key"] == task["key"]
+                and is_current(task["filepath"], entry)
+            ):
+                files[relpath] = entry
+            else:
+                outdated.append(relpath)
+        planned = time.perf_counter()
+
+        futures = {}
+        for index, relpath in enumerate(outdated):
+            task = self.tasks[relpath]
+            task["filepath"].parent.mkdir(parents=True, exist_ok=True)
+            futures[relpath] = self.submit(task, self.task_profile(index))
+
+        phases = {}
+        task_stats = []
+        for relpath, future in futures.items():
+            entry, stats = future.result()
+            files[relpath] = {"key": self.tasks[relpath]["key"], **entry}
+            phases[stats["fn"]] = phases.get(stats["fn"], 0) + stats["write"]
+            phases["hash"] = phases.get("hash", 0) + stats["hash"]
+            task_stats.append(stats)
+        built = time.perf_counter()
+
+        for relpath in old_files.keys() - self.tasks.keys():
+            (self.module_dir / relpath).unlink(missing_ok=True)
+
+        manifest = {
+            "module": self.module_dir.name,
+            "generator_version": GENERATOR_VERSION,
+            "seed": self.seed,
+            "scale": self.scale,
+            "spec": {
+                relpath: {
+                    "fn": task["fn"].__name__,
+                    "args": task["args"],
+                    "kwargs": task["kwargs"],
+                }
+                for relpath, task in self.tasks.items()
+            },
+            "files": dict(sorted(files.items())),
+            "size": sum(entry["size"] for entry in files.values()),
+            "built": len(futures),
+            "reused": len(files) - len(futures),
+        }
+        save_manifest(self.module_dir, manifest)
+        saved = time.perf_counter()
+
+        self.stats = {
+            "seconds": saved - start,
+            "phases": {
+                "plan": planned - start,
+                "build": built - planned,
+                **phases,
+                "manifest": saved - built,
+            },
+        }
+        if self.trace_memory:
+            self.stats["peak"] = max((s["peak"] for s in task_stats), default=0)
+            self.stats["retained"] = profiling.merge_sites(
+                s["retained"] for s in task_stats
+            )
+        if self.profile_dir is not None:
+            self.stats["profile"] = profiling.merge_profiles(
+                [self.task_profile(i) for i in range(len(futures))],
+                self.profile_dir / f"{self.module_dir.name}.prof",
+            )
+        return manifest
+
+
+def manifest_path(module_dir):
+    """Location of the manifest of a module directory"""
+    module_dir = Path(module_dir)
+    return module_dir.parent / MANIFEST_DIR_NAME / f"{module_dir.name}.json"
+
+
+def load_manifest(module_dir):
+    """Load the manifest of a module, or an empty one when there is none"""
+    path = manifest_path(module_dir)
+    if not path.exists():
+        return {}
+    manifest = json.loads(path.read_text())
+    if manifest.get("generator_version") != GENERATOR_VERSION:
+        return {}
+    return manifest
+
+
+def save_manifest(module_dir, manifest):
+    path = manifest_path(module_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(manifest, indent=2, default=str) + "\n")
+
+
+def remove_module(module_dir):
+    """Remove a module directory together with its manifest"""
+    shutil.rmtree(module_dir, ignore_errors=True)
+    manifest_path(module_dir).unlink(missing_ok=True)
+
+
+def is_current(filepath, entry):
+    """
+    Check that a file still has the content recorded in the manifest
+
+    A file with the recorded size and mtime is trusted without reading it.
+    Any other file of the recorded size is hashed and compared with the
+    recorded sha256. On a match the entry takes the new mtime, so the file is
+    not hashed again on the next run.
+    """
+    try:
+        stat = filepath.stat()
+    except FileNotFoundError:
+        return False
+    if stat.st_size != entry["size"]:
+        return False
+    if stat.st_mtime_ns == entry.get("mtime_ns"):
+        return True
+    if file_sha256(filepath) != entry["sha256"]:
+        return False
+    entry["mtime_ns"] = stat.st_mtime_ns
+    return True
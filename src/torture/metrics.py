@@ -0,0 +1,222 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+PROC = Path("/proc")
+
+# Seconds between /proc samples of a running phase
+SAMPLE_INTERVAL = 0.25
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+# ru_maxrss is in kilobytes on Linux and in bytes on macOS
+MAXRSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+
+def read_stat(pid):
+    """Read ppid, CPU seconds and RSS bytes of a process from /proc/<pid>/stat"""
+    data = (PROC / str(pid) / "stat").read_text()
+    # The command name may contain spaces, so split after its closing paren
+    fields = data[data.rindex(")") + 2 :].split()
+    return {
+        "ppid": int(fields[1]),
+        "cpu": (int(fields[11]) + int(fields[12])) / CLOCK_TICKS,
+        "rss": int(fields[21]) * PAGE_SIZE,
+    }
+
+
+def read_io(pid):
+    """Read I/O counters of a process from /proc/<pid>/io"""
+    counters = {}
+    try:
+        for line in (PROC / str(pid) / "io").read_text().splitlines():
+            key, _, value = line.partition(":")
+            counters[key] = int(value)
+    except (OSError, ValueError):
+        pass
+    return counters
+
+
+def reset_peak_rss():
+    """Reset the peak RSS of this process, False where /proc does not allow it"""
+    try:
+        with open(PROC / "self" / "clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        return False
+    return True
+
+
+def peak_rss():
+    """Peak RSS bytes of this process since start or reset_peak_rss(), or None"""
+    try:
+        for line in (PROC / "self" / "status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def process_tree(root_pid):
+    """Stat the process and all its live descendants"""
+    stats = {}
+    for entry in PROC.iterdir():
+        if entry.name.isdigit():
+            try:
+                stats[int(entry.name)] = read_stat(entry.name)
+            except (OSError, ValueError):
+                continue
+
+    tree = {}
+    pending = [root_pid]
+    while pending:
+        pid = pending.pop()
+        if pid in stats and pid not in tree:
+            tree[pid] = stats[pid]
+            pending.extend(p for p, s in stats.items() if s["ppid"] == pid)
+    return tree
+
+
+def sample_tree(root_pid):
+    """Aggregate RSS, CPU and I/O of a process tree"""
+    tree = process_tree(root_pid)
+    sample = {
+        "processes": len(tree),
+        "rss": 0,
+        "cpu": 0.0,
+        "read_bytes": 0,
+        "write_bytes": 0,
+        "rchar": 0,
+        "wchar": 0,
+    }
+    for pid, stat in tree.items():
+        sample["rss"] += stat["rss"]
+        sample["cpu"] += stat["cpu"]
+        io = read_io(pid)
+        for key in ["read_bytes", "write_bytes", "rchar", "wchar"]:
+            sample[key] += io.get(key, 0)
+    sample["cpu"] = round(sample["cpu"], 3)
+    return sample
+
+
+class TreeSampler(threading.Thread):
+    """
+    Background /proc sampler of a process tree
+
+    Samples are only collected on systems with /proc; elsewhere the series
+    stays empty and only the rusage numbers of the phase are reported.
+    """
+
+    def __init__(self, pid, interval=SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self.started = time.monotonic()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        if not PROC.is_dir():
+            return
+        while not self._stop_event.is_set():
+            sample = sample_tree(self.pid)
+            if sample["processes"]:
+                sample["t"] = round(time.monotonic() - self.started, 3)
+                self.samples.append(sample)
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def run_phase(
+    name, args, stdout=None, interval=SAMPLE_INTERVAL, consumer=None, **popen_kwargs
+):
+    """
+    Run a command as a measured pipeline phase
+
+    Wall time, user/sys CPU and peak RSS come from wait4() rusage of the
+    child, which includes all descendants it waited for. A background thread
+    records a /proc time series of the whole process tree. Note that on
+    Linux ru_maxrss may include the footprint of the forked interpreter before
+    exec, so small phases report at least that much.
+
+    Args:
+        name: Phase name
+        args: Command to run
+        stdout: File object or descriptor for the command output
+        interval: Seconds between /proc samples
+        consumer: Callable reading the command output from a pipe instead of
+            stdout, its return value is reported as "pipe"
+
+    Returns:
+        Phase metrics dict, including the "returncode"
+    """
+    if consumer is not None:
+        stdout = subprocess.PIPE
+    start = time.monotonic()
+    proc = subprocess.Popen(args, stdout=stdout, **popen_kwargs)
+    sampler = TreeSampler(proc.pid, interval)
+    sampler.start()
+
+    pipe = None
+    try:
+        if consumer is not None:
+            try:
+                pipe = consumer(proc.stdout)
+            finally:
+                proc.stdout.close()
+        _, status, rusage = os.wait4(proc.pid, 0)
+        wall = time.monotonic() - start
+    except BaseException:
+        # Do not leave the child running and unreaped when the consumer fails
+        proc.kill()
+        proc.wait()
+        raise
+    finally:
+        sampler.stop()
+    proc.returncode = os.waitstatus_to_exitcode(status)
+
+    result = {
+        "name": name,
+        "command": [str(a) for a in args],
+        "returncode": proc.returncode,
+        "wall_seconds": round(wall, 3),
+        "user_seconds": round(rusage.ru_utime, 3),
+        "sys_seconds": round(rusage.ru_stime, 3),
+        "max_rss_bytes": rusage.ru_maxrss * MAXRSS_UNIT,
+        "peak_tree_rss_bytes": max((s["rss"] for s in sampler.samples), default=0),
+        # Counters of exited processes drop out of the tree, so report the
+        # largest sampled totals next to the block counts from rusage
+        "tree_read_bytes": max((s["read_bytes"] for s in sampler.samples), default=0),
+        "tree_write_bytes": max((s["write_bytes"] for s in sampler.samples), default=0),
+        "input_blocks": rusage.ru_inblock,
+        "output_blocks": rusage.ru_oublock,
+        "samples": sampler.samples,
+    }
+    if consumer is not None:
+        result["pipe"] = pipe
+    return result
+
+
+def artifact_sizes(directory):
+    """Sizes of the files in the artifacts directory"""
+    return {
+        p.name: p.stat().st_size
+        for p in sorted(Path(directory).iterdir())
+        if p.is_file()
+    }
+
+
+def write_metrics(path, phases, artifacts):
+    """Write phase metrics and artifact sizes as JSON"""
+    Path(path).write_text(
+        json.dumps({"phases": phases, "artifacts": artifacts}, indent=2) + "\n"
+    )
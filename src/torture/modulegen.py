@@ -1,14 +1,20 @@
 #!/usr/bin/env python3
-import random
+import hashlib
 import string
-import subprocess
+import time
+import tracemalloc
+from concurrent.futures import Executor
 from pathlib import Path
 
 import click
 from jinja2 import Template
 
+from src.torture import hcl, manifest, modulespec, payload, tfjson
+
 MODULES_DIR = Path("modules")
 
+SYNTAXES = ("hcl", "json")
+
 MAIN_TF_TEMPLATE = Template("""
 # {{ module_name }}
 # {{ description }}
@@ -145,457 +151,304 @@ output "submodule_{{ name }}_output" {
 """)
 
 
+STRING_POOL = payload.TextPool(string.ascii_letters + string.digits)
+DATA_POOL = payload.TextPool(string.ascii_letters + string.digits + "+/=")
+
+
+def seed_pools(seed):
+    """Restart the random_string and random_data sequences from seed"""
+    STRING_POOL.reseed(derive_seed(seed, "string"))
+    DATA_POOL.reseed(derive_seed(seed, "data"))
+
+
 def random_string(length=20):
     """Generate random string"""
-    return "".join(random.choices(string.ascii_letters + string.digits, k=length))
+    return STRING_POOL.take(length)
 
 
 def random_data(length=200):
     """Generate random base64-like data"""
-    return "".join(
-        random.choices(string.ascii_letters + string.digits + "+/=", k=length)
-    )
+    return DATA_POOL.take(length)
 
 
-def create_binary_file(filepath, size_mb, compression_level=None):
-    """
-    Create binary file using dd
+TEMPLATES = {
+    "main": MAIN_TF_TEMPLATE,
+    "variable": VARIABLE_TF_TEMPLATE,
+    "output": OUTPUT_TF_TEMPLATE,
+    "locals": LOCALS_TF_TEMPLATE,
+    "small_file": SMALL_FILE_TEMPLATE,
+    "submodule": SUBMODULE_TEMPLATE,
+}
 
-    Args:
-        filepath: Path to create file
-        size_mb: Size in megabytes
-        compression_level: If set, compress with gzip (1-9, where 9 is best compression)
-    """
-    click.echo(
-        f"    Creating binary file: {filepath.name} ({size_mb}MB, compression={compression_level})"
-    )
 
-    # Create temporary file with dd
-    temp_file = filepath.with_suffix(".tmp")
+def derive_seed(seed, *parts):
+    """
+    Derive a stable per-task seed
 
-    # Use dd to create file filled with random data
-    dd_cmd = [
-        "dd",
-        "if=/dev/urandom",
-        f"of={temp_file}",
-        "bs=1M",
-        f"count={size_mb}",
-        "status=none",
-    ]
+    The seed only depends on the base seed and the task identity (usually the
+    file path), so output is the same no matter which worker runs the task or
+    in which order tasks complete.
+    """
+    key = ":".join([str(seed), *(str(p) for p in parts)]).encode()
+    return int.from_bytes(hashlib.sha256(key).digest()[:8], "big")
 
-    subprocess.run(dd_cmd, check=True)
 
-    if compression_level is not None:
-        # Compress with gzip
-        gzip_cmd = ["gzip", f"-{compression_level}", "-c", str(temp_file)]
+def file_seed(seed, filepath, modules_dir=MODULES_DIR):
+    """Derive the seed of a file task from its path inside the modules root"""
+    return derive_seed(seed, Path(filepath).relative_to(modules_dir).as_posix())
 
-        with open(filepath, "wb") as f:
-            subprocess.run(gzip_cmd, stdout=f, check=True)
 
-        temp_file.unlink()
-    else:
-        # Just rename
-        temp_file.rename(filepath)
-
-
-def create_module_01_huge_single_file():
-    """Module 1: Single huge Terraform file (10MB)"""
-    click.echo("Creating Module 01: Single huge file (10MB)")
-    module_dir = MODULES_DIR / "module-01-huge-single-file"
-    module_dir.mkdir(parents=True, exist_ok=True)
-
-    content = MAIN_TF_TEMPLATE.render(
-        module_name="Module 01",
-        description="Single huge Terraform file with 5000 resources",
-        resource_count=5000,
-        prefix="huge_single",
-        include_data=True,
-        random_data=random_data,
+def render_template(template, seed, **params):
+    """Render a named Jinja template into a string"""
+    seed_pools(seed)
+    return TEMPLATES[template].render(
+        random_data=random_data, random_string=random_string, **params
     )
 
-    (module_dir / "main.tf").write_text(content)
-
-    # Add binary companion file (no compression)
-    create_binary_file(module_dir / "data.bin", 5, compression_level=None)
-
-    click.echo(f"  ✓ Module 01 created ({get_dir_size(module_dir)})")
-
-
-def create_module_02_multiple_large_files():
-    """Module 2: Multiple large files (5 files × 2MB each)"""
-    click.echo("Creating Module 02: Multiple large files (5 × 2MB)")
-    module_dir = MODULES_DIR / "module-02-multiple-large-files"
-    module_dir.mkdir(parents=True, exist_ok=True)
-
-    for i in range(1, 6):
-        content = MAIN_TF_TEMPLATE.render(
-            module_name=f"Module 02 - File {i}",
-            description=f"Large file {i} of 5",
-            resource_count=1000,
-            prefix=f"large_file_{i}",
-            include_data=True,
-            random_data=random_data,
-        )
-        (module_dir / f"resources_{i}.tf").write_text(content)
-
-    # Add binary files with different compression levels
-    for i in range(1, 6):
-        create_binary_file(
-            module_dir / f"data_{i}.bin.gz",
-            2,
-            compression_level=i,  # Varying compression from 1-5
-        )
-
-    click.echo(f"  ✓ Module 02 created ({get_dir_size(module_dir)})")
 
+def render_file(filepath, template, seed, trailer="", **params):
+    """
+    Stream a named template into a file
 
-def create_module_03_many_tiny_files():
-    """Module 3: Massive number of tiny files (1000 files × 1KB each)"""
-    click.echo("Creating Module 03: Many tiny files (1000 × 1KB)")
-    module_dir = MODULES_DIR / "module-03-many-tiny-files"
-    module_dir.mkdir(parents=True, exist_ok=True)
-
-    for i in range(1, 1001):
-        content = SMALL_FILE_TEMPLATE.render(index=i, random_string=random_string)
-        (module_dir / f"var_{i:04d}.tf").write_text(content)
-
-    # Create aggregator
-    aggregator_vars = "\n".join(
-        [f"    var_{i} = var.small_var_{i}" for i in range(1, 1001)]
+    Args:
+        filepath: Path to create file
+        template: Key in hcl.EMITTERS
+        seed: Seed for the task-local random payloads
+        trailer: Extra text appended after the rendered template
+    """
+    seed_pools(seed)
+    hcl.write_file(
+        filepath,
+        template,
+        trailer=trailer,
+        random_data=random_data,
+        random_string=random_string,
+        **params,
     )
-    (module_dir / "main.tf").write_text(f"""
-# Module 03 - Aggregator
-resource "null_resource" "aggregator" {{
-  triggers = {{
-{aggregator_vars}
-  }}
-}}
-""")
-
-    # Add many tiny binary files
-    for i in range(1, 51):  # 50 tiny binary files
-        create_binary_file(
-            module_dir / f"tiny_{i:02d}.dat",
-            1,  # 1MB each
-            compression_level=9,  # Maximum compression
-        )
-
-    click.echo(f"  ✓ Module 03 created ({get_dir_size(module_dir)})")
-
 
-def create_module_04_medium_complexity():
-    """Module 4: Medium complexity (50 medium files × 100KB each)"""
-    click.echo("Creating Module 04: Medium complexity (50 × 100KB)")
-    module_dir = MODULES_DIR / "module-04-medium-complexity"
-    module_dir.mkdir(parents=True, exist_ok=True)
-
-    for i in range(1, 51):
-        content = MAIN_TF_TEMPLATE.render(
-            module_name=f"Module 04 - Block {i}",
-            description=f"Medium file {i} of 50",
-            resource_count=50,
-            prefix=f"medium_{i}",
-            include_data=True,
-            random_data=random_data,
-        )
-        (module_dir / f"block_{i:02d}.tf").write_text(content)
-
-    # Add medium binary files with varying compression
-    for i in range(1, 11):
-        create_binary_file(
-            module_dir / f"medium_{i:02d}.bin.gz",
-            3,
-            compression_level=(i % 9) + 1,  # Compression 1-9
-        )
-
-    click.echo(f"  ✓ Module 04 created ({get_dir_size(module_dir)})")
-
-
-def create_module_05_deep_nested():
-    """Module 5: Deep nested directory structure"""
-    click.echo("Creating Module 05: Deep nested structure (10 levels)")
-    module_dir = MODULES_DIR / "module-05-deep-nested"
-    module_dir.mkdir(parents=True, exist_ok=True)
-
-    current_dir = module_dir
-    for depth in range(1, 11):
-        current_dir = current_dir / f"level_{depth:02d}"
-        current_dir.mkdir(parents=True, exist_ok=True)
-
-        content = MAIN_TF_TEMPLATE.render(
-            module_name=f"Module 05 - Level {depth}",
-            description=f"Nested at depth {depth}",
-            resource_count=100,
-            prefix=f"nested_depth_{depth}",
-            include_data=True,
-            random_data=random_data,
-        )
-        (current_dir / "resources.tf").write_text(content)
-
-        # Add binary file at each level
-        create_binary_file(
-            current_dir / f"level_{depth}.dat.gz", 2, compression_level=depth % 9 + 1
-        )
-
-    # Create main module file
-    (module_dir / "main.tf").write_text("""
-# Module 05 - Deep Nested Structure
-# Contains 10 levels of nested directories
-""")
 
-    click.echo(f"  ✓ Module 05 created ({get_dir_size(module_dir)})")
-
-
-def create_module_06_data_heavy():
-    """Module 6: JSON/YAML heavy (large embedded data)"""
-    click.echo("Creating Module 06: Data heavy (large JSON/maps)")
-    module_dir = MODULES_DIR / "module-06-data-heavy"
-    module_dir.mkdir(parents=True, exist_ok=True)
+def render_json_file(filepath, template, seed, calls=(), **params):
+    """
+    Stream a named template into a .tf.json file
 
-    content = LOCALS_TF_TEMPLATE.render(
-        module_name="Module 06",
-        local_count=100,
-        include_large_data=True,
-        map_size=2000,
-        json_items=1000,
-        random_string=random_string,
+    Args:
+        filepath: Path to create file
+        template: Key in tfjson.EMITTERS, None for module calls only
+        seed: Seed for the task-local random payloads
+        calls: Module calls added as module blocks
+    """
+    seed_pools(seed)
+    tfjson.write_file(
+        filepath,
+        template,
+        calls,
         random_data=random_data,
+        random_string=random_string,
+        **params,
     )
 
-    (module_dir / "locals.tf").write_text(content)
-
-    # Create main.tf with data processing
-    (module_dir / "main.tf").write_text("""
-# Module 06 - Data Heavy
-resource "null_resource" "data_processor" {
-  triggers = {
-    json_hash = md5(local.large_json_structure)
-    map_hash  = md5(jsonencode(local.large_data_map))
-  }
-}
-""")
-
-    # Add highly compressible binary file (lots of zeros)
-    dd_cmd = [
-        "dd",
-        "if=/dev/zero",
-        f"of={module_dir / 'zeros.tmp'}",
-        "bs=1M",
-        "count=20",
-        "status=none",
-    ]
-    subprocess.run(dd_cmd, check=True)
-
-    # Compress (should compress very well)
-    gzip_cmd = ["gzip", "-9", "-c", str(module_dir / "zeros.tmp")]
-    with open(module_dir / "highly_compressible.dat.gz", "wb") as f:
-        subprocess.run(gzip_cmd, stdout=f, check=True)
-    (module_dir / "zeros.tmp").unlink()
-
-    click.echo(f"  ✓ Module 06 created ({get_dir_size(module_dir)})")
-
-
-def create_module_07_variable_explosion():
-    """Module 7: Variable explosion (5000 variables)"""
-    click.echo("Creating Module 07: Variable explosion (5000 variables)")
-    module_dir = MODULES_DIR / "module-07-variable-explosion"
-    module_dir.mkdir(parents=True, exist_ok=True)
-
-    # Create variables file
-    content = VARIABLE_TF_TEMPLATE.render(var_count=5000, module_name="Module 07")
-    (module_dir / "variables.tf").write_text(content)
-
-    # Create outputs file
-    content = OUTPUT_TF_TEMPLATE.render(var_count=5000, module_name="Module 07")
-    (module_dir / "outputs.tf").write_text(content)
-
-    # Add uncompressed binary file
-    create_binary_file(module_dir / "uncompressed.bin", 10, compression_level=None)
-
-    click.echo(f"  ✓ Module 07 created ({get_dir_size(module_dir)})")
-
-
-def create_module_08_mixed_sizes():
-    """Module 8: Mixed - some large, many small files"""
-    click.echo("Creating Module 08: Mixed sizes (3 large + 500 small)")
-    module_dir = MODULES_DIR / "module-08-mixed-sizes"
-    module_dir.mkdir(parents=True, exist_ok=True)
-
-    # Create 3 large files
-    for i in range(1, 4):
-        content = MAIN_TF_TEMPLATE.render(
-            module_name=f"Module 08 - Large {i}",
-            description=f"Large mixed file {i}",
-            resource_count=800,
-            prefix=f"large_mixed_{i}",
-            include_data=True,
-            random_data=random_data,
-        )
-        (module_dir / f"large_{i}.tf").write_text(content)
 
-    # Create 500 small files
-    for i in range(1, 501):
-        content = SMALL_FILE_TEMPLATE.render(index=i, random_string=random_string)
-        (module_dir / f"small_{i:03d}.tf").write_text(content)
+def create_payload_file(
+    filepath, size, source="random", compression_level=None, seed=None
+):
+    """
+    Create binary payload file
 
-    # Mix of binary files with different compression
-    create_binary_file(module_dir / "no_compression.bin", 5, compression_level=None)
-    create_binary_file(module_dir / "low_compression.bin.gz", 5, compression_level=1)
-    create_binary_file(module_dir / "high_compression.bin.gz", 5, compression_level=9)
+    Args:
+        filepath: Path to create file
+        size: Size in bytes (before compression)
+        source: "random" or "zero"
+        compression_level: If set, compress with gzip (1-9, where 9 is best compression)
+        seed: If set, generate reproducible data from the seed
+    """
+    click.echo(
+        f"    Creating binary file: {filepath.name} "
+        f"({manifest.format_size(size)}, {source}, compression={compression_level})"
+    )
+    payload.write_payload(
+        filepath, size, source, compression_level=compression_level, seed=seed
+    )
+    return size
 
-    click.echo(f"  ✓ Module 08 created ({get_dir_size(module_dir)})")
 
+def write_text_file(filepath, content):
+    """Write static file content"""
+    Path(filepath).write_text(content)
 
-def create_module_09_submodules():
-    """Module 9: Submodules within submodules"""
-    click.echo("Creating Module 09: Nested submodules (3 levels deep)")
-    module_dir = MODULES_DIR / "module-09-submodules"
-    module_dir.mkdir(parents=True, exist_ok=True)
 
-    # Create main module
-    (module_dir / "main.tf").write_text("""
-# Module 09 - Nested Submodules
-module "sub_a" {
-  source = "./modules/sub-a"
-}
+def report_module(name, result):
+    """Print the build summary of a module from its manifest"""
+    size = manifest.format_size(result["size"])
+    if result["built"] == 0:
+        click.echo(f"  ✓ {name} unchanged ({size})")
+    else:
+        click.echo(
+            f"  ✓ {name} created ({size}, {result['built']} files built, "
+            f"{result['reused']} reused)"
+        )
 
-module "sub_b" {
-  source = "./modules/sub-b"
-}
 
-module "sub_c" {
-  source = "./modules/sub-c"
+# Phase of the build timings every file task function is counted in
+TASK_PHASES = {
+    "render_file": "render",
+    "render_json_file": "render",
+    "write_text_file": "text",
+    "create_payload_file": "payload",
 }
-""")
 
-    # Create 3 submodules
-    for letter in ["a", "b", "c"]:
-        sub_dir = module_dir / "modules" / f"sub-{letter}"
-        sub_dir.mkdir(parents=True, exist_ok=True)
-
-        # Create submodule main file
-        content = SUBMODULE_TEMPLATE.render(name=letter, resource_count=200)
-        (sub_dir / "main.tf").write_text(content)
+# Columns of the build timings: spec expansion, manifest checks and wall time
+# of the file tasks, then task seconds summed over files per phase
+BUILD_PHASES = (
+    "expand",
+    "plan",
+    "build",
+    "render",
+    "text",
+    "payload",
+    "hash",
+    "manifest",
+)
+
+
+def build_module(
+    module_spec,
+    pool: Executor | None = None,
+    seed=0,
+    force=False,
+    scale=1.0,
+    syntax="hcl",
+    modules_dir=MODULES_DIR,
+    profile_dir=None,
+    trace_memory=False,
+):
+    """
+    Generate a module directory from its spec
 
-        # Create sub-submodules
-        submodule_calls = []
-        for num in range(1, 4):
-            sub_sub_dir = sub_dir / "submodules" / f"sub-{num}"
-            sub_sub_dir.mkdir(parents=True, exist_ok=True)
+    Args:
+        module_spec: Module spec, see modulespec
+        pool: Executor for file tasks, or None to run serially
+        seed: Base seed of the generation run
+        force: Rebuild every file regardless of the manifest
+        scale: Factor applied to file counts, resource counts and payload sizes
+        syntax: "hcl", or "json" to write templates as .tf.json files with
+            the same values. Text files stay HCL, their module calls go to a
+            .tf.json file next to them.
+        modules_dir: Root directory of the module directories
+        profile_dir: If set, write the cProfile stats of the built files to
+            profile_dir/<module>.prof and a text report next to it
+        trace_memory: Trace peak memory and retained allocation sites of the
+            built files with tracemalloc
+
+    Returns:
+        Dict with the module name, wall seconds, seconds per phase (see
+        manifest.ModuleBuild.run) and, if requested, traced memory and profile path
+    """
+    if syntax not in SYNTAXES:
+        raise ValueError(f"Unknown syntax: {syntax}")
+    title = module_spec["title"]
+    scale_note = f", scale {scale:g}" if scale != 1 else ""
+    syntax_note = ", JSON syntax" if syntax == "json" else ""
+    click.echo(
+        f"Creating {title}: {module_spec['description']}{scale_note}{syntax_note}"
+    )
+    module_dir = Path(modules_dir) / module_spec["name"]
+    build = manifest.ModuleBuild(
+        module_dir, pool, seed, force, scale, profile_dir, trace_memory
+    )
 
-            content = SUBMODULE_TEMPLATE.render(
-                name=f"{letter}_{num}", resource_count=100
+    start = time.perf_counter()
+    for task in modulespec.expand_spec(module_spec, scale):
+        filepath = module_dir / task["path"]
+        calls = task.get("calls", [])
+        if "template" in task and syntax == "json":
+            build.add(
+                render_json_file,
+                tfjson.json_path(filepath),
+                task["template"],
+                file_seed(seed, filepath, modules_dir),
+                calls=calls,
+                **task["params"],
             )
-            (sub_sub_dir / "main.tf").write_text(content)
-
-            # Add binary file to sub-submodule
-            create_binary_file(
-                sub_sub_dir / f"data_{letter}_{num}.bin.gz",
-                2,
-                compression_level=num * 3,
+        elif "template" in task:
+            build.add(
+                render_file,
+                filepath,
+                task["template"],
+                file_seed(seed, filepath, modules_dir),
+                trailer=task["trailer"],
+                **task["params"],
+            )
+        elif "text" in task and syntax == "json":
+            build.add(write_text_file, filepath, task["text"])
+            if calls:
+                build.add(
+                    render_json_file, tfjson.json_path(filepath), None, 0, calls=calls
+                )
+        elif "text" in task:
+            build.add(write_text_file, filepath, task["text"] + task["trailer"])
+        else:
+            spec = task["payload"]
+            build.add(
+                create_payload_file,
+                filepath,
+                spec["size"],
+                spec["source"],
+                compression_level=spec["compression_level"],
+                seed=file_seed(seed, filepath, modules_dir),
             )
 
-            submodule_calls.append(f"""
-module "sub_{letter}_{num}" {{
-  source = "./submodules/sub-{num}"
-}}
-""")
-
-        # Add submodule calls to main submodule
-        with open(sub_dir / "main.tf", "a") as f:
-            f.write("\n".join(submodule_calls))
-
-    click.echo(f"  ✓ Module 09 created ({get_dir_size(module_dir)})")
+    expanded = time.perf_counter()
+
+    report_module(title, build.run())
+    phases = dict.fromkeys(BUILD_PHASES, 0.0)
+    phases["expand"] = expanded - start
+    for phase, seconds in build.stats["phases"].items():
+        phases[TASK_PHASES.get(phase, phase)] += seconds
+    return {
+        **build.stats,
+        "module": module_spec["name"],
+        "seconds": build.stats["seconds"] + phases["expand"],
+        "phases": phases,
+    }
 
 
-def create_module_10_extreme():
-    """Module 10: Extreme - combination of all patterns"""
-    click.echo("Creating Module 10: Extreme (all patterns combined)")
-    module_dir = MODULES_DIR / "module-10-extreme"
-    module_dir.mkdir(parents=True, exist_ok=True)
+def benchmark_emitter(filepath, resource_count=5000, seed=0):
+    """
+    Compare the Jinja template path against the streaming emitter
 
-    # One huge file
-    content = MAIN_TF_TEMPLATE.render(
-        module_name="Module 10 - Huge",
-        description="Extreme module - huge file component",
-        resource_count=2000,
-        prefix="extreme_huge",
-        include_data=True,
-        random_data=random_data,
-    )
-    (module_dir / "huge.tf").write_text(content)
-
-    # 100 medium files
-    for i in range(1, 101):
-        content = MAIN_TF_TEMPLATE.render(
-            module_name=f"Module 10 - Medium {i}",
-            description=f"Extreme module - medium file {i}",
-            resource_count=50,
-            prefix=f"extreme_medium_{i}",
-            include_data=True,
-            random_data=random_data,
-        )
-        (module_dir / f"medium_{i:03d}.tf").write_text(content)
-
-    # 500 tiny files
-    for i in range(1, 501):
-        content = SMALL_FILE_TEMPLATE.render(index=i, random_string=random_string)
-        (module_dir / f"tiny_{i:03d}.tf").write_text(content)
-
-    # Nested structure
-    nested_dir = module_dir / "nested" / "level1" / "level2" / "level3"
-    nested_dir.mkdir(parents=True, exist_ok=True)
-
-    content = MAIN_TF_TEMPLATE.render(
-        module_name="Module 10 - Nested",
-        description="Extreme module - nested component",
-        resource_count=100,
-        prefix="extreme_nested",
-        include_data=True,
-        random_data=random_data,
-    )
-    (nested_dir / "deep.tf").write_text(content)
-
-    # Large data file
-    content = LOCALS_TF_TEMPLATE.render(
-        module_name="Module 10",
-        local_count=200,
-        include_large_data=True,
-        map_size=1000,
-        json_items=1000,
-        random_string=random_string,
-        random_data=random_data,
-    )
-    (module_dir / "data.tf").write_text(content)
-
-    # Variety of binary files
-    create_binary_file(module_dir / "no_compress.bin", 10, compression_level=None)
-    create_binary_file(module_dir / "compress_1.bin.gz", 10, compression_level=1)
-    create_binary_file(module_dir / "compress_5.bin.gz", 10, compression_level=5)
-    create_binary_file(module_dir / "compress_9.bin.gz", 10, compression_level=9)
-
-    # Create zeros file (highly compressible)
-    dd_cmd = [
-        "dd",
-        "if=/dev/zero",
-        f"of={module_dir / 'zeros.tmp'}",
-        "bs=1M",
-        "count=50",
-        "status=none",
-    ]
-    subprocess.run(dd_cmd, check=True)
-    gzip_cmd = ["gzip", "-9", "-c", str(module_dir / "zeros.tmp")]
-    with open(module_dir / "zeros_compressed.dat.gz", "wb") as f:
-        subprocess.run(gzip_cmd, stdout=f, check=True)
-    (module_dir / "zeros.tmp").unlink()
-
-    click.echo(f"  ✓ Module 10 created ({get_dir_size(module_dir)})")
-
-
-def get_dir_size(path):
-    """Get directory size in human-readable format"""
-    result = subprocess.run(["du", "-sh", str(path)], capture_output=True, text=True)
-    return result.stdout.split()[0]
+    Renders a module 01 style main.tf both ways and returns wall time, output
+    size and peak traced memory for each, plus whether the outputs match.
+    """
+    params = {
+        "module_name": "Benchmark",
+        "description": f"Benchmark file with {resource_count} resources",
+        "resource_count": resource_count,
+        "prefix": "bench",
+        "include_data": True,
+    }
+    jinja_path = filepath.with_suffix(".jinja.tf")
+
+    def jinja():
+        jinja_path.write_text(render_template("main", seed, **params))
+
+    def emitter():
+        render_file(filepath, "main", seed, **params)
+
+    results = {}
+    for name, fn in [("jinja", jinja), ("emitter", emitter)]:
+        tracemalloc.start()
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = {"seconds": elapsed, "peak_bytes": peak}
+
+    results["jinja"]["bytes"] = jinja_path.stat().st_size
+    results["emitter"]["bytes"] = filepath.stat().st_size
+    results["identical"] = jinja_path.read_bytes() == filepath.read_bytes()
+    jinja_path.unlink()
+    return results
 
 
 def count_files(path):
@@ -0,0 +1,211 @@
+import json
+import re
+from pathlib import Path, PurePosixPath
+
+from src.torture import hcl, payload
+
+SPECS_DIR = Path(__file__).parent / "specs"
+
+# Integer template parameters multiplied by the --scale factor
+SCALED_PARAMS = {"resource_count", "var_count", "local_count", "map_size", "json_items"}
+
+MODULE_KEYS = {"name", "title", "description", "files", "submodules", "calls_file"}
+REPEAT_KEYS = {"count", "start", "fixed"}
+SUBMODULE_KEYS = {"name", "path", "files", "submodules", "calls_file"} | REPEAT_KEYS
+FILE_KEYS = {"path", "dir", "nested", "template", "params", "text", "payload"}
+FILE_KEYS |= REPEAT_KEYS
+PAYLOAD_KEYS = {"source", "size_mb", "compression_level"}
+
+# The repetition index in spec strings, {i} or with a format spec like {i:03d};
+# any other braces are kept as they are
+INDEX_RE = re.compile(r"\{i(?::([^{}]*))?\}")
+
+MODULE_CALL = """
+module "{name}" {{
+  source = "./{path}"
+}}
+"""
+
+
+def load_specs(path):
+    """
+    Load module specs from a JSON file
+
+    The file holds either a single module spec or a list of them.
+    """
+    data = json.loads(Path(path).read_text())
+    specs = data if isinstance(data, list) else [data]
+    for spec in specs:
+        validate_spec(spec, where=str(path))
+    return specs
+
+
+def builtin_specs():
+    """Load the specs of the ten built-in modules"""
+    specs = []
+    for path in sorted(SPECS_DIR.glob("*.json")):
+        specs.extend(load_specs(path))
+    return specs
+
+
+def validate_spec(spec, where="spec"):
+    """Check a module spec for unknown keys and missing fields"""
+    for key in ["name", "title", "description"]:
+        value = spec.get(key)
+        if not value or not isinstance(value, str):
+            raise ValueError(f"{where}: module needs a non-empty string '{key}'")
+    check_keys(spec, MODULE_KEYS, where)
+    validate_node(spec, f"{where}: {spec['name']}")
+
+
+def validate_node(node, where):
+    for entry in node.get("files", []):
+        check_keys(entry, FILE_KEYS, where)
+        if "path" not in entry:
+            raise ValueError(f"{where}: file entry needs a 'path'")
+        kinds = [k for k in ["template", "text", "payload"] if k in entry]
+        if len(kinds) != 1:
+            raise ValueError(
+                f"{where}: {entry['path']} needs exactly one of template, text, payload"
+            )
+        if "template" in entry and entry["template"] not in hcl.EMITTERS:
+            raise ValueError(
+                f"{where}: {entry['path']} has unknown template '{entry['template']}'"
+            )
+        if "payload" in entry:
+            check_keys(entry["payload"], PAYLOAD_KEYS, f"{where}: {entry['path']}")
+            if entry["payload"].get("source", "random") not in payload.SOURCES:
+                raise ValueError(f"{where}: {entry['path']} has unknown source")
+    for sub in node.get("submodules", []):
+        check_keys(sub, SUBMODULE_KEYS, where)
+        if "name" not in sub or "path" not in sub:
+            raise ValueError(f"{where}: submodule needs a 'name' and a 'path'")
+        validate_node(sub, f"{where}/{sub['path']}")
+
+
+def check_keys(obj, allowed, where):
+    unknown = set(obj) - allowed
+    if unknown:
+        raise ValueError(f"{where}: unknown keys {sorted(unknown)}")
+
+
+def scale_count(value, scale):
+    """Scale a positive count, never dropping it to zero"""
+    return max(1, round(value * scale)) if value > 0 else 0
+
+
+def iter_contexts(entry, context, scale):
+    """Yield the format context of every repetition of a file or submodule"""
+    if "count" not in entry:
+        yield context
+        return
+    count = entry["count"] if entry.get("fixed") else scale_count(entry["count"], scale)
+    start = entry.get("start", 1)
+    for i in range(start, start + count):
+        yield {**context, "i": i, "offset": i - start, "start": start}
+
+
+def format_index(text, i):
+    """Substitute the repetition index placeholders of a spec string"""
+
+    def replace(match):
+        try:
+            return format(i, match[1] or "")
+        except ValueError:
+            raise ValueError(f"invalid index format '{match[0]}' in '{text}'")
+
+    return text if i is None else INDEX_RE.sub(replace, text)
+
+
+def resolve(value, context):
+    """Pick per-index values from lists and format strings with the index"""
+    if isinstance(value, list):
+        return value[context.get("offset", 0) % len(value)]
+    if isinstance(value, str):
+        return format_index(value, context.get("i"))
+    return value
+
+
+def entry_dir(entry, context):
+    if "dir" not in entry:
+        return PurePosixPath()
+    if not entry.get("nested"):
+        return PurePosixPath(resolve(entry["dir"], context))
+    # Nested entries live under the directories of all previous repetitions
+    parts = [
+        format_index(entry["dir"], i) for i in range(context["start"], context["i"] + 1)
+    ]
+    return PurePosixPath(*parts)
+
+
+def expand_spec(spec, scale=1.0):
+    """
+    Expand a module spec into file tasks
+
+    Args:
+        spec: Module spec
+        scale: Factor applied to repetition counts, SCALED_PARAMS and payload sizes
+
+    Returns:
+        List of dicts with a relative "path" and one of "template" (with
+        "params" and "trailer"), "text" (with "trailer") or "payload" (with
+        "source", "size" and "compression_level"). The file holding the
+        module calls of a node also gets them as "calls", a list of dicts
+        with "name" and "path", and as HCL in its "trailer".
+    """
+    tasks = []
+    try:
+        expand_node(spec, PurePosixPath(), {}, scale, tasks)
+    except ValueError as e:
+        raise ValueError(f"{spec['name']}: {e}") from None
+    return tasks
+
+
+def expand_node(node, base, context, scale, tasks):
+    node_tasks = {}
+    for entry in node.get("files", []):
+        for ctx in iter_contexts(entry, context, scale):
+            path = base / entry_dir(entry, ctx) / resolve(entry["path"], ctx)
+            node_tasks[path] = expand_file(entry, path, ctx, scale)
+
+    sub_tasks = []
+    calls = []
+    for sub in node.get("submodules", []):
+        for ctx in iter_contexts(sub, context, scale):
+            sub_path = resolve(sub["path"], ctx)
+            calls.append({"name": resolve(sub["name"], ctx), "path": sub_path})
+            expand_node(sub, base / sub_path, ctx, scale, sub_tasks)
+
+    if calls:
+        calls_path = base / node.get("calls_file", "main.tf")
+        task = node_tasks.get(calls_path)
+        if task is None or "payload" in task:
+            raise ValueError(f"{calls_path}: no text or template file for module calls")
+        task["calls"] = calls
+        task["trailer"] = "\n".join(MODULE_CALL.format(**call) for call in calls)
+
+    tasks.extend(node_tasks.values())
+    tasks.extend(sub_tasks)
+
+
+def expand_file(entry, path, context, scale):
+    task = {"path": path.as_posix()}
+    if "template" in entry:
+        params = {}
+        for key, value in entry.get("params", {}).items():
+            value = resolve(value, context)
+            if key in SCALED_PARAMS:
+                value = scale_count(value, scale)
+            params[key] = value
+        task.update(template=entry["template"], params=params, trailer="")
+    elif "text" in entry:
+        task.update(text=entry["text"], trailer="")
+    else:
+        spec = entry["payload"]
+        size_mb = resolve(spec.get("size_mb", 1), context)
+        task["payload"] = {
+            "source": resolve(spec.get("source", "random"), context),
+            "size": max(1, round(size_mb * scale * payload.MB)),
+            "compression_level": resolve(spec.get("compression_level"), context),
+        }
+    return task
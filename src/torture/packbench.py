@@ -0,0 +1,282 @@
+import lzma
+import os
+import struct
+import tarfile
+import time
+import tracemalloc
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from src.torture import bench, metrics, modulegen, payload
+
+FORMATS = ("gz", "xz")
+
+CLASSES = ("text", "gzip", "zero", "random")
+
+# Bytes read from the start of a file to classify it
+SNIFF_SIZE = 64 * 1024
+
+# xz blocks are independent streams, so they are larger than deflate blocks,
+# which keep the previous block as dictionary
+XZ_BLOCK_SIZE = 8 * payload.MB
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+SUMMARY_KEYS = ("seconds", "mb_per_second", "peak_rss_bytes", "python_peak_bytes")
+
+
+def classify(path: Path):
+    """File class of a payload: text, gzip, zero or random"""
+    with open(path, "rb") as f:
+        head = f.read(SNIFF_SIZE)
+    if path.suffix == ".gz" or head.startswith(GZIP_MAGIC):
+        return "gzip"
+    if not head.strip(b"\0"):
+        return "zero"
+    try:
+        head.decode()
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut at the end of the sniffed bytes is fine
+        if e.start < len(head) - 4:
+            return "random"
+    return "text"
+
+
+def collect_files(paths):
+    """
+    Regular files below paths grouped by class, skipping hidden directories
+
+    Returns:
+        Dict of class to list of (path, archive name) tuples
+    """
+    classes = {name: [] for name in CLASSES}
+    for root in paths:
+        root = Path(root)
+        for dirpath, dirs, names in os.walk(root):
+            dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+            for name in sorted(names):
+                path = Path(dirpath) / name
+                if path.is_file() and not path.is_symlink():
+                    arcname = (root.name / path.relative_to(root)).as_posix()
+                    classes[classify(path)].append((path, arcname))
+    return classes
+
+
+class BlockCompressor:
+    """
+    Writable file object compressing into a sink in parallel blocks
+
+    Input is cut into blocks that are compressed in threads (zlib and lzma
+    release the GIL) and written to the sink in order. gz blocks are raw
+    deflate segments primed with the tail of the previous block and joined
+    into one gzip member like pigz does; xz blocks are independent xz
+    streams, which xz and Python's lzma decompress as one file.
+
+    Args:
+        sink: Binary file object receiving the compressed stream
+        fmt: "gz" or "xz"
+        level: gzip level 1-9 or xz preset 0-9
+        threads: Compression threads
+        block_size: Input bytes per block, defaults to 1M for gz and 8M for xz
+    """
+
+    def __init__(self, sink, fmt, level, threads=1, block_size=None):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown archive format: {fmt}")
+        self.sink = sink
+        self.fmt = fmt
+        self.level = level
+        self.threads = threads
+        self.block_size = block_size or (
+            payload.BLOCK_SIZE if fmt == "gz" else XZ_BLOCK_SIZE
+        )
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+        self.pending = deque()
+        self.buffer = bytearray()
+        self.zdict = b""
+        self.crc = 0
+        self.size = 0
+        if fmt == "gz":
+            sink.write(payload.gzip_header(level))
+
+    def write(self, data):
+        self.buffer += data
+        while len(self.buffer) >= self.block_size:
+            self.submit(bytes(self.buffer[: self.block_size]))
+            del self.buffer[: self.block_size]
+        return len(data)
+
+    def submit(self, block, last=False):
+        if self.fmt == "gz":
+            self.crc = zlib.crc32(block, self.crc)
+            future = self.pool.submit(
+                payload.deflate_block, block, self.level, self.zdict, last
+            )
+            self.zdict = block[-payload.WINDOW_SIZE :]
+        else:
+            future = self.pool.submit(
+                lzma.compress, block, lzma.FORMAT_XZ, preset=self.level
+            )
+        self.size += len(block)
+        self.pending.append(future)
+        while len(self.pending) >= self.threads * 2:
+            self.sink.write(self.pending.popleft().result())
+
+    def close(self):
+        if self.fmt == "gz" or self.buffer:
+            self.submit(bytes(self.buffer), last=True)
+            self.buffer.clear()
+        while self.pending:
+            self.sink.write(self.pending.popleft().result())
+        if self.fmt == "gz":
+            self.sink.write(struct.pack("<II", self.crc, self.size & 0xFFFFFFFF))
+        self.pool.shutdown()
+
+
+class CountingSink:
+    """Binary sink that only counts bytes, optionally passing them to a file"""
+
+    def __init__(self, f=None):
+        self.f = f
+        self.bytes = 0
+
+    def write(self, data):
+        self.bytes += len(data)
+        if self.f is not None:
+            self.f.write(data)
+        return len(data)
+
+
+def pack(files, sink, fmt, level, threads=1, block_size=None):
+    """
+    Stream files into a compressed tar
+
+    Args:
+        files: List of (path, archive name) tuples
+
+    Returns:
+        Uncompressed tar bytes
+    """
+    compressor = BlockCompressor(sink, fmt, level, threads, block_size)
+    # The default record size: the compressor buffers blocks itself, and the
+    # tar stream grows its buffer by concatenation
+    with tarfile.open(fileobj=compressor, mode="w|", format=tarfile.GNU_FORMAT) as tar:
+        for path, arcname in files:
+            tar.add(path, arcname, recursive=False)
+    compressor.close()
+    return compressor.size
+
+
+def warm_cache(files):
+    """Read files once so timed runs measure compression, not the disk"""
+    for path, _ in files:
+        with open(path, "rb") as f:
+            while f.read(payload.MB):
+                pass
+
+
+def run_pack(files, fmt, level, threads, block_size=None, output=None):
+    """
+    Time one packing run
+
+    The peak RSS of the process is the memory actually resident while
+    packing, including native encoder state that does not go through
+    Python's allocators. It includes the interpreter and is None where /proc
+    does not allow resetting it. The Python heap peak from tracemalloc counts
+    allocated bytes, touched or not, such as the lzma dictionaries (about
+    94MB per thread at xz preset 6).
+
+    Returns:
+        Dict with input and output bytes, ratio, seconds, MB/s, peak RSS and
+        Python heap peak
+    """
+    with open(output or os.devnull, "wb") as f:
+        sink = CountingSink(f if output else None)
+        rss_reset = metrics.reset_peak_rss()
+        tracemalloc.start()
+        start = time.perf_counter()
+        size = pack(files, sink, fmt, level, threads, block_size)
+        seconds = time.perf_counter() - start
+        _, heap_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        rss_peak = metrics.peak_rss() if rss_reset else None
+    return {
+        "input_bytes": size,
+        "output_bytes": sink.bytes,
+        "ratio": round(size / sink.bytes, 3) if sink.bytes else None,
+        "seconds": round(seconds, 3),
+        "mb_per_second": round(size / payload.MB / max(seconds, 1e-6), 1),
+        "peak_rss_bytes": rss_peak,
+        "python_peak_bytes": heap_peak,
+    }
+
+
+def run_bench(
+    paths=(modulegen.MODULES_DIR,),
+    gz_levels=(1, 6, 9),
+    xz_levels=(0, 6),
+    threads=None,
+    repeat=1,
+    block_size=None,
+    output=None,
+):
+    """
+    Pack a tree into tar.gz and tar.xz per file class and level
+
+    Files are grouped into text, gzip (already compressed), zero and random
+    payloads, and every class is packed on its own and all of them together
+    ("all"), so the cost of each shape shows separately from the mix.
+
+    Args:
+        paths: Directories to pack
+        gz_levels: gzip levels to run
+        xz_levels: xz presets to run
+        threads: Compression threads, defaults to the number of CPUs
+        repeat: Runs per class and level, summarized with median and p95
+        block_size: Input bytes per compressed block, see BlockCompressor
+        output: Optional directory to keep the archives of the last runs in
+
+    Returns:
+        List of dicts, one per class, format and level, with the runs summary
+    """
+    threads = threads or os.cpu_count() or 1
+    classes = collect_files(paths)
+    classes["all"] = sorted(
+        (f for files in classes.values() for f in files), key=lambda f: f[1]
+    )
+    if output is not None:
+        Path(output).mkdir(parents=True, exist_ok=True)
+
+    results = []
+    for name, files in classes.items():
+        if not files:
+            continue
+        warm_cache(files)
+        for fmt, levels in (("gz", gz_levels), ("xz", xz_levels)):
+            for level in levels:
+                archive = Path(output) / f"{name}-{level}.tar.{fmt}" if output else None
+                runs = [
+                    run_pack(files, fmt, level, threads, block_size, archive)
+                    for _ in range(repeat)
+                ]
+                results.append(
+                    {
+                        "class": name,
+                        "format": fmt,
+                        "level": level,
+                        "files": len(files),
+                        "input_bytes": runs[0]["input_bytes"],
+                        "output_bytes": runs[0]["output_bytes"],
+                        "ratio": runs[0]["ratio"],
+                        "threads": threads,
+                        "summary": {
+                            key: bench.summarize([r[key] for r in runs])
+                            for key in SUMMARY_KEYS
+                            if runs[0][key] is not None
+                        },
+                        "runs": runs,
+                    }
+                )
+    return results
@@ -0,0 +1,225 @@
+import hashlib
+import os
+import random
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+MB = 1024 * 1024
+
+# Size of the chunks that are generated, compressed and written at once
+BLOCK_SIZE = MB
+
+# Deflate window size, used to prime each block with the tail of the previous one
+WINDOW_SIZE = 32 * 1024
+
+# Files with fewer blocks than this are compressed in the calling thread
+PARALLEL_THRESHOLD = 4
+
+SOURCES = ("random", "zero")
+
+# Size of the random block that TextPool translates and hands out strings from
+ARENA_SIZE = 256 * 1024
+
+
+def random_block(size, seed=None, index=0):
+    """
+    Generate a block of random bytes
+
+    Args:
+        size: Block size in bytes
+        seed: If set, derive the block deterministically from the seed and the
+            block index (SHAKE-128 in counter mode), otherwise use os.urandom
+        index: Block index within the payload
+    """
+    if seed is None:
+        return os.urandom(size)
+    key = f"{seed}:{index}".encode()
+    return hashlib.shake_128(key).digest(size)
+
+
+class TextPool:
+    """
+    Arena of random text that hands out payload strings by slicing
+
+    Random bytes are generated in large blocks, mapped onto the alphabet with a
+    single bytes.translate() call and decoded once, so each string costs a
+    slice instead of a per-character Python loop. Bytes that would bias the
+    mapping (the top 256 % len(alphabet) values) are dropped.
+
+    Args:
+        alphabet: ASCII characters to draw from
+        seed: If set, the pool produces the same strings for the same seed
+        lengths: Default length, either a fixed int or an inclusive (min, max)
+            range drawn uniformly
+        arena_size: Random bytes generated per refill
+    """
+
+    def __init__(self, alphabet, seed=None, lengths=20, arena_size=ARENA_SIZE):
+        if not alphabet or len(alphabet) > 256 or not alphabet.isascii():
+            raise ValueError("Alphabet must have 1-256 ASCII characters")
+        self.alphabet = alphabet
+        self.lengths = lengths
+        self.arena_size = arena_size
+
+        limit = 256 - 256 % len(alphabet)
+        self._table = bytes(ord(alphabet[b % len(alphabet)]) for b in range(256))
+        self._reject = bytes(range(limit, 256))
+        self.reseed(seed)
+
+    def reseed(self, seed=None):
+        """Drop the current arena and restart the sequence from seed"""
+        self.seed = seed
+        self._index = 0
+        self._arena = ""
+        self._pos = 0
+        self._lengths = random.Random(seed)
+
+    def _refill(self, length):
+        parts = [self._arena[self._pos :]]
+        size = len(parts[0])
+        while size < length:
+            raw = random_block(self.arena_size, self.seed, self._index)
+            self._index += 1
+            text = raw.translate(self._table, self._reject).decode("ascii")
+            parts.append(text)
+            size += len(text)
+        self._arena = "".join(parts)
+        self._pos = 0
+
+    def take(self, length=None):
+        """
+        Return the next random string
+
+        Args:
+            length: String length, defaults to a draw from the pool's lengths
+        """
+        if length is None:
+            length = self.lengths
+            if not isinstance(length, int):
+                length = self._lengths.randint(*length)
+        end = self._pos + length
+        if end > len(self._arena):
+            self._refill(length)
+            end = length
+        start = self._pos
+        self._pos = end
+        return self._arena[start:end]
+
+
+def iter_blocks(size, source="random", seed=None, block_size=BLOCK_SIZE):
+    """
+    Yield the payload in blocks of at most block_size bytes
+
+    Args:
+        size: Total payload size in bytes
+        source: "random" or "zero"
+        seed: Seed for reproducible random data
+        block_size: Block size in bytes
+    """
+    if source not in SOURCES:
+        raise ValueError(f"Unknown payload source: {source}")
+
+    zeros = bytes(block_size) if source == "zero" else b""
+    offset = 0
+    index = 0
+    while offset < size:
+        n = min(block_size, size - offset)
+        if source == "zero":
+            yield zeros if n == block_size else zeros[:n]
+        else:
+            yield random_block(n, seed, index)
+        offset += n
+        index += 1
+
+
+def deflate_block(data, level, zdict=b"", last=False):
+    """
+    Compress one block into a raw deflate segment
+
+    Non-final blocks end with a sync flush so the segments can be concatenated
+    into one valid deflate stream, the same way pigz does it.
+    """
+    if zdict:
+        c = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=zdict)
+    else:
+        c = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    out = c.compress(data)
+    return out + c.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+def gzip_header(level):
+    """Build a gzip member header with a zero mtime for reproducible output"""
+    xfl = 2 if level == 9 else 4 if level == 1 else 0
+    return struct.pack("<BBBBIBB", 0x1F, 0x8B, 8, 0, 0, xfl, 255)
+
+
+def write_payload(
+    filepath,
+    size,
+    source="random",
+    compression_level=None,
+    seed=None,
+    threads=None,
+    block_size=BLOCK_SIZE,
+):
+    """
+    Stream a payload to disk, optionally gzip-compressed, in one pass
+
+    Memory use is bounded by a few blocks per thread regardless of size.
+
+    Args:
+        filepath: Path to create file
+        size: Payload size in bytes (before compression)
+        source: "random" or "zero"
+        compression_level: If set, gzip-compress with this level (1-9)
+        seed: Seed for reproducible random data
+        threads: Compression threads, defaults to the number of CPUs
+        block_size: Block size in bytes
+
+    Returns:
+        Number of bytes written to disk
+    """
+    filepath = Path(filepath)
+    blocks = iter_blocks(size, source, seed, block_size)
+
+    with open(filepath, "wb", buffering=block_size) as f:
+        if compression_level is None:
+            f.writelines(blocks)
+            return f.tell()
+
+        f.write(gzip_header(compression_level))
+        crc = 0
+        threads = threads or os.cpu_count() or 1
+        total_blocks = -(-size // block_size)
+
+        if threads == 1 or total_blocks < PARALLEL_THRESHOLD:
+            c = zlib.compressobj(compression_level, zlib.DEFLATED, -zlib.MAX_WBITS)
+            for block in blocks:
+                crc = zlib.crc32(block, crc)
+                f.write(c.compress(block))
+            f.write(c.flush())
+        else:
+            # zlib releases the GIL while compressing, so blocks are deflated
+            # in threads and written in order as they complete.
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                pending = deque()
+                zdict = b""
+                for index, block in enumerate(blocks):
+                    crc = zlib.crc32(block, crc)
+                    last = index == total_blocks - 1
+                    pending.append(
+                        pool.submit(
+                            deflate_block, block, compression_level, zdict, last
+                        )
+                    )
+                    zdict = block[-WINDOW_SIZE:]
+                    if len(pending) >= threads * 2:
+                        f.write(pending.popleft().result())
+                while pending:
+                    f.write(pending.popleft().result())
+
+        f.write(struct.pack("<II", crc, size & 0xFFFFFFFF))
+        return f.tell()
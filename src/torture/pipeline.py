@@ -0,0 +1,145 @@
+import gzip
+import json
+from pathlib import Path
+
+from src.torture import logsink, metrics, planstream, tee
+
+
+def run_init():
+    """Run tofu init as a measured phase"""
+    return metrics.run_phase("init", ["tofu", "init"])
+
+
+def run_logged(name, args, log_path, ship_logs=None):
+    """
+    Run a command as a measured phase writing its output to a log file
+
+    Args:
+        name: Phase name
+        args: Command to run
+        log_path: File the output is written to
+        ship_logs: Optional tcp:// or http:// URL the output is streamed to
+            while it is written, see logsink.LogShipper
+    """
+    with open(log_path, "wb") as log:
+        if ship_logs is None:
+            return metrics.run_phase(name, args, stdout=log)
+        shipper = logsink.LogShipper(ship_logs)
+        consumer = tee.Tee({"write": log.write, "ship": shipper}, fill=False)
+        try:
+            phase = metrics.run_phase(name, args, consumer=consumer)
+        finally:
+            status = shipper.close()
+        phase["pipe"]["ship_status"] = status
+        return phase
+
+
+def run_plan(
+    artifacts,
+    var_file=None,
+    variables=None,
+    init=True,
+    analyze=True,
+    compress=None,
+    ship_logs=None,
+):
+    """
+    Run tofu init, plan and show -json as measured phases
+
+    Args:
+        artifacts: Directory for plan.bin, plan.log and plan.json
+        var_file: Optional tfvars file passed to plan
+        variables: Optional dict of -var overrides passed to plan
+        init: Run tofu init first
+        analyze: Analyze the show output while it is written, see run_show()
+        compress: Gzip level for plan.json.gz instead of plan.json
+        ship_logs: Optional tcp:// or http:// URL the plan output is streamed
+            to while it is written to plan.log
+
+    Returns:
+        Tuple of phase metrics and artifact sizes
+    """
+    artifacts = Path(artifacts)
+    phases = []
+    if init:
+        phases.append(run_init())
+
+    plan_args = ["tofu", "plan", f"-out={artifacts / 'plan.bin'}"]
+    if var_file is not None:
+        plan_args.append(f"-var-file={Path(var_file).as_posix()}")
+    for name, value in (variables or {}).items():
+        plan_args += ["-var", f"{name}={value}"]
+
+    phases.append(run_logged("plan", plan_args, artifacts / "plan.log", ship_logs))
+    phases.append(run_show(artifacts, analyze, compress))
+
+    return phases, metrics.artifact_sizes(artifacts)
+
+
+def run_apply(artifacts, var_file=None, destroy=False, init=True, ship_logs=None):
+    """
+    Run tofu apply or destroy with -auto-approve as measured phases
+
+    The output, including the provisioner logs, is written to apply.log or
+    destroy.log and optionally shipped, like the plan output in run_plan().
+
+    Args:
+        artifacts: Directory for the log
+        var_file: Optional tfvars file passed to the command
+        destroy: Run tofu destroy instead of apply
+        init: Run tofu init first
+        ship_logs: Optional tcp:// or http:// URL the output is streamed to
+
+    Returns:
+        List of phase metrics
+    """
+    artifacts = Path(artifacts)
+    name = "destroy" if destroy else "apply"
+    phases = []
+    if init:
+        phases.append(run_init())
+
+    args = ["tofu", name, "-auto-approve", "-input=false"]
+    if var_file is not None:
+        args.append(f"-var-file={Path(var_file).as_posix()}")
+    phases.append(run_logged(name, args, artifacts / f"{name}.log", ship_logs))
+    return phases
+
+
+def open_plan_json(artifacts, compress=None):
+    """Open plan.json unbuffered, or plan.json.gz with a compression level"""
+    if compress is None:
+        return open(artifacts / "plan.json", "wb", buffering=0)
+    return gzip.GzipFile(
+        artifacts / "plan.json.gz", "wb", compresslevel=compress, mtime=0
+    )
+
+
+def run_show(artifacts, analyze=True, compress=None):
+    """
+    Run tofu show -json as a measured phase, teeing its output
+
+    The output is read from a pipe once and written to plan.json (or
+    plan.json.gz with a compression level) while a streaming PlanAnalyzer
+    consumes the same buffers. The analysis is written to plan-report.json
+    and the pipe throughput is reported as "pipe" in the phase metrics.
+    """
+    artifacts = Path(artifacts)
+    args = ["tofu", "show", "-json", artifacts / "plan.bin"]
+    analyzer = planstream.PlanAnalyzer() if analyze else None
+    with open_plan_json(artifacts, compress) as out:
+        sinks = {"gzip" if compress is not None else "write": out.write}
+        if analyzer is not None:
+            sinks["analyze"] = analyzer.feed
+        phase = metrics.run_phase("show", args, consumer=tee.Tee(sinks))
+
+    if analyzer is not None and "analyze" not in phase["pipe"]["errors"]:
+        try:
+            report = analyzer.close()
+        except ValueError as e:
+            phase["pipe"]["errors"]["analyze"] = str(e)
+        else:
+            (artifacts / "plan-report.json").write_text(
+                json.dumps(report, indent=2) + "\n"
+            )
+    return phase
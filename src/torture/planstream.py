@@ -0,0 +1,359 @@
+import gzip
+import heapq
+import itertools
+import json
+import re
+from pathlib import Path
+
+READ_SIZE = 1024 * 1024
+
+# Strings longer than this (in encoded bytes) are not decoded, only measured
+DECODE_LIMIT = 4096
+
+# Arrays whose object elements are resource records
+RESOURCE_ARRAYS = {"resources", "resource_changes", "resource_drift"}
+
+# Sections broken down per resource address in the report
+RESOURCE_SECTIONS = ["resource_changes", "planned_values", "prior_state"]
+
+# Commas and colons carry no information once the stream tracks whether it
+# expects an object key, so they are skipped together with whitespace
+SEPARATORS = b" \t\r\n,:"
+
+TOKEN_RE = re.compile(
+    rb"[ \t\r\n,:]*(?:"
+    rb"([{\[])|"  # 1: container start
+    rb"([}\]])|"  # 2: container end
+    rb'("[^"\\]*(?:\\.[^"\\]*)*")|'  # 3: string
+    rb"(-?[0-9][0-9.eE+-]*)|"  # 4: number
+    rb"(true|false|null)"  # 5: literal
+    rb")"
+)
+START, END, STRING, NUMBER, LITERAL = range(1, 6)
+
+# Body of a string up to its closing quote, or up to the end of the data or a
+# trailing backslash whose escaped byte has not arrived yet
+STRING_BODY_RE = re.compile(rb'[^"\\]*(?:\\.[^"\\]*)*')
+
+LITERALS = {b"true": True, b"false": False, b"null": None}
+
+INDEX_RE = re.compile(r"\[[^\]]*\]$")
+
+
+def decode_string(raw):
+    if b"\\" not in raw:
+        return raw[1:-1].decode()
+    return json.loads(raw)
+
+
+def parse_number(raw):
+    try:
+        return int(raw)
+    except ValueError:
+        return float(raw)
+
+
+class JsonStream:
+    """
+    Incremental push tokenizer for JSON documents of any size
+
+    Data is fed in chunks of any size with feed() and close(). The stream
+    tracks the path of the current value (object keys and array indices) in
+    self.path and reports values to the handler with their byte offsets:
+
+        handler.start(kind, start)           # kind is "{" or "["
+        handler.end(kind, start, end)
+        handler.scalar(value, start, end)
+
+    Strings longer than DECODE_LIMIT bytes are reported as None. A string
+    that spans chunks is scanned once: only its first DECODE_LIMIT bytes are
+    kept and every chunk resumes the scan where the previous one stopped, so
+    memory only grows with the nesting depth and the largest number.
+    """
+
+    def __init__(self, handler, decode_limit=DECODE_LIMIT):
+        self.handler = handler
+        self.decode_limit = decode_limit
+        self.path = []
+        self.bytes = 0
+        self._buf = b""
+        self._pos = 0
+        self._offset = 0
+        self._stack = []
+        self._expect_key = False
+        # Start offset and raw bytes (None past decode_limit) of a string
+        # that continues in the next chunk
+        self._string = None
+
+    def feed(self, data):
+        """Tokenize the next chunk of the document"""
+        self.bytes += len(data)
+        if self._pos:
+            self._offset += self._pos
+            self._buf = self._buf[self._pos :]
+            self._pos = 0
+        self._buf = self._buf + bytes(data) if self._buf else bytes(data)
+        self._parse(final=False)
+
+    def close(self):
+        """Finish the document and check that it is complete"""
+        self._parse(final=True)
+        if self._string is not None:
+            raise ValueError(f"Truncated JSON at byte {self._string[0]}")
+        if self._stack or self._buf[self._pos :].strip(SEPARATORS):
+            raise ValueError(f"Truncated JSON at byte {self._offset + self._pos}")
+
+    def _parse(self, final):
+        buf = self._buf
+        n = len(buf)
+        pos = self._pos
+        offset = self._offset
+        path = self.path
+        stack = self._stack
+        handler = self.handler
+        match = TOKEN_RE.match
+        expect_key = self._expect_key
+        top = stack[-1][0] if stack else None
+
+        if self._string is not None:
+            pos, string = self._scan_string(buf, pos)
+            if string is None:
+                self._pos = pos
+                return
+            start, raw = string
+            if expect_key:
+                path[-1] = decode_string(raw) if raw is not None else None
+                expect_key = False
+            else:
+                if top == "[":
+                    path[-1] += 1
+                value = decode_string(raw) if raw is not None else None
+                handler.scalar(value, start, offset + pos)
+                expect_key = top == "{"
+
+        while True:
+            m = match(buf, pos)
+            if m is None:
+                if final and buf[pos:].strip(SEPARATORS):
+                    raise ValueError(f"Invalid JSON at byte {offset + pos}")
+                rest = buf[pos:].lstrip(SEPARATORS)
+                if rest[:1] == b'"':
+                    # An unterminated string, scan it from here on
+                    quote = n - len(rest)
+                    self._string = (offset + quote, b'"')
+                    pos = self._scan_string(buf, quote + 1)[0]
+                break
+            group = m.lastindex
+            if group == NUMBER and m.end() == n and not final:
+                break  # the number may continue in the next chunk
+            pos = m.end()
+
+            if group == END:
+                kind, start = stack.pop()
+                path.pop()
+                top = stack[-1][0] if stack else None
+                handler.end(kind, start, offset + pos)
+                expect_key = top == "{"
+                continue
+
+            if group == STRING and expect_key:
+                path[-1] = decode_string(m.group(STRING))
+                expect_key = False
+                continue
+
+            if top == "[":
+                path[-1] += 1
+            start = offset + m.start(group)
+            if group == START:
+                top = "{" if buf[pos - 1] == 0x7B else "["
+                handler.start(top, start)
+                stack.append((top, start))
+                path.append(None if top == "{" else -1)
+                expect_key = top == "{"
+                continue
+
+            if group == STRING:
+                raw = m.group(STRING)
+                value = decode_string(raw) if len(raw) <= self.decode_limit else None
+            elif group == NUMBER:
+                value = parse_number(m.group(NUMBER))
+            else:
+                value = LITERALS[m.group(LITERAL)]
+            handler.scalar(value, start, offset + pos)
+            expect_key = top == "{"
+
+        self._pos = pos
+        self._expect_key = expect_key
+
+    def _scan_string(self, buf, pos):
+        """
+        Continue the pending string at pos of buf
+
+        Returns:
+            Tuple of the position after the string and its start offset and
+            raw bytes, or of the position to resume from and None while the
+            string continues in the next chunk
+        """
+        start, raw = self._string
+        end = STRING_BODY_RE.match(buf, pos).end()
+        complete = end < len(buf) and buf[end] == 0x22
+        if raw is not None:
+            raw += buf[pos : end + complete]
+            if len(raw) > self.decode_limit:
+                raw = None
+        if not complete:
+            self._string = (start, raw)
+            return end, None
+        self._string = None
+        return end + 1, (start, raw)
+
+
+def base_address(address):
+    """Resource address without the instance key"""
+    return INDEX_RE.sub("", address)
+
+
+def size_bucket(size):
+    """Power of two upper bound of a size"""
+    return 1 << max(size - 1, 0).bit_length()
+
+
+class PlanAnalyzer:
+    """
+    Streaming statistics of a `tofu show -json` plan document
+
+    Collects bytes per top-level section, resource counts and bytes per type
+    and per resource address (instance keys stripped) in every section, a
+    size histogram of resource_changes entries and the largest attribute
+    values, all in memory proportional to the number of distinct addresses.
+
+    Args:
+        top: Number of largest attributes to keep
+    """
+
+    def __init__(self, top=20):
+        self.top = top
+        self.stream = JsonStream(self)
+        self.sections = {}
+        self.types = {}
+        self.addresses = {}
+        self.histogram = {}
+        self.largest = []
+        self._records = []
+        self._counter = itertools.count()
+
+    def feed(self, data):
+        self.stream.feed(data)
+
+    def close(self):
+        self.stream.close()
+        return self.report()
+
+    def start(self, kind, start):
+        path = self.stream.path
+        if (
+            kind == "{"
+            and len(path) >= 2
+            and path[-2] in RESOURCE_ARRAYS
+            and isinstance(path[-1], int)
+        ):
+            self._records.append(
+                {"section": path[0], "depth": len(path), "address": None, "type": None}
+            )
+
+    def end(self, kind, start, end):
+        self._value(start, end)
+        path = self.stream.path
+        records = self._records
+        if records and len(path) == records[-1]["depth"] and kind == "{":
+            self._finish(records.pop(), end - start)
+
+    def scalar(self, value, start, end):
+        records = self._records
+        if records:
+            record = records[-1]
+            path = self.stream.path
+            if len(path) == record["depth"] + 1 and path[-1] in ("address", "type"):
+                record[path[-1]] = value
+        self._value(start, end)
+
+    def _value(self, start, end):
+        path = self.stream.path
+        size = end - start
+        if len(path) == 1:
+            self.sections[path[0]] = self.sections.get(path[0], 0) + size
+            return
+        records = self._records
+        if not records:
+            return
+        record = records[-1]
+        rel = path[record["depth"] :]
+        if (len(rel) == 2 and rel[0] == "values") or (
+            len(rel) == 3 and rel[0] == "change" and rel[1] in ("before", "after")
+        ):
+            item = (size, next(self._counter), record, "/".join(map(str, rel)))
+            if len(self.largest) < self.top:
+                heapq.heappush(self.largest, item)
+            elif size > self.largest[0][0]:
+                heapq.heapreplace(self.largest, item)
+
+    def _finish(self, record, size):
+        section = record["section"]
+        address = base_address(record["address"] or "<unknown>")
+        rtype = record["type"] or "<unknown>"
+        for table, key in [(self.types, rtype), (self.addresses, address)]:
+            stats = table.setdefault(key, {}).setdefault(section, [0, 0])
+            stats[0] += 1
+            stats[1] += size
+        if section == "resource_changes":
+            bucket = size_bucket(size)
+            self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+
+    def report(self):
+        """Summary of the analyzed document as a JSON-serializable dict"""
+
+        def table(rows):
+            return {
+                key: {
+                    section: {"count": count, "bytes": size}
+                    for section, (count, size) in sections.items()
+                }
+                for key, sections in sorted(rows.items())
+            }
+
+        return {
+            "bytes": self.stream.bytes,
+            "sections": dict(sorted(self.sections.items(), key=lambda kv: -kv[1])),
+            "types": table(self.types),
+            "addresses": table(self.addresses),
+            "change_size_histogram": [
+                {"max_bytes": bucket, "count": count}
+                for bucket, count in sorted(self.histogram.items())
+            ],
+            "largest_attributes": [
+                {
+                    "bytes": size,
+                    "section": record["section"],
+                    "address": record["address"],
+                    "attribute": attribute,
+                }
+                for size, _, record, attribute in sorted(self.largest, reverse=True)
+            ],
+        }
+
+
+def open_plan(path):
+    """Open a plan JSON file, transparently decompressing .gz files"""
+    path = Path(path)
+    if path.suffix == ".gz":
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def analyze_file(path, top=20, read_size=READ_SIZE):
+    """Stream a plan JSON file through PlanAnalyzer"""
+    analyzer = PlanAnalyzer(top)
+    with open_plan(path) as f:
+        while chunk := f.read(read_size):
+            analyzer.feed(chunk)
+    return analyzer.close()
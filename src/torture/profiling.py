@@ -0,0 +1,111 @@
+import cProfile
+import pstats
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+# Lines of the text report written next to every merged profile
+PROFILE_LINES = 40
+
+# Retained allocation sites kept per task and per module
+TRACE_TOP = 10
+
+
+def run_instrumented(fn, *args, profile_path=None, trace_memory=False, **kwargs):
+    """
+    Call fn(*args, **kwargs) and measure it
+
+    Args:
+        fn: Callable to run
+        profile_path: If set, profile the call with cProfile and dump the
+            stats to this file
+        trace_memory: Trace allocations of the call with tracemalloc
+
+    Returns:
+        Tuple of the result of fn and a dict with its seconds and, with
+        trace_memory, its peak traced bytes and the top sites of allocations
+        still alive when it returned. These are not the allocations at the
+        peak: a snapshot taken while fn runs would be traced itself and
+        inflate the peak it is meant to explain.
+    """
+    profiler = cProfile.Profile() if profile_path else None
+    if trace_memory:
+        tracemalloc.start()
+    if profiler:
+        profiler.enable()
+    start = time.perf_counter()
+    try:
+        result = fn(*args, **kwargs)
+    finally:
+        seconds = time.perf_counter() - start
+        if profiler:
+            profiler.disable()
+            Path(profile_path).parent.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(profile_path)
+        stats = {"seconds": seconds}
+        if trace_memory:
+            stats["peak"] = tracemalloc.get_traced_memory()[1]
+            stats["retained"] = top_sites(tracemalloc.take_snapshot())
+            tracemalloc.stop()
+    return result, stats
+
+
+def top_sites(snapshot, limit=TRACE_TOP):
+    """
+    Largest allocation sites of a tracemalloc snapshot
+
+    Returns:
+        List of {"site", "size", "count"} dicts, largest first
+    """
+    # Leave out the bookkeeping of the tracer and of a profiler running with it
+    snapshot = snapshot.filter_traces(
+        [
+            tracemalloc.Filter(False, module.__file__)
+            for module in (tracemalloc, cProfile, sys.modules[__name__])
+        ]
+    )
+    return [
+        {"site": str(stat.traceback[0]), "size": stat.size, "count": stat.count}
+        for stat in snapshot.statistics("lineno")[:limit]
+    ]
+
+
+def merge_sites(site_lists, limit=TRACE_TOP):
+    """
+    Largest allocation sites over several tasks
+
+    Each site keeps its largest size in any one task rather than a sum, so
+    a module-level buffer replaced by every task is counted once.
+    """
+    merged = {}
+    for sites in site_lists:
+        for s in sites:
+            if s["site"] not in merged or s["size"] > merged[s["site"]]["size"]:
+                merged[s["site"]] = dict(s)
+    return sorted(merged.values(), key=lambda s: s["size"], reverse=True)[:limit]
+
+
+def merge_profiles(paths, output, lines=PROFILE_LINES):
+    """
+    Merge cProfile dumps into one pstats file and a text report next to it
+
+    Args:
+        paths: Profile dumps, removed once merged
+        output: Path of the merged .prof file; the report gets a .txt suffix
+
+    Returns:
+        Path of the merged profile, or None without dumps
+    """
+    paths = [Path(p) for p in paths if Path(p).exists()]
+    if not paths:
+        return None
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    pstats.Stats(*(str(p) for p in paths)).dump_stats(output)
+    # Report from the merged file so its header names it instead of every dump
+    with open(output.with_suffix(".txt"), "w") as f:
+        pstats.Stats(str(output), stream=f).sort_stats("cumulative").print_stats(lines)
+    for p in paths:
+        p.unlink()
+    return output
@@ -0,0 +1,227 @@
+import base64
+import hashlib
+import json
+import platform
+import shutil
+import time
+import zipfile
+from pathlib import Path
+
+from src.torture import modulegen, payload
+
+PROVIDERS_DIR = Path("provider-mirror")
+
+HOSTNAME = "registry.torture.local"
+NAMESPACE = "torture"
+
+# Prepended to every fake binary, so running one fails with a clear message
+# instead of executing the padding
+SCRIPT = (
+    b"#!/bin/sh\necho 'torture: fake provider, it can only be installed' >&2\nexit 1\n"
+)
+
+MACHINES = {"x86_64": "amd64", "amd64": "amd64", "aarch64": "arm64", "arm64": "arm64"}
+
+
+def current_platform():
+    """Platform of this machine in the OS_ARCH form of provider packages"""
+    machine = platform.machine().lower()
+    return f"{platform.system().lower()}_{MACHINES.get(machine, machine)}"
+
+
+def provider_type(index):
+    return f"fake{index:03d}"
+
+
+def package_name(ptype, version, target):
+    return f"terraform-provider-{ptype}_{version}_{target}.zip"
+
+
+def hash_h1(files):
+    """
+    Hash of an unpacked package in the h1: scheme of dependency lock files
+
+    Args:
+        files: List of (path inside the package, sha256 hex digest) tuples
+    """
+    summary = "".join(f"{digest}  {name}\n" for name, digest in sorted(files))
+    return "h1:" + base64.b64encode(hashlib.sha256(summary.encode()).digest()).decode()
+
+
+def sha256_file(path: Path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(payload.MB):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def build_package(path: Path, ptype, version, size, source, level, seed):
+    """
+    Write a provider zip package holding one fake binary of about size bytes
+
+    Returns:
+        Dict with the package name, binary and package bytes, zh: and h1: hashes
+    """
+    binary = f"terraform-provider-{ptype}_v{version}"
+    info = zipfile.ZipInfo(binary, date_time=(2024, 1, 1, 0, 0, 0))
+    info.external_attr = 0o100755 << 16
+    info.compress_type = zipfile.ZIP_DEFLATED
+    binary_hash = hashlib.sha256(SCRIPT)
+    written = len(SCRIPT)
+    tmp = path.with_suffix(".tmp")
+    with (
+        zipfile.ZipFile(tmp, "w", compresslevel=level) as zf,
+        zf.open(info, "w", force_zip64=size > 2**31) as out,
+    ):
+        out.write(SCRIPT)
+        for block in payload.iter_blocks(max(size - len(SCRIPT), 0), source, seed):
+            out.write(block)
+            binary_hash.update(block)
+            written += len(block)
+    tmp.rename(path)
+    return {
+        "package": path.name,
+        "binary_bytes": written,
+        "package_bytes": path.stat().st_size,
+        "zh": sha256_file(path),
+        "h1": hash_h1([(binary, binary_hash.hexdigest())]),
+    }
+
+
+def write_version(directory: Path, ptype, version, packages):
+    """Write the SHA256SUMS file and the network mirror VERSION.json of a release"""
+    sums = "".join(f"{p['zh']}  {p['package']}\n" for p in packages.values())
+    (directory / f"terraform-provider-{ptype}_{version}_SHA256SUMS").write_text(sums)
+    archives = {
+        target: {"url": p["package"], "hashes": [p["h1"], f"zh:{p['zh']}"]}
+        for target, p in packages.items()
+    }
+    (directory / f"{version}.json").write_text(
+        json.dumps({"archives": archives}, indent=2) + "\n"
+    )
+
+
+def write_config(path: Path, types, hostname=HOSTNAME, namespace=NAMESPACE):
+    """Write a many-providers style configuration requiring the fake providers"""
+    blocks = "".join(
+        f'    {ptype} = {{\n      source  = "{hostname}/{namespace}/{ptype}"\n'
+        f'      version = "~> 1.0"\n    }}\n'
+        for ptype in types
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(f"terraform {{\n  required_providers {{\n{blocks}  }}\n}}\n")
+
+
+def write_cli_config(path: Path, mirror: Path, hostname=HOSTNAME):
+    """Write a CLI configuration installing the fake providers from the mirror only"""
+    path.write_text(
+        "provider_installation {\n"
+        "  filesystem_mirror {\n"
+        f'    path    = "{mirror.resolve().as_posix()}"\n'
+        f'    include = ["{hostname}/*/*"]\n'
+        "  }\n"
+        "  # The same tree served over HTTPS is a network mirror:\n"
+        f'  # network_mirror {{ url = "https://<host>/" include = ["{hostname}/*/*"] }}\n'
+        "  direct {\n"
+        f'    exclude = ["{hostname}/*/*"]\n'
+        "  }\n"
+        "}\n"
+    )
+
+
+def generate_mirror(
+    output=PROVIDERS_DIR,
+    count=50,
+    size=10 * payload.MB,
+    versions=1,
+    platforms=None,
+    source="random",
+    level=6,
+    seed=0,
+    pool=None,
+    hostname=HOSTNAME,
+    namespace=NAMESPACE,
+):
+    """
+    Build a provider mirror with count fake providers
+
+    output/mirror follows the packed filesystem_mirror layout,
+    HOSTNAME/NAMESPACE/TYPE/terraform-provider-TYPE_VERSION_TARGET.zip, and
+    holds the index.json and VERSION.json files of the network mirror
+    protocol next to the packages, so it works both as a filesystem mirror
+    and as the document root of a network mirror. Every release also gets
+    a SHA256SUMS file. output/config/main.tf requires all providers and
+    output/terraform.rc installs them from the mirror.
+
+    Args:
+        output: Output directory, replaced if it exists
+        count: Number of providers
+        size: Binary size of every package in bytes
+        versions: Releases per provider, 1.0.0 to 1.N.0
+        platforms: OS_ARCH targets, defaults to the current platform
+        source: Binary contents, "random" or "zero"
+        level: Deflate level of the packages
+        seed: Base seed of the binary contents
+        pool: Optional executor building packages in parallel
+
+    Returns:
+        Dict with counts, bytes, seconds and the generated paths
+    """
+    output = Path(output)
+    platforms = list(platforms or [current_platform()])
+    if output.exists():
+        shutil.rmtree(output)
+
+    start = time.monotonic()
+    jobs = []
+    for i in range(count):
+        ptype = provider_type(i)
+        directory = output / "mirror" / hostname / namespace / ptype
+        directory.mkdir(parents=True)
+        for v in range(versions):
+            version = f"1.{v}.0"
+            for target in platforms:
+                args = (
+                    directory / package_name(ptype, version, target),
+                    ptype,
+                    version,
+                    size,
+                    source,
+                    level,
+                    modulegen.derive_seed(seed, ptype, version, target),
+                )
+                future = pool.submit(build_package, *args) if pool else None
+                jobs.append((directory, ptype, version, target, future, args))
+
+    releases = {}
+    for directory, ptype, version, target, future, args in jobs:
+        package = future.result() if future else build_package(*args)
+        releases.setdefault((directory, ptype, version), {})[target] = package
+
+    types = {}
+    for (directory, ptype, version), packages in releases.items():
+        write_version(directory, ptype, version, packages)
+        types.setdefault(directory, []).append(version)
+    for directory, versions_list in types.items():
+        index = {"versions": {version: {} for version in versions_list}}
+        (directory / "index.json").write_text(json.dumps(index, indent=2) + "\n")
+
+    config = output / "config" / "main.tf"
+    write_config(config, [provider_type(i) for i in range(count)], hostname, namespace)
+    cli_config = output / "terraform.rc"
+    write_cli_config(cli_config, output / "mirror", hostname)
+
+    packages = [p for release in releases.values() for p in release.values()]
+    return {
+        "mirror": (output / "mirror").as_posix(),
+        "config": config.as_posix(),
+        "cli_config": cli_config.as_posix(),
+        "providers": count,
+        "versions": versions,
+        "platforms": platforms,
+        "packages": len(packages),
+        "binary_bytes": sum(p["binary_bytes"] for p in packages),
+        "package_bytes": sum(p["package_bytes"] for p in packages),
+        "seconds": round(time.monotonic() - start, 3),
+    }
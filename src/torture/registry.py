@@ -0,0 +1,516 @@
+import asyncio
+import itertools
+import json
+import os
+import re
+import shutil
+import tarfile
+import time
+from pathlib import Path
+
+from src.torture import bench, git, history, logsink, modulegen
+from src.torture.httpserver import iter_body, read_body, read_request, response_head
+
+CACHE_DIR = modulegen.MODULES_DIR / ".serve"
+
+NAMESPACE = "torture"
+PROVIDER = "null"
+VERSION = "1.0.0"
+
+# Archives are mostly .bin.gz payloads and .tf text, the level barely matters
+ARCHIVE_LEVEL = 1
+
+CHUNK_SIZE = 64 * 1024
+
+SOURCES = ("archive", "git", "file")
+
+VERSIONS_RE = re.compile(r"^/v1/modules/([^/]+)/([^/]+)/([^/]+)/versions$")
+DOWNLOAD_RE = re.compile(r"^/v1/modules/([^/]+)/([^/]+)/([^/]+)/([^/]+)/download$")
+ARCHIVE_RE = re.compile(r"^/archive/([^/]+)/([^/]+)\.tar\.gz$")
+
+
+def module_dirs(modules_dir=modulegen.MODULES_DIR):
+    return sorted(p for p in Path(modules_dir).glob("module-*") if p.is_dir())
+
+
+def newest_mtime(path: Path):
+    return max(
+        (p.stat().st_mtime for p in path.rglob("*") if ".git" not in p.parts),
+        default=0.0,
+    )
+
+
+def build_archive(module: Path, archive: Path):
+    """Write the module tree without its .git directory as a tar.gz archive"""
+    archive.parent.mkdir(parents=True, exist_ok=True)
+    tmp = archive.with_suffix(".tmp")
+    with tarfile.open(tmp, "w:gz", compresslevel=ARCHIVE_LEVEL) as tar:
+        tar.add(
+            module,
+            arcname=".",
+            filter=lambda info: None if ".git" in Path(info.name).parts else info,
+        )
+    tmp.rename(archive)
+
+
+def build_ref_archive(repo: Path, ref, archive: Path):
+    """Write the tree of a git ref of a bare repository as a tar.gz archive"""
+    archive.parent.mkdir(parents=True, exist_ok=True)
+    tmp = archive.with_suffix(".tmp")
+    git.git(
+        ["-c", f"tar.tar.gz.command=gzip -cn -{ARCHIVE_LEVEL}", "archive"]
+        + ["--format=tar.gz", "-o", tmp.as_posix(), ref],
+        repo,
+    )
+    tmp.rename(archive)
+
+
+def tag_versions(repo: Path):
+    """Map of registry version to git ref, from the v1.N.0 tags of a repository"""
+    result = git.git(["tag", "--list", "v*"], repo)
+    return {tag[1:]: tag for tag in result.stdout.split()}
+
+
+def ref_commits(repo: Path, refs):
+    """Commit ids of git refs of a repository, in order"""
+    result = git.git(["rev-parse", *(f"{ref}^{{commit}}" for ref in refs)], repo)
+    return result.stdout.split()
+
+
+def version_archives(module: Path, repo: Path | None, versions, archive_dir: Path):
+    """
+    Build one archive per served version of a module
+
+    Without a deep history the only version is the working tree. With one,
+    every version is archived from its ref of the history repository, so
+    version-pinned downloads get the content of that version. Ref archives
+    are named by commit and reused until the history is regenerated.
+
+    Returns:
+        Dict of version to archive path
+    """
+    if repo is None:
+        archive = archive_dir / f"{VERSION}.tar.gz"
+        if not archive.exists() or archive.stat().st_mtime < newest_mtime(module):
+            build_archive(module, archive)
+        archives = {VERSION: archive}
+    else:
+        commits = ref_commits(repo, versions.values())
+        archives = {}
+        for (version, ref), commit in zip(versions.items(), commits):
+            archive = archives[version] = archive_dir / f"{commit}.tar.gz"
+            if not archive.exists():
+                build_ref_archive(repo, commit, archive)
+    current = set(archives.values())
+    for stale in archive_dir.glob("*.tar.gz"):
+        if stale not in current:
+            stale.unlink()
+    return archives
+
+
+def commit_tree(module: Path, repo: Path):
+    """
+    Commit the module tree to a bare repository on its main branch
+
+    The repository is the git dir and the module its work tree, so the module
+    directory itself is never turned into or changed as a repository.
+    """
+    if not repo.is_dir():
+        repo.parent.mkdir(parents=True, exist_ok=True)
+        git.git(["init", "--bare", repo.as_posix()], repo.parent)
+        git.git(["symbolic-ref", "HEAD", "refs/heads/main"], repo)
+    tree = ["--git-dir", repo.as_posix(), "--work-tree", module.resolve().as_posix()]
+    git.git([*tree, "add", "--all"], module)
+    result = git.git([*tree, "commit", "-m", "Update module"], module, check=False)
+    if result.returncode != 0 and "nothing to commit" not in result.stdout:
+        raise RuntimeError(f"git commit failed: {result.stderr.strip()}")
+
+
+def prepare_modules(
+    modules_dir=modulegen.MODULES_DIR, cache_dir=CACHE_DIR, history_dir=None
+):
+    """
+    Build the archives and bare repositories served for the generated modules
+
+    A deep history from `gen-history` is served in place of the
+    single-commit repository when one exists, with its tags as extra
+    versions, and every version gets an archive of its own ref. Otherwise the
+    working tree is committed to a bare repository in the cache and archived,
+    rebuilt when a module file is newer than the archive.
+
+    Args:
+        modules_dir: Directory of the generated modules
+        cache_dir: Directory of the served archives and bare repositories
+        history_dir: Directory of the gen-history repositories, defaults to
+            .history in modules_dir
+
+    Returns:
+        Dict of module name to dict with archives, repo and versions
+    """
+    if history_dir is None:
+        history_dir = Path(modules_dir) / history.HISTORY_DIR.name
+    cache_dir = Path(cache_dir).resolve()
+    git_dir = cache_dir / "git"
+    modules = {}
+    for module in module_dirs(modules_dir):
+        repo = git_dir / f"{git.repo_name(module)}.git"
+        deep = (Path(history_dir) / repo.name).resolve()
+        versions = {VERSION: "main"}
+        if deep.is_dir():
+            if repo.is_symlink() and repo.resolve() != deep:
+                repo.unlink()
+            elif repo.is_dir() and not repo.is_symlink():
+                shutil.rmtree(repo)
+            if not repo.exists():
+                git_dir.mkdir(parents=True, exist_ok=True)
+                repo.symlink_to(deep, target_is_directory=True)
+            versions.update(tag_versions(deep))
+        else:
+            if repo.is_symlink():
+                repo.unlink()
+            commit_tree(module, repo)
+
+        archives = version_archives(
+            module,
+            deep if deep.is_dir() else None,
+            versions,
+            cache_dir / "archives" / module.name,
+        )
+        modules[module.name] = {
+            "archives": archives,
+            "archive_bytes": archives[VERSION].stat().st_size,
+            "repo": repo,
+            "versions": versions,
+        }
+    return modules
+
+
+def module_source(base_url, name, module, source, ref="main", version=VERSION):
+    """Source address of a version of a module served by ModuleServer at base_url"""
+    if source == "archive":
+        return f"{base_url}/archive/{name}/{version}.tar.gz"
+    if source == "git":
+        return f"git::{base_url}/git/{module['repo'].name}?ref={ref}"
+    return f"git::file://{module['repo'].as_posix()}?ref={ref}"
+
+
+def write_config(path: Path, base_url, modules, source):
+    """
+    Write a many-modules style configuration using the local sources
+
+    With source "registry", modules are addressed through the registry
+    protocol as host/torture/<name>/null.
+    """
+    host = base_url.split("://", 1)[1]
+    blocks = []
+    for name, module in modules.items():
+        label = re.sub(r"^module-\d+-", "", name).replace("-", "_")
+        if source == "registry":
+            body = (
+                f'  source  = "{host}/{NAMESPACE}/{name}/{PROVIDER}"\n'
+                f'  version = "{VERSION}"\n'
+            )
+        else:
+            body = f'  source = "{module_source(base_url, name, module, source)}"\n'
+        blocks.append(f'module "{label}" {{\n{body}}}\n')
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("\n".join(blocks))
+
+
+class ModuleServer:
+    """
+    Offline stand-in for the module registry and the git hosting of modules
+
+    Serves the registry protocol (service discovery, versions and download
+    redirects), tar.gz archives of the module trees and smart git over HTTP
+    through `git http-backend`. Response bodies share one token bucket, as
+    the bandwidth of a single link, and every request waits latency seconds
+    before being handled. Every request is recorded with its status, bytes,
+    time to first byte and total time, and appended to an optional JSON lines
+    log.
+
+    Args:
+        modules: Dict from prepare_modules
+        git_root: Directory holding the bare repositories
+        source: What download redirects point at: archive, git or file
+        rate: Bandwidth in bytes per second, None for unlimited
+        latency: Seconds of delay before each response
+        log: Optional text file object for JSON lines request records
+    """
+
+    def __init__(
+        self, modules, git_root, source="archive", rate=None, latency=0.0, log=None
+    ):
+        self.modules = modules
+        self.git_root = Path(git_root).resolve()
+        self.source = source
+        self.limiter = logsink.RateLimiter(rate)
+        self.latency = latency
+        self.log = log
+        self.scheme = "http"
+        self.started = time.monotonic()
+        self.requests = []
+        self._ids = itertools.count(1)
+
+    async def handle(self, reader, writer):
+        conn_id = next(self._ids)
+        try:
+            while (request := await read_request(reader)) is not None:
+                await self.respond(conn_id, request, reader, writer)
+                if not request.keep_alive:
+                    break
+        except (
+            ConnectionError,
+            asyncio.IncompleteReadError,
+            asyncio.LimitOverrunError,
+            ValueError,
+        ):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, conn_id, request, reader, writer):
+        started = time.monotonic()
+        record = {
+            "t": round(started - self.started, 6),
+            "conn": conn_id,
+            "method": request.method,
+            "path": request.path,
+            "kind": "other",
+            "status": None,
+            "bytes": 0,
+            "ttfb": None,
+            "seconds": None,
+        }
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        path = request.path
+        if path.startswith("/git/"):
+            record["kind"] = "git"
+            await self.git_backend(request, reader, writer, record, started)
+        else:
+            await read_body(reader, request.headers)
+            await self.route(request, writer, record, started)
+
+        record["seconds"] = round(time.monotonic() - started, 6)
+        self.requests.append(record)
+        if self.log is not None:
+            self.log.write(json.dumps(record) + "\n")
+
+    async def route(self, request, writer, record, started):
+        path = request.path
+        base_url = f"{self.scheme}://{request.headers.get('host', 'localhost')}"
+
+        if path == "/.well-known/terraform.json":
+            record["kind"] = "discovery"
+            await self.reply_json(
+                writer, record, started, {"modules.v1": "/v1/modules/"}
+            )
+            return
+
+        if match := VERSIONS_RE.match(path):
+            record["kind"] = "versions"
+            module = self.lookup(match[1], match[2])
+            if module is None:
+                await self.reply(writer, record, started, 404)
+                return
+            versions = [{"version": v} for v in module["versions"]]
+            await self.reply_json(
+                writer, record, started, {"modules": [{"versions": versions}]}
+            )
+            return
+
+        if match := DOWNLOAD_RE.match(path):
+            record["kind"] = "download"
+            module = self.lookup(match[1], match[2])
+            ref = module and module["versions"].get(match[4])
+            if ref is None:
+                await self.reply(writer, record, started, 404)
+                return
+            source = module_source(
+                base_url, match[2], module, self.source, ref, match[4]
+            )
+            await self.reply(
+                writer, record, started, 204, [("X-Terraform-Get", source)]
+            )
+            return
+
+        if match := ARCHIVE_RE.match(path):
+            record["kind"] = "archive"
+            module = self.modules.get(match[1])
+            archive = module and module["archives"].get(match[2])
+            if archive is None:
+                await self.reply(writer, record, started, 404)
+                return
+            await self.send_file(request, writer, record, started, archive)
+            return
+
+        await self.reply(writer, record, started, 404)
+
+    def lookup(self, namespace, name):
+        if namespace != NAMESPACE:
+            return None
+        return self.modules.get(name)
+
+    def start_response(self, writer, record, started, status, headers):
+        writer.write(response_head(status, headers))
+        record["status"] = status
+        record["ttfb"] = round(time.monotonic() - started, 6)
+
+    async def send(self, writer, record, data):
+        """Write a body through the bandwidth limit"""
+        view = memoryview(data)
+        for offset in range(0, len(view), CHUNK_SIZE):
+            chunk = view[offset : offset + CHUNK_SIZE]
+            await self.limiter.consume(len(chunk))
+            writer.write(chunk)
+            await writer.drain()
+            record["bytes"] += len(chunk)
+
+    async def reply(self, writer, record, started, status, headers=(), body=b""):
+        self.start_response(
+            writer,
+            record,
+            started,
+            status,
+            [*headers, ("Content-Length", len(body))] if status != 204 else headers,
+        )
+        if record["method"] != "HEAD":
+            await self.send(writer, record, body)
+        await writer.drain()
+
+    async def reply_json(self, writer, record, started, data):
+        body = json.dumps(data).encode()
+        await self.reply(
+            writer, record, started, 200, [("Content-Type", "application/json")], body
+        )
+
+    async def send_file(self, request, writer, record, started, path: Path):
+        self.start_response(
+            writer,
+            record,
+            started,
+            200,
+            [
+                ("Content-Type", "application/gzip"),
+                ("Content-Length", path.stat().st_size),
+            ],
+        )
+        if request.method == "HEAD":
+            await writer.drain()
+            return
+        # Disk reads go to the default executor so a slow read does not stall
+        # the other connections and their timings
+        loop = asyncio.get_running_loop()
+        f = await loop.run_in_executor(None, open, path, "rb")
+        try:
+            while data := await loop.run_in_executor(None, f.read, CHUNK_SIZE):
+                await self.send(writer, record, data)
+        finally:
+            f.close()
+
+    async def git_backend(self, request, reader, writer, record, started):
+        """Run `git http-backend` as a CGI script for a smart HTTP request"""
+        headers = request.headers
+        env = {
+            "PATH": os.environ.get("PATH", ""),
+            "HOME": os.environ.get("HOME", ""),
+            "GIT_PROJECT_ROOT": self.git_root.as_posix(),
+            "GIT_HTTP_EXPORT_ALL": "1",
+            "PATH_INFO": request.path.removeprefix("/git"),
+            "QUERY_STRING": request.query,
+            "REQUEST_METHOD": request.method,
+            "CONTENT_TYPE": headers.get("content-type", ""),
+            "REMOTE_ADDR": "127.0.0.1",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+        }
+        if "content-length" in headers:
+            env["CONTENT_LENGTH"] = headers["content-length"]
+        if "content-encoding" in headers:
+            env["HTTP_CONTENT_ENCODING"] = headers["content-encoding"]
+        if "git-protocol" in headers:
+            env["GIT_PROTOCOL"] = headers["git-protocol"]
+
+        proc = await asyncio.create_subprocess_exec(
+            "git",
+            "http-backend",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            env=env,
+        )
+
+        async def feed():
+            try:
+                async for chunk in iter_body(reader, headers):
+                    proc.stdin.write(chunk)
+                    await proc.stdin.drain()
+            finally:
+                proc.stdin.close()
+
+        feeder = asyncio.create_task(feed())
+        try:
+            status = 200
+            response_headers = []
+            while (line := await proc.stdout.readline()) not in (b"\r\n", b"\n", b""):
+                name, _, value = line.decode("latin-1").partition(":")
+                if name.lower() == "status":
+                    status = int(value.split()[0])
+                else:
+                    response_headers.append((name, value.strip()))
+            await feeder
+
+            # Keep a Content-Length from the backend, chunk the body otherwise
+            sized = any(
+                name.lower() == "content-length" for name, _ in response_headers
+            )
+            if not sized:
+                response_headers.append(("Transfer-Encoding", "chunked"))
+            self.start_response(writer, record, started, status, response_headers)
+            while data := await proc.stdout.read(CHUNK_SIZE):
+                if sized:
+                    await self.send(writer, record, data)
+                    continue
+                writer.write(b"%x\r\n" % len(data))
+                await self.send(writer, record, data)
+                writer.write(b"\r\n")
+            if not sized:
+                writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        finally:
+            feeder.cancel()
+            if proc.returncode is None:
+                try:
+                    proc.kill()
+                except ProcessLookupError:
+                    pass
+            await proc.wait()
+
+    def summary(self):
+        """Request counts, bytes and timings per kind of request"""
+        kinds = {}
+        for record in self.requests:
+            kinds.setdefault(record["kind"], []).append(record)
+        result = {
+            "seconds": round(time.monotonic() - self.started, 3),
+            "requests": len(self.requests),
+            "bytes": sum(r["bytes"] for r in self.requests),
+            "kinds": {},
+        }
+        for kind, records in sorted(kinds.items()):
+            result["kinds"][kind] = {
+                "requests": len(records),
+                "errors": sum(1 for r in records if (r["status"] or 500) >= 400),
+                "bytes": sum(r["bytes"] for r in records),
+                "seconds": bench.summarize([r["seconds"] for r in records]),
+                "ttfb": bench.summarize([r["ttfb"] or 0.0 for r in records]),
+            }
+        return result
+
+    async def serve(self, host, port, ssl=None):
+        if ssl is not None:
+            self.scheme = "https"
+        server = await asyncio.start_server(self.handle, host, port, ssl=ssl)
+        async with server:
+            await server.serve_forever()
@@ -0,0 +1,290 @@
+import asyncio
+import gzip
+import json
+import os
+import time
+from pathlib import Path
+from urllib.parse import parse_qs, quote
+
+from src.torture import bench, logsink
+from src.torture.httpserver import read_body, read_request, response_head
+
+STATE_DIR = Path("artifacts") / "state"
+
+CHUNK_SIZE = 64 * 1024
+
+# Bodies smaller than this are sent uncompressed
+GZIP_MIN_SIZE = 1024
+
+
+class MemoryStorage:
+    """States kept in a dict, lost on exit"""
+
+    def __init__(self):
+        self.states = {}
+
+    def get(self, name):
+        return self.states.get(name)
+
+    def put(self, name, data):
+        self.states[name] = data
+
+    def delete(self, name):
+        self.states.pop(name, None)
+
+    def sizes(self):
+        return {name: len(data) for name, data in self.states.items()}
+
+
+class DiskStorage:
+    """
+    States stored as files in a directory
+
+    Writes go to a temporary file renamed over the state, optionally after an
+    fsync, like a backend that must not lose acknowledged writes.
+    """
+
+    def __init__(self, directory=STATE_DIR, fsync=False):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.fsync = fsync
+
+    def path(self, name):
+        return self.directory / f"{quote(name, safe='')}.tfstate"
+
+    def get(self, name):
+        try:
+            return self.path(name).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def put(self, name, data):
+        path = self.path(name)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        tmp.rename(path)
+
+    def delete(self, name):
+        self.path(name).unlink(missing_ok=True)
+
+    def sizes(self):
+        return {p.stem: p.stat().st_size for p in self.directory.glob("*.tfstate")}
+
+
+class StateServer:
+    """
+    Local stand-in for an http state backend
+
+    Implements the protocol of the http backend: GET, POST and DELETE of the
+    state at any path, and LOCK/UNLOCK with the lock info as JSON body. A
+    conflicting LOCK gets 423 with the current lock info, and tofu retries
+    until -lock-timeout, so the lock wait of a lock ID is measured from its
+    first conflict to its successful LOCK. Storage and gzip run in threads
+    to keep serving other requests.
+
+    Every request is recorded with its latency, request and response sizes
+    and lock wait, and appended to an optional JSON lines log.
+
+    Args:
+        storage: MemoryStorage or DiskStorage
+        gzip_level: Compress responses for clients accepting gzip, None to disable
+        rate: Bandwidth in bytes per second, None for unlimited
+        latency: Seconds of delay before each response
+        log: Optional text file object for JSON lines request records
+    """
+
+    def __init__(self, storage, gzip_level=None, rate=None, latency=0.0, log=None):
+        self.storage = storage
+        self.gzip_level = gzip_level
+        self.limiter = logsink.RateLimiter(rate)
+        self.latency = latency
+        self.log = log
+        self.locks = {}
+        self.conflicts = {}
+        self.versions = {}
+        self.compressed = {}
+        self.started = time.monotonic()
+        self.requests = []
+
+    async def handle(self, reader, writer):
+        try:
+            while (request := await read_request(reader)) is not None:
+                await self.respond(request, reader, writer)
+                if not request.keep_alive:
+                    break
+        except (
+            ConnectionError,
+            asyncio.IncompleteReadError,
+            asyncio.LimitOverrunError,
+            ValueError,
+        ):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, request, reader, writer):
+        started = time.monotonic()
+        body = await read_body(reader, request.headers)
+        record = {
+            "t": round(started - self.started, 6),
+            "method": request.method,
+            "name": request.path.strip("/"),
+            "status": None,
+            "request_bytes": len(body),
+            "response_bytes": 0,
+            "gzip": False,
+            "lock_wait": None,
+            "seconds": None,
+        }
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if request.headers.get("content-encoding", "").lower() == "gzip":
+            body = await asyncio.to_thread(gzip.decompress, body)
+
+        # Taken before the handler reads the state, so a write racing with it
+        # cannot leave a stale compressed copy under the new version
+        version = self.versions.get(record["name"], 0)
+        handler = {
+            "GET": self.get,
+            "HEAD": self.get,
+            "POST": self.post,
+            "PUT": self.post,
+            "DELETE": self.delete,
+            "LOCK": self.lock,
+            "UNLOCK": self.unlock,
+        }.get(request.method)
+        if handler is None:
+            status, headers, payload = 405, [], b""
+        else:
+            status, headers, payload = await handler(request, record, body)
+
+        if (
+            self.gzip_level is not None
+            and len(payload) >= GZIP_MIN_SIZE
+            and "gzip" in request.headers.get("accept-encoding", "")
+        ):
+            payload = await self.compress(request, record["name"], version, payload)
+            headers.append(("Content-Encoding", "gzip"))
+            record["gzip"] = True
+        headers.append(("Content-Length", len(payload)))
+        writer.write(response_head(status, headers))
+        if request.method != "HEAD":
+            view = memoryview(payload)
+            for offset in range(0, len(view), CHUNK_SIZE):
+                chunk = view[offset : offset + CHUNK_SIZE]
+                await self.limiter.consume(len(chunk))
+                writer.write(chunk)
+                await writer.drain()
+            record["response_bytes"] = len(payload)
+        await writer.drain()
+
+        record["status"] = status
+        record["seconds"] = round(time.monotonic() - started, 6)
+        self.requests.append(record)
+        if self.log is not None:
+            self.log.write(json.dumps(record) + "\n")
+
+    async def compress(self, request, name, version, payload):
+        """Gzip a response, reusing the compressed state until the next write"""
+        cached = self.compressed.get(name)
+        if request.method in ("GET", "HEAD") and cached and cached[0] == version:
+            return cached[1]
+        data = await asyncio.to_thread(gzip.compress, payload, self.gzip_level, mtime=0)
+        if request.method in ("GET", "HEAD"):
+            self.compressed[name] = (version, data)
+        return data
+
+    def changed(self, name):
+        self.versions[name] = self.versions.get(name, 0) + 1
+        self.compressed.pop(name, None)
+
+    def locked_by_other(self, name, lock_id):
+        lock = self.locks.get(name)
+        return lock is not None and lock.get("ID") != lock_id
+
+    async def get(self, request, record, body):
+        data = await asyncio.to_thread(self.storage.get, record["name"])
+        if data is None:
+            return 404, [], b""
+        return 200, [("Content-Type", "application/json")], data
+
+    async def post(self, request, record, body):
+        name = record["name"]
+        lock_id = parse_qs(request.query).get("ID", [None])[0]
+        if self.locked_by_other(name, lock_id):
+            return 409, [("Content-Type", "application/json")], self.lock_body(name)
+        await asyncio.to_thread(self.storage.put, name, body)
+        self.changed(name)
+        return 200, [], b""
+
+    async def delete(self, request, record, body):
+        name = record["name"]
+        if self.locked_by_other(name, parse_qs(request.query).get("ID", [None])[0]):
+            return 409, [("Content-Type", "application/json")], self.lock_body(name)
+        await asyncio.to_thread(self.storage.delete, name)
+        self.changed(name)
+        return 200, [], b""
+
+    def lock_body(self, name):
+        return json.dumps(self.locks[name]).encode()
+
+    async def lock(self, request, record, body):
+        name = record["name"]
+        try:
+            info = json.loads(body or b"{}")
+        except ValueError:
+            return 400, [], b""
+        lock_id = info.get("ID")
+        if self.locked_by_other(name, lock_id):
+            self.conflicts.setdefault((name, lock_id), time.monotonic())
+            return 423, [("Content-Type", "application/json")], self.lock_body(name)
+        first_conflict = self.conflicts.pop((name, lock_id), None)
+        if first_conflict is not None:
+            record["lock_wait"] = round(time.monotonic() - first_conflict, 6)
+        self.locks[name] = info
+        return 200, [], b""
+
+    async def unlock(self, request, record, body):
+        name = record["name"]
+        try:
+            info = json.loads(body or b"{}")
+        except ValueError:
+            info = {}
+        # An empty ID comes from force-unlock
+        if info.get("ID") and self.locked_by_other(name, info["ID"]):
+            return 409, [("Content-Type", "application/json")], self.lock_body(name)
+        self.locks.pop(name, None)
+        return 200, [], b""
+
+    def summary(self):
+        """Request counts, bytes, latencies and lock waits per method"""
+        methods = {}
+        for record in self.requests:
+            methods.setdefault(record["method"], []).append(record)
+        result = {
+            "seconds": round(time.monotonic() - self.started, 3),
+            "requests": len(self.requests),
+            "states": self.storage.sizes(),
+            "methods": {},
+        }
+        for method, records in sorted(methods.items()):
+            waits = [r["lock_wait"] for r in records if r["lock_wait"] is not None]
+            result["methods"][method] = {
+                "requests": len(records),
+                "errors": sum(1 for r in records if r["status"] >= 400),
+                "request_bytes": sum(r["request_bytes"] for r in records),
+                "response_bytes": sum(r["response_bytes"] for r in records),
+                "max_request_bytes": max(r["request_bytes"] for r in records),
+                "seconds": bench.summarize([r["seconds"] for r in records]),
+                "lock_waits": bench.summarize(waits) if waits else None,
+            }
+        return result
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
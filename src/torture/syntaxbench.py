@@ -0,0 +1,121 @@
+import os
+import shutil
+from pathlib import Path
+
+import click
+
+from src.torture import bench, initbench, metrics, modulegen
+
+COMMANDS = {
+    "validate": ["tofu", "validate", "-no-color"],
+    "plan": [
+        "tofu",
+        "plan",
+        "-input=false",
+        "-no-color",
+        "-refresh=false",
+        "-lock=false",
+    ],
+}
+
+METRICS = ["wall_seconds", "user_seconds", "max_rss_bytes"]
+
+
+def config_bytes(module_dir: Path):
+    """Total size of the .tf and .tf.json files of a module, without .terraform"""
+    total = 0
+    for root, dirs, names in os.walk(module_dir):
+        dirs[:] = [d for d in dirs if d != ".terraform"]
+        for name in names:
+            if name.endswith((".tf", ".tf.json")):
+                total += (Path(root) / name).stat().st_size
+    return total
+
+
+def run_command(module_dir: Path, command, env):
+    """Run a tofu command in a module as a measured phase, logged next to it"""
+    log_path = module_dir.parent / f"{module_dir.name}.{command}.log"
+    with open(log_path, "ab") as log:
+        phase = metrics.run_phase(
+            command, COMMANDS[command], stdout=log, stderr=log, cwd=module_dir, env=env
+        )
+    phase.pop("samples", None)
+    if phase["returncode"] != 0:
+        raise RuntimeError(f"tofu {command} failed in {module_dir}, see {log_path}")
+    return phase
+
+
+def run_bench(
+    specs,
+    workdir="artifacts/bench-syntax",
+    commands=None,
+    repeat=3,
+    seed=0,
+    scale=1.0,
+    cli_config=None,
+):
+    """
+    Time tofu commands on the HCL and JSON syntax variants of modules
+
+    Both variants are built from the same spec and seed, so they hold the
+    same values, into workdir/hcl and workdir/json, and initialized once
+    with a shared plugin cache. Runs of the two variants are interleaved to
+    spread out drift.
+
+    Args:
+        specs: Module specs, see modulespec
+        workdir: Directory for the variants and logs, replaced if it exists
+        commands: Keys of COMMANDS, defaults to all
+        repeat: Runs per module, command and syntax
+        seed: Base seed of the modules
+        scale: Factor applied to file counts, resource counts and payload sizes
+        cli_config: Optional CLI configuration file, e.g. from gen-providers
+
+    Returns:
+        Dict of module name to config bytes and, per command and syntax, the
+        runs and their summary
+    """
+    workdir = Path(workdir)
+    commands = list(commands or COMMANDS)
+    if workdir.exists():
+        shutil.rmtree(workdir)
+    plugin_cache = workdir / "plugin-cache"
+    plugin_cache.mkdir(parents=True)
+    env = initbench.init_env(plugin_cache, cli_config)
+
+    results = {}
+    for spec in specs:
+        dirs = {}
+        for syntax in modulegen.SYNTAXES:
+            modulegen.build_module(
+                spec,
+                seed=seed,
+                scale=scale,
+                syntax=syntax,
+                modules_dir=workdir / syntax,
+            )
+            dirs[syntax] = workdir / syntax / spec["name"]
+            initbench.run_init(dirs[syntax], env)
+        result = results[spec["name"]] = {
+            "bytes": {syntax: config_bytes(d) for syntax, d in dirs.items()},
+            "commands": {
+                command: {syntax: {"runs": []} for syntax in dirs}
+                for command in commands
+            },
+        }
+        for attempt in range(repeat):
+            for command in commands:
+                for syntax, module_dir in dirs.items():
+                    click.echo(
+                        f"{spec['name']}: {command} {syntax} (run {attempt + 1}/{repeat})"
+                    )
+                    result["commands"][command][syntax]["runs"].append(
+                        run_command(module_dir, command, env)
+                    )
+        for variants in result["commands"].values():
+            for variant in variants.values():
+                variant["summary"] = {
+                    key: bench.summarize([r[key] for r in variant["runs"]])
+                    for key in METRICS
+                }
+    return results
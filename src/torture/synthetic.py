@@ -0,0 +1,484 @@
+import base64
+import gzip
+import hashlib
+import json
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+
+TERRAFORM_VERSION = "1.8.0"
+PROVIDER = "registry.opentofu.org/hashicorp/null"
+
+# Value of timestamp() in all generated documents
+TIMESTAMP = "2024-01-01T00:00:00Z"
+
+# Instances encoded per worker task
+BATCH_SIZE = 64
+
+# Distinct heavy trigger sets computed when values do not have to be exact,
+# computing them takes most of the generation time
+HEAVY_POOL = 64
+
+KINDS = ("small_resource", "medium_resource", "heavy_resource")
+
+# Trigger keys that are unknown until apply, because they call timestamp()
+UNKNOWN = {
+    "small_resource": ("timestamp",),
+    "medium_resource": ("timestamp",),
+    "heavy_resource": ("timestamp", "attribute_3", "attribute_6"),
+}
+
+MEDIUM_PATTERNS = [
+    "AAAAAAAAAA_STATIC_PADDING_BLOCK_RESOURCE_DATA_SEGMENT",
+    "BBBBBBBBBB_FIXED_CONTENT_FILLER_TEXT_ATTRIBUTE_VALUE",
+    "CCCCCCCCCC_HARDCODED_STRING_REPEATED_PATTERN_DATA",
+    "DDDDDDDDDD_CONSTANT_VALUE_PADDING_INFORMATION_BLOCK",
+    "EEEEEEEEEE_PREDETERMINED_TEXT_STATIC_RESOURCE_DATA",
+    "FFFFFFFFFF_LITERAL_STRING_FIXED_PATTERN_CONTENT",
+    "GGGGGGGGGG_INVARIANT_DATA_HARDCODED_SEGMENT_BLOCK",
+    "HHHHHHHHHH_STATIC_FILLER_PREDETERMINED_VALUE_TEXT",
+    "IIIIIIIIII_CONSTANT_PATTERN_FIXED_RESOURCE_PADDING",
+    "JJJJJJJJJJ_LITERAL_CONTENT_HARDCODED_DATA_SEGMENT",
+]
+
+
+def md5(text):
+    return hashlib.md5(text.encode()).hexdigest()
+
+
+def sha1(text):
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def sha256(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def b64(text):
+    return base64.b64encode(text.encode()).decode()
+
+
+def jsonencode(value):
+    """jsonencode() output: compact with sorted object keys"""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"))
+
+
+class Triggers:
+    """
+    Trigger values of the null_resource instances in main.tf
+
+    The values are computed with the same functions as the HCL expressions,
+    so sizes and contents match an applied configuration. Parts that do not
+    depend on the instance index are computed once. Unless exact is set,
+    heavy instances reuse the attributes of index % HEAVY_POOL, which keeps
+    their size and shape at a fraction of the cost.
+    """
+
+    def __init__(
+        self, timestamp=TIMESTAMP, log_lines=None, log_command="", exact=False
+    ):
+        self.timestamp = timestamp
+        self.exact = exact
+        self.heavy_pool = {}
+        self.log_lines = {"medium_resource": 10, "heavy_resource": 1000}
+        self.log_lines.update(log_lines or {})
+        self.log_command = log_command
+        now = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+        now = now.astimezone(timezone.utc)
+        self.compact_date = now.strftime("%Y%m%d%H%M%S")
+        self.iso_date = now.strftime("%Y-%m-%dT%H:%M:%S")
+        self.data_b64 = [b64(f"data-{i}") for i in range(200)]
+        self.segment_sha1 = [sha1(f"segment-{i}") for i in range(200)]
+        self.salt_md5 = [md5(f"salt-{i}") for i in range(200)]
+        self.data_sha256 = [sha256(f"data-{i}") for i in range(80)]
+        self.index_md5 = [md5(str(i)) for i in range(200)]
+        self.element_b64 = [b64(f"element-{i}") for i in range(150)]
+        self.final = [f"{md5(f'final-{i}')}_" for i in range(200)]
+        self.end_b64 = [b64(f"end-{i}") for i in range(200)]
+
+    def __call__(self, kind, idx):
+        triggers = {"index": str(idx), "timestamp": self.timestamp}
+        if kind == "small_resource":
+            return triggers
+        triggers["log_lines_per_resource"] = str(self.log_lines[kind])
+        if self.log_command:
+            # main.tf only adds it to the triggers with log_firehose enabled
+            triggers["log_command"] = self.log_command
+        if kind == "medium_resource":
+            for n, pattern in enumerate(MEDIUM_PATTERNS, 1):
+                triggers[f"attribute_{n}"] = "".join(
+                    f"{pattern}_{idx}_{i}_" for i in range(100)
+                )
+        elif self.exact:
+            triggers.update(self.heavy(idx))
+        else:
+            slot = idx % HEAVY_POOL
+            if slot not in self.heavy_pool:
+                self.heavy_pool[slot] = self.heavy(slot)
+            triggers.update(self.heavy_pool[slot])
+        return dict(sorted(triggers.items()))
+
+    def heavy(self, idx):
+        return {
+            "attribute_1": "".join(
+                f"{md5(f'{idx}-{i}')}_{self.data_b64[i]}_" for i in range(200)
+            ),
+            "attribute_2": "".join(
+                f"{sha256(f'resource-{idx}-segment-{i}')}_" for i in range(200)
+            ),
+            "attribute_3": jsonencode(
+                {
+                    f"key_{i}": {
+                        "hash": md5(f"{idx}-{i}"),
+                        "b64": b64(f"value-{idx}-{i}"),
+                        "nested": f"DATA_{i}_{idx}_{self.compact_date}",
+                    }
+                    for i in range(100)
+                }
+            ),
+            "attribute_4": "".join(
+                f"{md5(f'heavy-{i}-{idx}')}_{self.segment_sha1[i]}_" for i in range(200)
+            ),
+            "attribute_5": "".join(
+                f"{b64(f'{idx}-{i}-{self.salt_md5[i]}')}_" for i in range(200)
+            ),
+            "attribute_6": jsonencode(
+                {
+                    f"item_{i}": {
+                        "md5_hash": md5(f"item-{idx}-{i}"),
+                        "sha256_hash": self.data_sha256[i],
+                        "encoded": b64(f"resource-{idx}-item-{i}"),
+                        "timestamp": self.iso_date,
+                    }
+                    for i in range(80)
+                }
+            ),
+            "attribute_7": "".join(
+                f"{sha256(f'attr7-{idx}-{i}')}_{self.index_md5[i]}_" for i in range(200)
+            ),
+            "attribute_8": "".join(
+                f"{b64(md5(f'combined-{idx}-{i}'))}_" for i in range(200)
+            ),
+            "attribute_9": jsonencode(
+                [
+                    {
+                        "index": i,
+                        "hash": md5(f"array-{idx}-{i}"),
+                        "data": self.element_b64[i],
+                        "sha": sha1(f"value-{idx}-{i}"),
+                    }
+                    for i in range(150)
+                ]
+            ),
+            "attribute_10": "".join(
+                f"{self.final[i]}{sha256(f'{idx}-{i}')}_{self.end_b64[i]}_"
+                for i in range(200)
+            ),
+        }
+
+
+def resource_id(kind, idx):
+    """Stable stand-in for the random id of a null_resource"""
+    return str(int(sha256(f"{kind}-{idx}")[:15], 16))
+
+
+def known(kind, triggers):
+    return {k: v for k, v in triggers.items() if k not in UNKNOWN[kind]}
+
+
+def resource_common(kind, idx):
+    return {
+        "address": f"null_resource.{kind}[{idx}]",
+        "mode": "managed",
+        "type": "null_resource",
+        "name": kind,
+        "index": idx,
+        "provider_name": PROVIDER,
+    }
+
+
+def state_instance(kind, idx, triggers):
+    return {
+        "index_key": idx,
+        "schema_version": 0,
+        "attributes": {"id": resource_id(kind, idx), "triggers": triggers},
+        "sensitive_attributes": [],
+        "private": "bnVsbA==",
+    }
+
+
+def planned_value(kind, idx, triggers):
+    return {
+        **resource_common(kind, idx),
+        "schema_version": 0,
+        "values": {"triggers": known(kind, triggers)},
+        "sensitive_values": {"triggers": {}},
+    }
+
+
+def prior_value(kind, idx, triggers):
+    return {
+        **resource_common(kind, idx),
+        "schema_version": 0,
+        "values": {"id": resource_id(kind, idx), "triggers": triggers},
+        "sensitive_values": {"triggers": {}},
+    }
+
+
+def resource_change(kind, idx, triggers, replace):
+    change = {
+        "actions": ["delete", "create"] if replace else ["create"],
+        "before": None,
+        "after": {"triggers": known(kind, triggers)},
+        "after_unknown": {
+            "id": True,
+            "triggers": {key: True for key in UNKNOWN[kind]},
+        },
+        "before_sensitive": False,
+        "after_sensitive": {"triggers": {}},
+    }
+    result = {**resource_common(kind, idx), "change": change}
+    if replace:
+        change["before"] = {"id": resource_id(kind, idx), "triggers": triggers}
+        change["before_sensitive"] = {"triggers": {}}
+        change["replace_paths"] = [["triggers"]]
+        result["action_reason"] = "replace_because_cannot_update"
+    return result
+
+
+# Indentation of an instance inside the resources array of a state file
+STATE_INDENT = " " * 8
+
+_triggers = None
+
+
+def encode_batch(section, kind, start, stop, options):
+    """
+    Encode instances start to stop of a resource kind for a document section
+
+    Runs in worker processes, the Triggers tables are built once per process.
+
+    Returns:
+        The encoded instances joined with the separator of the section
+    """
+    global _triggers
+    key = json.dumps(options, sort_keys=True)
+    if _triggers is None or _triggers[0] != key:
+        triggers = Triggers(
+            options["timestamp"],
+            options["log_lines"],
+            options["log_command"],
+            options["exact"],
+        )
+        _triggers = (key, triggers)
+    triggers_of = _triggers[1]
+
+    parts = []
+    for idx in range(start, stop):
+        triggers = triggers_of(kind, idx)
+        if section == "state":
+            text = json.dumps(state_instance(kind, idx, triggers), indent=2)
+            parts.append(STATE_INDENT + text.replace("\n", "\n" + STATE_INDENT))
+            continue
+        if section == "planned_values":
+            value = planned_value(kind, idx, triggers)
+        elif section == "prior_state":
+            value = prior_value(kind, idx, triggers)
+        else:
+            value = resource_change(kind, idx, triggers, options["replace"])
+        parts.append(json.dumps(value, separators=(",", ":")))
+    return (",\n" if section == "state" else ",").join(parts)
+
+
+class DocumentWriter:
+    """
+    Ordered writer of encoded instance batches
+
+    Batches are encoded by an optional executor with at most window batches
+    in flight and written in order, so memory stays bounded by the window
+    regardless of the number of resources.
+    """
+
+    def __init__(self, out, pool=None, window=8, batch_size=BATCH_SIZE):
+        self.out = out
+        self.pool = pool
+        self.window = window
+        self.batch_size = batch_size
+        self.bytes = 0
+
+    def write(self, text):
+        data = text.encode()
+        self.out.write(data)
+        self.bytes += len(data)
+
+    def instances(self, section, kind, count, options, separator):
+        """Write count instances, separator goes between batches"""
+        pending = deque()
+        first = True
+        for start in range(0, count, self.batch_size):
+            args = (section, kind, start, min(start + self.batch_size, count), options)
+            if self.pool is None:
+                pending.append(encode_batch(*args))
+            else:
+                pending.append(self.pool.submit(encode_batch, *args))
+            while pending and (self.pool is None or len(pending) >= self.window):
+                first = self.flush(pending.popleft(), separator, first)
+        while pending:
+            first = self.flush(pending.popleft(), separator, first)
+
+    def flush(self, item, separator, first):
+        text = item if isinstance(item, str) else item.result()
+        if not first:
+            self.write(separator)
+        self.write(text)
+        return False
+
+
+def open_output(path: Path, compress=None):
+    if compress is None:
+        return open(path, "wb", buffering=1024 * 1024)
+    return gzip.GzipFile(path, "wb", compresslevel=compress, mtime=0)
+
+
+def build_options(
+    timestamp=TIMESTAMP, log_lines=None, log_command="", replace=False, exact=False
+):
+    return {
+        "timestamp": timestamp,
+        "log_lines": dict(log_lines or {}),
+        "log_command": log_command,
+        "replace": replace,
+        "exact": exact,
+    }
+
+
+def write_state(path, counts, options, pool=None, compress=None, lineage=None):
+    """
+    Stream a terraform.tfstate v4 file with the resources of main.tf
+
+    The file is indented like the state files tofu writes.
+
+    Args:
+        path: Output file
+        counts: Dict of resource kind to instance count
+        options: Dict from build_options
+        pool: Optional executor encoding batches in parallel
+        compress: Gzip level, None for plain JSON
+        lineage: State lineage, a random UUID by default
+
+    Returns:
+        Dict with path, resources, bytes and seconds
+    """
+    start = time.monotonic()
+    kinds = [k for k in sorted(KINDS) if counts.get(k)]
+    with open_output(Path(path), compress) as out:
+        doc = DocumentWriter(out, pool)
+        doc.write(
+            "{\n"
+            '  "version": 4,\n'
+            f'  "terraform_version": "{TERRAFORM_VERSION}",\n'
+            '  "serial": 1,\n'
+            f'  "lineage": "{lineage or uuid.uuid4()}",\n'
+            '  "outputs": {},\n'
+            '  "resources": [\n'
+        )
+        for n, kind in enumerate(kinds):
+            doc.write(
+                "    {\n"
+                '      "mode": "managed",\n'
+                '      "type": "null_resource",\n'
+                f'      "name": "{kind}",\n'
+                f'      "provider": "provider[\\"{PROVIDER}\\"]",\n'
+                '      "instances": [\n'
+            )
+            doc.instances("state", kind, counts[kind], options, ",\n")
+            doc.write("\n      ]\n    }" + (",\n" if n < len(kinds) - 1 else "\n"))
+        doc.write('  ],\n  "check_results": null\n}\n')
+    return {
+        "path": Path(path).as_posix(),
+        "resources": sum(counts.get(k, 0) for k in kinds),
+        "bytes": doc.bytes,
+        "seconds": round(time.monotonic() - start, 3),
+    }
+
+
+def write_plan(path, counts, options, pool=None, compress=None):
+    """
+    Stream a `tofu show -json` plan document with the resources of main.tf
+
+    Instances are created, or replaced with a prior_state section when
+    options["replace"] is set, as happens on every plan after an apply since
+    the triggers call timestamp().
+
+    Args:
+        path: Output file
+        counts: Dict of resource kind to instance count
+        options: Dict from build_options
+        pool: Optional executor encoding batches in parallel
+        compress: Gzip level, None for plain JSON
+
+    Returns:
+        Dict with path, resources, bytes and seconds
+    """
+    start = time.monotonic()
+    kinds = [k for k in sorted(KINDS) if counts.get(k)]
+
+    def section(doc, name):
+        wrote = False
+        for kind in kinds:
+            if wrote:
+                doc.write(",")
+            doc.instances(name, kind, counts[kind], options, ",")
+            wrote = True
+
+    variables = {f"{kind}_count": {"value": counts.get(kind, 0)} for kind in KINDS}
+    configuration = {
+        "provider_config": {"null": {"name": "null", "full_name": PROVIDER}},
+        "root_module": {
+            "resources": [
+                {
+                    "address": f"null_resource.{kind}",
+                    "mode": "managed",
+                    "type": "null_resource",
+                    "name": kind,
+                    "provider_config_key": "null",
+                    "schema_version": 0,
+                    "count_expression": {"references": [f"var.{kind}_count"]},
+                }
+                for kind in KINDS
+            ]
+        },
+    }
+    compact = {"separators": (",", ":")}
+    with open_output(Path(path), compress) as out:
+        doc = DocumentWriter(out, pool)
+        doc.write(
+            f'{{"format_version":"1.2","terraform_version":"{TERRAFORM_VERSION}",'
+            f'"variables":{json.dumps(variables, **compact)},'
+            '"planned_values":{"root_module":{"resources":['
+        )
+        section(doc, "planned_values")
+        doc.write(']}},"resource_changes":[')
+        section(doc, "resource_changes")
+        doc.write("]")
+        if options["replace"]:
+            doc.write(
+                f',"prior_state":{{"format_version":"1.0",'
+                f'"terraform_version":"{TERRAFORM_VERSION}",'
+                '"values":{"root_module":{"resources":['
+            )
+            section(doc, "prior_state")
+            doc.write("]}}}")
+        doc.write(
+            f',"configuration":{json.dumps(configuration, **compact)},'
+            f'"timestamp":"{options["timestamp"]}",'
+            '"applyable":true,"complete":true,"errored":false}\n'
+        )
+    return {
+        "path": Path(path).as_posix(),
+        "resources": sum(counts.get(k, 0) for k in kinds),
+        "bytes": doc.bytes,
+        "seconds": round(time.monotonic() - start, 3),
+    }
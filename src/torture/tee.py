@@ -0,0 +1,103 @@
+import io
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+MB = 1024 * 1024
+
+# Bytes collected from the pipe before they are handed to the sinks
+BUFFER_SIZE = 4 * MB
+
+# Requested kernel pipe buffer, so the writer blocks less often
+PIPE_SIZE = MB
+
+
+def grow_pipe(fd, size=PIPE_SIZE):
+    """Enlarge a pipe buffer where the platform allows it, returns the new size"""
+    if fcntl is None or not hasattr(fcntl, "F_SETPIPE_SZ"):
+        return None
+    try:
+        return fcntl.fcntl(fd, fcntl.F_SETPIPE_SZ, size)
+    except OSError:
+        return None
+
+
+class Tee:
+    """
+    Copy a stream to several sinks in one pass
+
+    The stream is read with readinto() into a single reusable buffer, which
+    is passed to every sink as a memoryview, so the only copies made are the
+    ones a sink needs for itself. A sink raising ValueError (e.g. a parser
+    given invalid output) is dropped and reported, the others keep going.
+
+    Args:
+        sinks: Dict of name to callable taking a memoryview
+        buffer_size: Size of the reusable read buffer
+        fill: Fill the buffer before calling the sinks; without it every read
+            is passed on at once, for sinks that care about latency
+    """
+
+    def __init__(self, sinks, buffer_size=BUFFER_SIZE, fill=True):
+        self.sinks = dict(sinks)
+        self.buffer = bytearray(buffer_size)
+        self.fill = fill
+
+    def __call__(self, stream):
+        """
+        Pump the stream until EOF
+
+        Returns:
+            Dict with bytes, reads, seconds, MB/s and per-sink seconds and errors
+        """
+        reader = io.FileIO(stream.fileno(), closefd=False)
+        pipe_size = grow_pipe(reader.fileno())
+        view = memoryview(self.buffer)
+        size = len(view)
+        sinks = dict(self.sinks)
+        sink_seconds = dict.fromkeys(sinks, 0.0)
+        errors = {}
+        total = reads = 0
+        eof = False
+
+        start = time.monotonic()
+        while not eof:
+            filled = 0
+            # Fill the whole buffer before calling the sinks, pipes return
+            # at most their kernel buffer per read
+            while filled < size:
+                n = reader.readinto(view[filled:])
+                if not n:
+                    eof = True
+                    break
+                filled += n
+                reads += 1
+                if not self.fill:
+                    break
+            if not filled:
+                break
+            total += filled
+            chunk = view[:filled]
+            for name, sink in list(sinks.items()):
+                t = time.monotonic()
+                try:
+                    sink(chunk)
+                except ValueError as e:
+                    errors[name] = str(e)
+                    del sinks[name]
+                sink_seconds[name] += time.monotonic() - t
+        seconds = time.monotonic() - start
+        view.release()
+
+        return {
+            "bytes": total,
+            "reads": reads,
+            "pipe_size": pipe_size,
+            "seconds": round(seconds, 3),
+            "mb_per_second": round(total / MB / seconds, 1) if seconds else 0.0,
+            "sink_seconds": {k: round(v, 3) for k, v in sink_seconds.items()},
+            "errors": errors,
+        }
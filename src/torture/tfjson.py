@@ -0,0 +1,253 @@
+import json
+from json.encoder import encode_basestring_ascii as quote
+from pathlib import Path
+
+from src.torture import hcl
+
+
+class Items:
+    """
+    Object whose (key, value) pairs are produced while it is written
+
+    Values may be Items themselves, so whole blocks stream without building
+    them in memory, and random_data()/random_string() calls happen in the
+    order the HCL emitters make them.
+    """
+
+    def __init__(self, items):
+        self.items = items
+
+
+def iter_json(value, indent=0):
+    """Yield the JSON text of a value, streaming Items"""
+    if isinstance(value, Items):
+        yield from iter_object(value.items, indent)
+    elif isinstance(value, dict):
+        yield from iter_object(value.items(), indent)
+    elif isinstance(value, str):
+        # The C string encoder of json.dumps, without its per-call overhead
+        yield quote(value)
+    else:
+        yield json.dumps(value)
+
+
+def iter_object(items, indent=0):
+    pad = "\n" + "  " * (indent + 1)
+    empty = True
+    yield "{"
+    for key, value in items:
+        yield f"{pad}{quote(key)}: " if empty else f",{pad}{quote(key)}: "
+        yield from iter_json(value, indent + 1)
+        empty = False
+    yield "}" if empty else "\n" + "  " * indent + "}"
+
+
+TERRAFORM_BLOCK = {
+    "required_version": ">= 1.0",
+    "required_providers": {
+        "null": {"source": "hashicorp/null", "version": "~> 3.2"},
+    },
+}
+
+
+def iter_main(
+    module_name,
+    description,
+    resource_count,
+    prefix,
+    include_data,
+    random_data,
+    **_,
+):
+    """Emit the JSON syntax of MAIN_TF_TEMPLATE"""
+
+    def resources():
+        for i in range(resource_count):
+            triggers = {"id": f"{prefix}-{i}", "timestamp": "${timestamp()}"}
+            if include_data:
+                triggers["data"] = random_data()
+            yield f"resource_{i}", {"triggers": triggers}
+
+    def values():
+        for i in range(resource_count):
+            yield f"resource_{i}", f"${{null_resource.resource_{i}.id}}"
+
+    yield "//", f"{module_name}\n{description}"
+    yield "terraform", TERRAFORM_BLOCK
+    yield "resource", {"null_resource": Items(resources())}
+    yield "output", {f"{prefix}_output": {"value": Items(values())}}
+
+
+def iter_variable(var_count, module_name, **_):
+    """Emit the JSON syntax of VARIABLE_TF_TEMPLATE"""
+
+    def variables():
+        for i in range(var_count):
+            yield (
+                f"var_{i}",
+                {
+                    "description": f"Variable {i} for {module_name}",
+                    "type": "string",
+                    "default": f"default_value_{i}",
+                    "validation": {
+                        "condition": f"${{length(var.var_{i}) > 0}}",
+                        "error_message": f"Variable var_{i} must not be empty.",
+                    },
+                },
+            )
+
+    yield "variable", Items(variables())
+
+
+def iter_output(var_count, module_name, **_):
+    """Emit the JSON syntax of OUTPUT_TF_TEMPLATE"""
+
+    def values():
+        for i in range(var_count):
+            yield f"var_{i}", f"${{var.var_{i}}}"
+
+    yield (
+        "output",
+        {
+            "all_variables": {
+                "description": f"All variables from {module_name}",
+                "value": Items(values()),
+            }
+        },
+    )
+
+
+def iter_locals(
+    local_count,
+    random_string,
+    random_data,
+    include_large_data=False,
+    map_size=0,
+    json_items=0,
+    **_,
+):
+    """
+    Emit the JSON syntax of LOCALS_TF_TEMPLATE
+
+    The JSON syntax has no inline HCL expressions, so the object passed to
+    jsonencode() becomes the extra local large_json_items.
+    """
+
+    def data_map():
+        for i in range(map_size):
+            yield f"key_{i}", random_data()
+
+    def items():
+        for i in range(json_items):
+            item = {"id": i, "name": f"Item {i}", "description": random_data()}
+            item["metadata"] = {f"meta_key_{j}": random_string() for j in range(5)}
+            yield f"item_{i}", item
+
+    def values():
+        for i in range(local_count):
+            yield f"local_{i}", f"local_value_{i}_{random_string()}"
+        if include_large_data:
+            yield "large_data_map", Items(data_map())
+            yield "large_json_items", Items(items())
+            yield "large_json_structure", "${jsonencode(local.large_json_items)}"
+
+    yield "locals", Items(values())
+
+
+def iter_small_file(index, random_string, **_):
+    """Emit the JSON syntax of SMALL_FILE_TEMPLATE"""
+    yield "//", f"Small file {index}"
+    yield "variable", {f"small_var_{index}": {"default": f"value_{index}"}}
+    yield "locals", {f"small_local_{index}": f"local_{index}_{random_string()}"}
+    yield (
+        "resource",
+        {
+            "null_resource": {
+                f"small_{index}": {"triggers": {"value": f"${{var.small_var_{index}}}"}}
+            }
+        },
+    )
+
+
+def iter_submodule(name, resource_count, **_):
+    """Emit the JSON syntax of SUBMODULE_TEMPLATE"""
+
+    def resources():
+        for i in range(resource_count):
+            triggers = {"input": "${var.submodule_input}", "index": i}
+            yield f"sub_{name}_{i}", {"triggers": triggers}
+
+    def values():
+        for i in range(resource_count):
+            yield f"resource_{i}", f"${{null_resource.sub_{name}_{i}.id}}"
+
+    yield "//", f"Submodule {name}"
+    yield (
+        "variable",
+        {"submodule_input": {"type": "string", "default": f"submodule_{name}"}},
+    )
+    yield "resource", {"null_resource": Items(resources())}
+    yield "output", {f"submodule_{name}_output": {"value": Items(values())}}
+
+
+def iter_aggregator(module_name, var_count, **_):
+    """Emit the JSON syntax of the aggregator resource"""
+
+    def triggers():
+        for i in range(1, var_count + 1):
+            yield f"var_{i}", f"${{var.small_var_{i}}}"
+
+    yield "//", f"{module_name} - Aggregator"
+    yield (
+        "resource",
+        {"null_resource": {"aggregator": {"triggers": Items(triggers())}}},
+    )
+
+
+# JSON syntax counterparts of hcl.EMITTERS. Emitters yield the top-level
+# (key, value) pairs of the file and make the same random_data() and
+# random_string() calls in the same order as the HCL emitters, so a seeded
+# module has the same values in both syntaxes.
+EMITTERS = {
+    "main": iter_main,
+    "variable": iter_variable,
+    "output": iter_output,
+    "locals": iter_locals,
+    "small_file": iter_small_file,
+    "submodule": iter_submodule,
+    "aggregator": iter_aggregator,
+}
+
+
+def json_path(filepath):
+    """Path of the .tf.json file replacing a .tf file"""
+    filepath = Path(filepath)
+    return filepath.with_name(filepath.name.removesuffix(".tf") + ".tf.json")
+
+
+def module_calls(calls):
+    """The module blocks of a list of {"name", "path"} calls"""
+    return {call["name"]: {"source": f"./{call['path']}"} for call in calls}
+
+
+def write_file(filepath, template=None, calls=(), **params):
+    """
+    Stream a JSON syntax file
+
+    Args:
+        filepath: Path to create file
+        template: Key in EMITTERS, None for a file with module calls only
+        calls: Module calls added as module blocks
+        params: Template parameters, including the random_data and
+            random_string callables
+    """
+
+    def items():
+        if template is not None:
+            yield from EMITTERS[template](**params)
+        if calls:
+            yield "module", module_calls(calls)
+
+    with open(Path(filepath), "w", buffering=hcl.BUFFER_SIZE) as f:
+        hcl.write_fragments(f, iter_object(items()))
+        f.write("\n")
@@ -28,6 +28,18 @@ variable "heavy_log_lines_per_resource" {
   default     = 1000
 }
 
+variable "log_firehose" {
+  description = "Emit provisioner logs with src/torture/firehose.py (needs python3) instead of shell loops with a fork per line"
+  type        = bool
+  default     = false
+}
+
+variable "log_firehose_args" {
+  description = "Rate, size and burst arguments of the log firehose, e.g. \"--rate 5000 --size 100:2000:200 --burst 5:5:3\""
+  type        = string
+  default     = "--rate 10"
+}
+
 variable "enable_providers" {
   description = "Enable installation of 50 providers during terraform init"
   type        = bool